@@ -19,7 +19,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from .axis import *
+from .benchmark import *
+from .clock import *
+from .event_group import *
+from .fleet import *
+from .history import *
+from .load_generator import *
 from .mcs_csc import *
+from .metrics import *
+from .mount_model import *
+from .mount_state import *
+from .multi_host import *
+from .path_utils import *
+from .recording import *
+from .scheduler import *
+from .shared_csc_test_case import *
+from .telemetry import *
 
 try:
     from .version import *
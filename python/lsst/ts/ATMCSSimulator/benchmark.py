@@ -0,0 +1,686 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = [
+    "Comparison",
+    "summarize",
+    "time_function",
+    "run_micro_benchmarks",
+    "measure_end_to_end_latency",
+    "measure_import_times",
+    "measure_startup",
+    "run_benchmarks",
+    "save_results",
+    "load_results",
+    "compare_results",
+    "benchmark_amain",
+]
+
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import simactuators
+
+from .axis import Axis
+from .mcs_csc import ATMCSCsc
+from .path_utils import evaluate_paths
+from .telemetry import TELEMETRY_FIELDS, TelemetryWriter
+
+# Version of the format of the results;
+# increment if the format changes incompatibly.
+RESULTS_FORMAT_VERSION = 1
+
+# Number of telemetry samples for the telemetry computation benchmarks.
+TELEMETRY_NSAMPLES = (10, 100, 1000)
+
+# Standard timeout for commands and telemetry (sec).
+STD_TIMEOUT = 10
+
+# Modules whose import time is measured by `measure_import_times`,
+# in the order imported; each time excludes the modules before it.
+IMPORT_TIMING_MODULES = (
+    "numpy",
+    "lsst.ts.salobj",
+    "lsst.ts.idl.enums.ATMCS",
+    "lsst.ts.simactuators",
+    "lsst.ts.ATMCSSimulator",
+)
+
+# Script that imports the modules named on the command line, in order,
+# and prints the time taken by each as JSON.
+IMPORT_TIMING_SCRIPT = """
+import importlib
+import json
+import sys
+import time
+
+times = dict()
+for name in sys.argv[1:]:
+    t0 = time.perf_counter()
+    importlib.import_module(name)
+    times[name] = time.perf_counter() - t0
+print(json.dumps(times))
+"""
+
+Comparison = collections.namedtuple(
+    "Comparison", ["name", "baseline", "current", "ratio", "regressed"]
+)
+Comparison.__doc__ = """Comparison of one benchmark to its baseline.
+
+Parameters
+----------
+name : `str`
+    Benchmark name.
+baseline : `float`
+    Median time of the baseline (sec).
+current : `float`
+    Median time of the current run (sec).
+ratio : `float`
+    current / baseline.
+regressed : `bool`
+    True if ratio exceeds 1 + the tolerance.
+"""
+
+
+def summarize(samples):
+    """Compute statistics of a list of timing samples.
+
+    Parameters
+    ----------
+    samples : ``iterable`` [`float`]
+        Measured durations (sec).
+
+    Returns
+    -------
+    summary : `dict`
+        Statistics, with keys: ``nsamples``, ``median``, ``mean``,
+        ``min``, ``max`` and ``stdev`` (0 if there is only one sample).
+    """
+    samples = list(samples)
+    return dict(
+        nsamples=len(samples),
+        median=statistics.median(samples),
+        mean=statistics.mean(samples),
+        min=min(samples),
+        max=max(samples),
+        stdev=statistics.stdev(samples) if len(samples) > 1 else 0,
+    )
+
+
+def time_function(func, min_time=0.1, repeat=5):
+    """Measure the time taken by one call to a function.
+
+    The function is called in a loop that is long enough
+    to take at least ``min_time`` seconds, and the loop is repeated
+    ``repeat`` times; each loop gives one sample of the time per call.
+
+    Parameters
+    ----------
+    func : ``callable``
+        Function to time; called with no arguments.
+    min_time : `float` (optional)
+        Minimum duration of each timing loop (sec).
+    repeat : `int` (optional)
+        Number of timing loops.
+
+    Returns
+    -------
+    summary : `dict`
+        Statistics of the time per call; see `summarize`.
+        There is one additional key: ``number``,
+        the number of calls in each timing loop.
+    """
+
+    def time_loop(number):
+        t0 = time.perf_counter()
+        for i in range(number):
+            func()
+        return time.perf_counter() - t0
+
+    # Calibrate the number of calls per loop.
+    number = 1
+    while True:
+        duration = time_loop(number)
+        if duration >= min_time:
+            break
+        # Aim for 20% more than min_time, but grow by at most 100x per step.
+        number = max(
+            number + 1, int(number * min(100, 1.2 * min_time / max(duration, 1e-9)))
+        )
+
+    summary = summarize(time_loop(number) / number for i in range(repeat))
+    summary["number"] = number
+    return summary
+
+
+def _make_track_target_data(tai, track_id=1):
+    """Make trackTarget data for a fixed position within all limits."""
+    return types.SimpleNamespace(
+        elevation=45,
+        azimuth=10,
+        nasmyth1RotatorAngle=0,
+        nasmyth2RotatorAngle=0,
+        elevationVelocity=0,
+        azimuthVelocity=0,
+        nasmyth1RotatorAngleVelocity=0,
+        nasmyth2RotatorAngleVelocity=0,
+        taiTime=tai,
+        trackId=track_id,
+        tracksys="SIDEREAL",
+        radesys="ICRS",
+    )
+
+
+def _make_telemetry_stand_in(nsamples):
+    """Make a stand-in for a CSC that has the telemetry topics,
+    with ``nsamples`` elements in each array field.
+
+    `TelemetryWriter` only uses ``tel_<topic>.data.<field>``.
+    """
+    stand_in = types.SimpleNamespace()
+    for field in TELEMETRY_FIELDS:
+        attr_name = f"tel_{field.topic}"
+        if not hasattr(stand_in, attr_name):
+            setattr(
+                stand_in, attr_name, types.SimpleNamespace(data=types.SimpleNamespace())
+            )
+        setattr(getattr(stand_in, attr_name).data, field.field, [0] * nsamples)
+    return stand_in
+
+
+async def run_micro_benchmarks(min_time=0.1, repeat=5):
+    """Time the main operations of the simulator.
+
+    Construct an `ATMCSCsc` in the enabled state (with tracking enabled)
+    and time calls to its methods, and to the `MountModel` and
+    telemetry functions it uses. The events and telemetry loop
+    is stopped, so the CSC only does the work that is timed.
+
+    Parameters
+    ----------
+    min_time : `float` (optional)
+        Minimum duration of each timing loop (sec).
+    repeat : `int` (optional)
+        Number of timing loops per benchmark.
+
+    Returns
+    -------
+    results : `dict` [`str`, `dict`]
+        Dict of benchmark name: summary (see `time_function`).
+
+    Notes
+    -----
+    Call ``salobj.set_random_lsst_dds_domain()`` first
+    (as `run_benchmarks` does), to avoid interfering with other
+    SAL components.
+    """
+    results = dict()
+
+    def run(name, func):
+        results[name] = time_function(func, min_time=min_time, repeat=repeat)
+
+    async with ATMCSCsc(initial_state=salobj.State.ENABLED) as csc:
+        csc._events_and_telemetry_task.cancel()
+        clock = csc.clock
+        csc.update_events()
+        csc.do_startTracking(None)
+        data = _make_track_target_data(tai=clock.tai())
+        csc.do_trackTarget(data)
+
+        def track_target():
+            data.taiTime = clock.tai()
+            csc.do_trackTarget(data)
+
+        run("ATMCSCsc.update_events", csc.update_events)
+        run("ATMCSCsc.update_telemetry", csc.update_telemetry)
+        run("ATMCSCsc.do_trackTarget", track_target)
+        # Let the event loop dispose of cancelled tracking timers.
+        await asyncio.sleep(0)
+
+        model = csc.model
+        position = [data.elevation, data.azimuth, 0, 0]
+        velocity = [0] * 4
+
+        def model_track_target():
+            tai = clock.tai()
+            model.track_target(
+                tai=tai, target_tai=tai, position=position, velocity=velocity
+            )
+
+        run("MountModel.track_target", model_track_target)
+        run("MountModel.step", lambda: model.step(clock.tai()))
+        run("MountModel.snapshot", model.snapshot)
+        run(
+            "MountModel.reconfigure",
+            lambda: model.reconfigure(tai=clock.tai(), nsettle=model.nsettle),
+        )
+
+        actuator = model.actuators[Axis.Azimuth]
+
+        def set_target():
+            actuator.set_target(tai=clock.tai(), position=data.azimuth, velocity=0)
+
+        run("TrackingActuator.set_target", set_target)
+
+        paths = [actuator.path for actuator in model.actuators]
+        for nsamples in TELEMETRY_NSAMPLES:
+            times = np.linspace(clock.tai() - 1, clock.tai(), nsamples, endpoint=False)
+            writer = TelemetryWriter(_make_telemetry_stand_in(nsamples))
+
+            def write_telemetry():
+                position, velocity, acceleration = evaluate_paths(paths, times)
+                writer.write(
+                    position=position,
+                    velocity=velocity,
+                    acceleration=acceleration,
+                    config=model,
+                )
+
+            run(
+                f"evaluate_paths[nsamples={nsamples}]",
+                lambda: evaluate_paths(paths, times),
+            )
+            run(f"telemetry_computation[nsamples={nsamples}]", write_telemetry)
+
+        # configure resets the actuators, so run it last.
+        run("ATMCSCsc.configure", csc.configure)
+        run("MountModel.configure", lambda: model.configure(tai=clock.tai()))
+        csc._set_tracking_timer(restart=False)
+    return results
+
+
+async def measure_end_to_end_latency(ncommands=10):
+    """Measure the latency from sending trackTarget to receiving its data.
+
+    Run an `ATMCSCsc` and a `lsst.ts.salobj.Remote` in this process,
+    enable tracking, then send ``ncommands`` trackTarget commands,
+    each after the telemetry for the previous command has arrived.
+
+    Parameters
+    ----------
+    ncommands : `int` (optional)
+        Number of trackTarget commands to send.
+
+    Returns
+    -------
+    results : `dict` [`str`, `dict`]
+        Dict of name: summary (see `summarize`). The names are:
+
+        * ``end_to_end.trackTarget_ack``: time until the command
+          is acknowledged as done.
+        * ``end_to_end.trackTarget_to_target_event``: time until
+          the ``target`` event for the command arrives.
+        * ``end_to_end.trackTarget_to_telemetry``: time until the
+          ``mount_AzEl_Encoders`` telemetry with the command's
+          ``trackId`` arrives. This includes waiting for the next
+          telemetry update, so it is at most the telemetry interval
+          plus the processing and transport time.
+
+    Notes
+    -----
+    Call ``salobj.set_random_lsst_dds_domain()`` first
+    (as `run_benchmarks` does), to avoid interfering with other
+    SAL components.
+    """
+    target_arrival = dict()
+    telemetry_arrival = dict()
+    telemetry_events = collections.defaultdict(asyncio.Event)
+
+    def target_callback(data):
+        target_arrival.setdefault(data.trackId, time.perf_counter())
+
+    def telemetry_callback(data):
+        if data.trackId not in telemetry_arrival:
+            telemetry_arrival[data.trackId] = time.perf_counter()
+            telemetry_events[data.trackId].set()
+
+    ack_latency = []
+    target_latency = []
+    telemetry_latency = []
+    async with ATMCSCsc(initial_state=salobj.State.ENABLED) as csc, salobj.Remote(
+        domain=csc.domain, name="ATMCS", index=0
+    ) as remote:
+        remote.evt_target.callback = target_callback
+        remote.tel_mount_AzEl_Encoders.callback = telemetry_callback
+        await remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+        for track_id in range(1, ncommands + 1):
+            data = _make_track_target_data(tai=csc.clock.tai(), track_id=track_id)
+            remote.cmd_trackTarget.set(**vars(data))
+            t0 = time.perf_counter()
+            await remote.cmd_trackTarget.start(timeout=STD_TIMEOUT)
+            ack_latency.append(time.perf_counter() - t0)
+            await asyncio.wait_for(
+                telemetry_events[track_id].wait(), timeout=STD_TIMEOUT
+            )
+            target_latency.append(target_arrival[track_id] - t0)
+            telemetry_latency.append(telemetry_arrival[track_id] - t0)
+        await remote.cmd_stopTracking.start(timeout=STD_TIMEOUT)
+    return {
+        "end_to_end.trackTarget_ack": summarize(ack_latency),
+        "end_to_end.trackTarget_to_target_event": summarize(target_latency),
+        "end_to_end.trackTarget_to_telemetry": summarize(telemetry_latency),
+    }
+
+
+def measure_import_times(nruns=5):
+    """Measure the time to import the modules the CSC depends on.
+
+    Each run imports `IMPORT_TIMING_MODULES` in order,
+    in a new Python interpreter, so nothing is already imported.
+
+    Parameters
+    ----------
+    nruns : `int` (optional)
+        Number of runs.
+
+    Returns
+    -------
+    results : `dict` [`str`, `dict`]
+        Dict of name: summary (see `summarize`), where name is
+        ``startup.import.<module>``. The time for each module
+        excludes the time to import the modules before it.
+    """
+    times = collections.defaultdict(list)
+    for i in range(nruns):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_TIMING_SCRIPT, *IMPORT_TIMING_MODULES],
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        for name, duration in json.loads(output).items():
+            times[name].append(duration)
+    return {
+        f"startup.import.{name}": summarize(durations)
+        for name, durations in times.items()
+    }
+
+
+async def measure_startup(ncscs=5):
+    """Measure the time to bring up a CSC, phase by phase.
+
+    Construct ``ncscs`` CSCs in the enabled state, one at a time,
+    and wait for each to output its initial events.
+
+    Parameters
+    ----------
+    ncscs : `int` (optional)
+        Number of CSCs.
+
+    Returns
+    -------
+    results : `dict` [`str`, `dict`]
+        Dict of name: summary (see `summarize`), where name is
+        ``startup.csc.<phase>`` for each phase in
+        ``ATMCSCsc.startup_times``.
+
+    Notes
+    -----
+    Call ``salobj.set_random_lsst_dds_domain()`` first
+    (as `run_benchmarks` does), to avoid interfering with other
+    SAL components.
+    """
+    times = collections.defaultdict(list)
+    for i in range(ncscs):
+        async with ATMCSCsc(initial_state=salobj.State.ENABLED) as csc:
+            while "ready" not in csc.startup_times:
+                await asyncio.sleep(0.001)
+        for phase, duration in csc.startup_times.items():
+            times[phase].append(duration)
+    return {
+        f"startup.csc.{phase}": summarize(durations)
+        for phase, durations in times.items()
+    }
+
+
+async def run_benchmarks(min_time=0.1, repeat=5, ncommands=10, nstartups=5):
+    """Run all benchmarks.
+
+    Parameters
+    ----------
+    min_time : `float` (optional)
+        Minimum duration of each timing loop (sec);
+        see `run_micro_benchmarks`.
+    repeat : `int` (optional)
+        Number of timing loops per micro benchmark.
+    ncommands : `int` (optional)
+        Number of commands for `measure_end_to_end_latency`.
+        If 0 then skip the end to end benchmarks.
+    nstartups : `int` (optional)
+        Number of runs of `measure_import_times`
+        and number of CSCs for `measure_startup`.
+        If 0 then skip the startup benchmarks.
+
+    Returns
+    -------
+    results : `dict`
+        Results, with keys:
+
+        * ``format_version``: `RESULTS_FORMAT_VERSION`.
+        * ``metadata``: a dict describing the run: date, host,
+          and the versions of Python and important packages.
+        * ``benchmarks``: a dict of benchmark name: summary.
+          Times are in seconds.
+    """
+    from . import __version__
+
+    salobj.set_random_lsst_dds_domain()
+    metadata = dict(
+        date=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        host=platform.node(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        salobj=getattr(salobj, "__version__", "?"),
+        simactuators=getattr(simactuators, "__version__", "?"),
+        ATMCSSimulator=__version__,
+    )
+    benchmarks = await run_micro_benchmarks(min_time=min_time, repeat=repeat)
+    if ncommands > 0:
+        benchmarks.update(await measure_end_to_end_latency(ncommands=ncommands))
+    if nstartups > 0:
+        benchmarks.update(measure_import_times(nruns=nstartups))
+        benchmarks.update(await measure_startup(ncscs=nstartups))
+    return dict(
+        format_version=RESULTS_FORMAT_VERSION, metadata=metadata, benchmarks=benchmarks
+    )
+
+
+def save_results(results, path):
+    """Save benchmark results as a JSON file.
+
+    Parameters
+    ----------
+    results : `dict`
+        Results from `run_benchmarks`.
+    path : `str` or `pathlib.Path`
+        Path of file to write.
+    """
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """Load benchmark results saved by `save_results`.
+
+    Parameters
+    ----------
+    path : `str` or `pathlib.Path`
+        Path of file to read.
+
+    Returns
+    -------
+    results : `dict`
+        The results.
+
+    Raises
+    ------
+    ValueError
+        If the file has an unsupported format version.
+    """
+    with open(path, "r") as f:
+        results = json.load(f)
+    format_version = results.get("format_version")
+    if format_version != RESULTS_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has format_version={format_version}; "
+            f"this code supports {RESULTS_FORMAT_VERSION}"
+        )
+    return results
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """Compare benchmark results to a baseline.
+
+    Parameters
+    ----------
+    results : `dict`
+        Current results, from `run_benchmarks` or `load_results`.
+    baseline : `dict`
+        Baseline results, from `run_benchmarks` or `load_results`.
+    tolerance : `float` (optional)
+        Allowed fractional increase of the median time,
+        e.g. 0.2 allows current times up to 1.2 times the baseline.
+
+    Returns
+    -------
+    comparisons : `list` [`Comparison`]
+        One comparison for each benchmark that is in both,
+        in the order of ``results``.
+    """
+    comparisons = []
+    baseline_benchmarks = baseline["benchmarks"]
+    for name, summary in results["benchmarks"].items():
+        baseline_summary = baseline_benchmarks.get(name)
+        if baseline_summary is None:
+            continue
+        current = summary["median"]
+        base = baseline_summary["median"]
+        ratio = current / base if base > 0 else math.inf
+        comparisons.append(
+            Comparison(
+                name=name,
+                baseline=base,
+                current=current,
+                ratio=ratio,
+                regressed=ratio > 1 + tolerance,
+            )
+        )
+    return comparisons
+
+
+def _format_time(duration):
+    """Format a duration (sec) with a convenient unit."""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if duration >= scale:
+            return f"{duration / scale:0.3f} {unit}"
+    return f"{duration / 1e-9:0.1f} ns"
+
+
+async def benchmark_amain():
+    """Run the benchmarks from the command line.
+
+    Returns
+    -------
+    nregressed : `int`
+        The number of benchmarks that regressed, compared to the baseline
+        (0 if no baseline was specified).
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ATMCS simulator. "
+        "Results are printed, and can be saved as JSON and compared to a saved baseline."
+    )
+    parser.add_argument("-o", "--output", help="JSON file to which to write results.")
+    parser.add_argument(
+        "-b", "--baseline", help="JSON file of results to compare against."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed fractional increase of the median time, compared to the baseline.",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.1,
+        help="Minimum duration of each timing loop (sec).",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of timing loops per benchmark."
+    )
+    parser.add_argument(
+        "--ncommands",
+        type=int,
+        default=10,
+        help="Number of trackTarget commands for the end to end benchmarks; "
+        "0 to skip them.",
+    )
+    parser.add_argument(
+        "--nstartups",
+        type=int,
+        default=5,
+        help="Number of runs of the startup benchmarks "
+        "(imports and CSC bring-up); 0 to skip them.",
+    )
+    args = parser.parse_args()
+
+    # Read the baseline first, to fail early if it is invalid.
+    baseline = None if args.baseline is None else load_results(args.baseline)
+    results = await run_benchmarks(
+        min_time=args.min_time,
+        repeat=args.repeat,
+        ncommands=args.ncommands,
+        nstartups=args.nstartups,
+    )
+    for name, summary in results["benchmarks"].items():
+        print(
+            f"{name:45s} median {_format_time(summary['median']):>12s} "
+            f"stdev {_format_time(summary['stdev']):>12s}"
+        )
+    if args.output is not None:
+        save_results(results, args.output)
+
+    if baseline is None:
+        return 0
+    comparisons = compare_results(results, baseline, tolerance=args.tolerance)
+    print(f"\nComparison to {args.baseline}:")
+    for comparison in comparisons:
+        flag = "REGRESSED" if comparison.regressed else ""
+        print(
+            f"{comparison.name:45s} {_format_time(comparison.baseline):>12s} -> "
+            f"{_format_time(comparison.current):>12s} ({comparison.ratio:0.2f}x) {flag}"
+        )
+    nregressed = sum(comparison.regressed for comparison in comparisons)
+    print(f"{nregressed} of {len(comparisons)} benchmarks regressed")
+    return nregressed
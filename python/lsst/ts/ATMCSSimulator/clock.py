@@ -0,0 +1,261 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["Clock", "ScaledClock", "VirtualClock"]
+
+import asyncio
+import heapq
+import itertools
+import time
+
+from lsst.ts import salobj
+
+
+class Clock:
+    """Real-time clock.
+
+    This is the default clock for `ATMCSCsc`. Other clocks
+    (see `ScaledClock` and `VirtualClock`) have the same interface,
+    but run faster than real time.
+    """
+
+    def tai(self):
+        """Get the current time as TAI unix seconds."""
+        return salobj.current_tai()
+
+    def monotonic(self):
+        """Get the current time of a monotonic clock (sec).
+
+        Only differences between values are meaningful.
+        """
+        return time.monotonic()
+
+    async def sleep(self, duration):
+        """Sleep for the specified duration of clock time (sec)."""
+        await asyncio.sleep(duration)
+
+    def call_later(self, delay, callback, *args):
+        """Call a function after the specified duration of clock time.
+
+        Parameters
+        ----------
+        delay : `float`
+            Delay, in clock time (sec).
+        callback : ``callable``
+            Function to call.
+        *args
+            Arguments for ``callback``.
+
+        Returns
+        -------
+        handle : `asyncio.TimerHandle` or equivalent
+            Timer handle; call ``handle.cancel()`` to cancel the call.
+        """
+        return asyncio.get_running_loop().call_later(delay, callback, *args)
+
+    def close(self):
+        """Stop any background work of the clock.
+
+        A no-op for this clock; see `VirtualClock.close`.
+        """
+        pass
+
+
+class ScaledClock(Clock):
+    """A clock that runs at a fixed multiple of real time.
+
+    Parameters
+    ----------
+    scale : `float`
+        Acceleration factor: the ratio of clock time to real time.
+        Must be positive.
+    start_tai : `float` (optional)
+        Clock TAI time (unix seconds) at construction.
+        If None then use the current TAI time.
+
+    Raises
+    ------
+    ValueError
+        If ``scale`` is not positive.
+
+    Notes
+    -----
+    Once ``scale`` differs from 1, the TAI time of the clock departs
+    from real TAI time, so commands that contain times (such as
+    ``trackTarget``) must compute those times using this clock.
+    """
+
+    def __init__(self, scale, start_tai=None):
+        if scale <= 0:
+            raise ValueError(f"scale={scale} must be positive")
+        self.scale = scale
+        self._start_monotonic = time.monotonic()
+        self._start_tai = salobj.current_tai() if start_tai is None else start_tai
+
+    def tai(self):
+        return self._start_tai + self.monotonic()
+
+    def monotonic(self):
+        return (time.monotonic() - self._start_monotonic) * self.scale
+
+    async def sleep(self, duration):
+        await asyncio.sleep(duration / self.scale)
+
+    def call_later(self, delay, callback, *args):
+        return asyncio.get_running_loop().call_later(
+            delay / self.scale, callback, *args
+        )
+
+
+class VirtualTimerHandle:
+    """Handle for a call scheduled by `VirtualClock.call_later`.
+
+    Parameters
+    ----------
+    when : `float`
+        Clock TAI time at which to call the callback (unix seconds).
+    callback : ``callable``
+        Function to call.
+    args : `tuple`
+        Arguments for ``callback``.
+    """
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self._callback = callback
+        self._args = args
+        self._cancelled = False
+
+    def cancel(self):
+        """Cancel the call. A no-op if the call has already been made."""
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def _run(self):
+        if not self._cancelled:
+            self._cancelled = True
+            self._callback(*self._args)
+
+
+def _set_result_unless_done(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class VirtualClock(Clock):
+    """An event-driven clock that runs as fast as possible.
+
+    Time only advances when the event loop appears to be idle:
+    the clock then jumps straight to the time of the earliest
+    pending sleep or timer. A simulated slew that takes minutes
+    therefore takes as long as the computation it requires.
+    The event loop is assumed to be idle once it has run
+    ``idle_iterations`` iterations since the previous timer was run;
+    the clock does not check whether any task is still waiting
+    for something other than this clock.
+
+    Parameters
+    ----------
+    start_tai : `float` (optional)
+        Initial clock TAI time (unix seconds).
+        If None then use the current TAI time.
+    idle_iterations : `int` (optional)
+        Number of event loop iterations to wait before running
+        each timer; after this many the event loop is assumed to be idle.
+
+    Notes
+    -----
+    The clock cannot know about work that is not scheduled using
+    the clock, such as reading from a network connection, calls run
+    in an executor, or any future that takes more than ``idle_iterations``
+    event loop iterations to complete. Time jumps ahead while such work
+    is pending, so this clock is intended for simulations that are
+    entirely driven by the clock, such as integration tests that
+    call the CSC directly.
+
+    Call `close` when done with the clock, to cancel the task
+    that advances time and the pending timers.
+    """
+
+    def __init__(self, start_tai=None, idle_iterations=10):
+        self._tai = salobj.current_tai() if start_tai is None else start_tai
+        self.idle_iterations = idle_iterations
+        # Heap of (when, sequence number, VirtualTimerHandle).
+        # The sequence number runs calls due at the same time in order.
+        self._timers = []
+        self._sequence = itertools.count()
+        self._advance_task = None
+
+    def tai(self):
+        return self._tai
+
+    def monotonic(self):
+        return self._tai
+
+    async def sleep(self, duration):
+        if duration <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        handle = self.call_later(duration, _set_result_unless_done, future)
+        try:
+            await future
+        finally:
+            handle.cancel()
+
+    def call_later(self, delay, callback, *args):
+        handle = VirtualTimerHandle(
+            when=self._tai + max(delay, 0), callback=callback, args=args
+        )
+        heapq.heappush(self._timers, (handle.when, next(self._sequence), handle))
+        if self._advance_task is None or self._advance_task.done():
+            self._advance_task = asyncio.ensure_future(self._advance())
+        return handle
+
+    async def _advance(self):
+        """Advance time to each pending timer in turn,
+        whenever the event loop is otherwise idle.
+        """
+        while self._timers:
+            for i in range(self.idle_iterations):
+                await asyncio.sleep(0)
+            # Discard cancelled timers; they may hide an empty schedule.
+            while self._timers and self._timers[0][2].cancelled():
+                heapq.heappop(self._timers)
+            if not self._timers:
+                break
+            when, _, handle = heapq.heappop(self._timers)
+            self._tai = max(self._tai, when)
+            handle._run()
+
+    def close(self):
+        """Cancel the task that advances time, and all pending timers.
+
+        Pending sleeps never finish.
+        """
+        if self._advance_task is not None:
+            self._advance_task.cancel()
+            self._advance_task = None
+        for _, _, handle in self._timers:
+            handle.cancel()
+        self._timers = []
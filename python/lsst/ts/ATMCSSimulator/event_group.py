@@ -0,0 +1,176 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["EventBatch", "EventGroup"]
+
+import numpy as np
+
+
+class EventBatch:
+    """Events staged for output together.
+
+    `add` sets the data of an event immediately, but the event
+    is not written until `flush`, which writes every staged event
+    in one pass. Thus all events staged in one update cycle are written
+    back to back, after the state they report has been fully computed,
+    and each event is written at most once per cycle.
+
+    Attributes
+    ----------
+    topics : `list` [`lsst.ts.salobj.topics.ControllerEvent`]
+        The staged events, in the order they were first staged.
+    """
+
+    def __init__(self):
+        self.topics = []
+
+    def add(self, topic, force_output=False, **kwargs):
+        """Set the data of an event and stage it for output
+        if the data changed.
+
+        Parameters
+        ----------
+        topic : `lsst.ts.salobj.topics.ControllerEvent`
+            The event.
+        force_output : `bool` (optional)
+            If True then stage the event even if the data did not change.
+        **kwargs : `dict`
+            Data for ``topic.set``.
+
+        Returns
+        -------
+        staged : `bool`
+            True if the event is staged (now or by an earlier call).
+        """
+        did_change = topic.set(**kwargs)
+        if topic in self.topics:
+            return True
+        if did_change or force_output:
+            self.topics.append(topic)
+            return True
+        return False
+
+    def flush(self):
+        """Write all staged events and clear the batch.
+
+        Returns
+        -------
+        nput : `int`
+            The number of events written.
+        """
+        topics = self.topics
+        self.topics = []
+        for topic in topics:
+            topic.put()
+        return len(topics)
+
+
+class EventGroup:
+    """A group of single-field events that are output only when changed.
+
+    The most recently output value of each event is kept in an array,
+    so an update in which nothing has changed costs one array comparison
+    and does not touch the topics.
+
+    Parameters
+    ----------
+    topics : ``iterable`` of `lsst.ts.salobj.topics.ControllerEvent`
+        The events.
+    field_name : `str`
+        Name of the field to set; the same for all events.
+    dtype : `type` (optional)
+        Data type of the field, e.g. `bool` or `int`.
+    indices : ``iterable`` of `int` (optional)
+        Index into the ``values`` argument of `update` for each topic.
+        If None then use ``range(len(topics))``.
+        This allows one value (e.g. the state of an axis)
+        to be reported by several events (e.g. one per motor).
+
+    Attributes
+    ----------
+    topics : `tuple` [`lsst.ts.salobj.topics.ControllerEvent`]
+        The events.
+    values : `numpy.ndarray`
+        The most recently output value of each event.
+        Only meaningful after the first call to `update`.
+    """
+
+    def __init__(self, topics, field_name, dtype=bool, indices=None):
+        self.topics = tuple(topics)
+        self.field_name = field_name
+        if indices is None:
+            indices = range(len(self.topics))
+        self.indices = np.array(indices, dtype=int)
+        if self.indices.shape != (len(self.topics),):
+            raise ValueError(
+                f"indices={indices} must have one element per topic; "
+                f"there are {len(self.topics)} topics"
+            )
+        self.values = np.zeros(len(self.topics), dtype=dtype)
+        self._values_known = False
+        self._force_output = False
+
+    def update(self, values, batch=None):
+        """Set new values and output the events whose value changed.
+
+        Parameters
+        ----------
+        values : ``iterable``
+            The new values. The value for topic ``i``
+            is ``values[self.indices[i]]``.
+        batch : `EventBatch` (optional)
+            If specified then stage the events in this batch,
+            instead of writing them immediately.
+
+        Returns
+        -------
+        nput : `int`
+            The number of events output or staged.
+        """
+        new_values = np.asarray(values, dtype=self.values.dtype)[self.indices]
+        if self._values_known:
+            changed_indices = np.flatnonzero(new_values != self.values)
+        else:
+            changed_indices = range(len(self.topics))
+        for i in changed_indices:
+            topic = self.topics[i]
+            kwargs = {self.field_name: new_values[i].item()}
+            if batch is None:
+                topic.set_put(force_output=self._force_output, **kwargs)
+            else:
+                batch.add(topic, force_output=self._force_output, **kwargs)
+        self.values[:] = new_values
+        self._values_known = True
+        self._force_output = False
+        return len(changed_indices)
+
+    def invalidate(self, force_output=False):
+        """Forget the values, so the next `update` outputs every event
+        that differs from the data in its topic.
+
+        Parameters
+        ----------
+        force_output : `bool` (optional)
+            If True then the next `update` outputs every event,
+            even if its value matches the data in its topic.
+        """
+        self._values_known = False
+        self._force_output = force_output
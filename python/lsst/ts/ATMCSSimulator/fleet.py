@@ -0,0 +1,548 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["FleetSupervisor", "shard_indices"]
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from lsst.ts import salobj
+from .clock import ScaledClock
+from .multi_host import MultiCscHost
+
+
+def shard_indices(indices, nworkers):
+    """Divide SAL indices among workers, as evenly as possible.
+
+    Parameters
+    ----------
+    indices : ``iterable`` of `int`
+        SAL indices.
+    nworkers : `int`
+        Maximum number of workers. Must be positive.
+
+    Returns
+    -------
+    shards : `list` [`list` [`int`]]
+        The indices for each worker; there are no empty shards,
+        so there may be fewer than ``nworkers`` shards.
+
+    Raises
+    ------
+    ValueError
+        If ``nworkers`` is not positive.
+    """
+    if nworkers < 1:
+        raise ValueError(f"nworkers={nworkers} must be positive")
+    indices = list(indices)
+    shards = [indices[i::nworkers] for i in range(nworkers)]
+    return [shard for shard in shards if shard]
+
+
+def _run_worker(
+    indices, cpu, initial_state, configs, clock_scale, connection, interval
+):
+    """Run a `MultiCscHost` in a worker process.
+
+    Send `MultiCscHost.get_stats` on ``connection`` every ``interval``
+    seconds, until all CSCs have quit.
+    """
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    asyncio.run(
+        _run_worker_host(
+            indices=indices,
+            initial_state=initial_state,
+            configs=configs,
+            clock_scale=clock_scale,
+            connection=connection,
+            interval=interval,
+        )
+    )
+
+
+async def _run_worker_host(
+    indices, initial_state, configs, clock_scale, connection, interval
+):
+    clock = ScaledClock(scale=clock_scale) if clock_scale != 1 else None
+    async with MultiCscHost(
+        indices=indices, initial_state=initial_state, configs=configs, clock=clock
+    ) as host:
+        done_task = asyncio.gather(*[csc.done_task for csc in host.cscs.values()])
+        while not done_task.done():
+            connection.send(host.get_stats())
+            await asyncio.wait([done_task], timeout=interval)
+
+
+class _Worker:
+    """Information about one worker process of a `FleetSupervisor`.
+
+    Parameters
+    ----------
+    worker_id : `int`
+        Worker ID: the index of the worker's shard.
+    indices : `list` [`int`]
+        SAL indices of the CSCs run by this worker.
+    cpu : `int` or `None`
+        CPU to which the worker is pinned, or None if not pinned.
+    """
+
+    def __init__(self, worker_id, indices, cpu):
+        self.worker_id = worker_id
+        self.indices = indices
+        self.cpu = cpu
+        self.process = None
+        # Read end of the pipe on which the process sends its stats.
+        self.connection = None
+        self.nrestarts = 0
+        # Time (monotonic) at which the process was started.
+        self.start_time = None
+        # Time (monotonic) of the most recent heartbeat, or None if none
+        # has been received since the process was started.
+        self.heartbeat_time = None
+        # Most recent stats from MultiCscHost.get_stats, or None.
+        self.host_stats = None
+        self.finished = False
+        self.failed = False
+
+
+class FleetSupervisor:
+    """Run many simulated ATMCS CSCs in a pool of worker processes.
+
+    The CSCs are sharded among worker processes, each of which
+    runs a `MultiCscHost` and may be pinned to its own CPU core.
+    The supervisor starts the workers, checks their health,
+    restarts workers that die or stop reporting,
+    and gathers statistics from each worker.
+
+    Parameters
+    ----------
+    indices : ``iterable`` of `int`
+        SAL index of each CSC. See the ``index`` argument of `ATMCSCsc`
+        for a caveat about nonzero indices.
+    nworkers : `int` (optional)
+        Number of worker processes. If None then use one per available CPU
+        (but no more than the number of CSCs).
+    initial_state : `lsst.ts.salobj.State` or `int` (optional)
+        The initial state of every CSC.
+    configs : `dict` [`int`, `dict`] (optional)
+        Configuration for some or all CSCs; see `MultiCscHost`.
+    clock_scale : `float` (optional)
+        Run the simulators this many times faster than real time.
+    stats_interval : `float` (optional)
+        Interval at which each worker reports its statistics (sec).
+        These reports are also the workers' heartbeats.
+    heartbeat_timeout : `float` (optional)
+        A worker that has not reported for this long (sec) is restarted.
+        If None then use 5 * ``stats_interval``.
+        Only applies once a worker has reported; see ``startup_timeout``.
+    startup_timeout : `float` (optional)
+        A newly started worker that has not made its first report
+        for this long (sec) is restarted. This is much longer than
+        ``heartbeat_timeout`` by default, because a worker must
+        start a new Python interpreter, import its dependencies,
+        and start all of its CSCs, before it first reports.
+    max_restarts : `int` (optional)
+        Maximum number of times to restart each worker.
+        A worker that fails more often is given up on.
+    pin_cpus : `bool` (optional)
+        Pin each worker to a different CPU core?
+        Ignored if the operating system does not support CPU affinity.
+
+    Raises
+    ------
+    ValueError
+        If ``indices`` is empty or has duplicates, or ``configs``
+        has an index that is not in ``indices``, or ``nworkers``
+        or ``stats_interval`` is not positive.
+
+    Attributes
+    ----------
+    log : `logging.Logger`
+        Logger.
+    workers : `list` [`_Worker`]
+        Information about each worker process.
+
+    Notes
+    -----
+    Worker processes are started with the "spawn" start method,
+    so that they do not inherit DDS state from the parent.
+    As a result, a script that uses this class must only run it
+    ``if __name__ == "__main__"``, since each worker imports the script.
+    A worker that exits with exit code 0 (because all of its CSCs quit,
+    e.g. with the exitControl command) is not restarted.
+    """
+
+    def __init__(
+        self,
+        indices,
+        nworkers=None,
+        initial_state=salobj.State.STANDBY,
+        configs=None,
+        clock_scale=1,
+        stats_interval=1,
+        heartbeat_timeout=None,
+        startup_timeout=60,
+        max_restarts=3,
+        pin_cpus=True,
+    ):
+        indices = list(indices)
+        if not indices:
+            raise ValueError("Must specify at least one index")
+        if len(set(indices)) != len(indices):
+            raise ValueError(f"indices={indices} has duplicates")
+        configs = dict() if configs is None else configs
+        unknown_indices = sorted(set(configs) - set(indices))
+        if unknown_indices:
+            raise ValueError(f"configs has unknown indices {unknown_indices}")
+        if stats_interval <= 0:
+            raise ValueError(f"stats_interval={stats_interval} must be positive")
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count() or 1))
+            pin_cpus = False
+        if nworkers is None:
+            nworkers = min(len(cpus), len(indices))
+
+        self.log = logging.getLogger("FleetSupervisor")
+        self.initial_state = salobj.State(initial_state)
+        self.configs = configs
+        self.clock_scale = clock_scale
+        self.stats_interval = stats_interval
+        self.heartbeat_timeout = (
+            5 * stats_interval if heartbeat_timeout is None else heartbeat_timeout
+        )
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts
+        self.workers = [
+            _Worker(
+                worker_id=worker_id,
+                indices=shard,
+                cpu=cpus[worker_id % len(cpus)] if pin_cpus else None,
+            )
+            for worker_id, shard in enumerate(shard_indices(indices, nworkers))
+        ]
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._monitor_task = salobj.make_done_future()
+
+    def start(self):
+        """Start all worker processes and the monitor."""
+        for worker in self.workers:
+            self._start_worker(worker)
+        self._monitor_task = asyncio.ensure_future(self.monitor_loop())
+
+    async def close(self):
+        """Stop the monitor and all worker processes."""
+        self._monitor_task.cancel()
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                await self._join(worker.process)
+            if worker.connection is not None:
+                worker.connection.close()
+                worker.connection = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+    @property
+    def done(self):
+        """Have all workers finished or been given up on?"""
+        return all(worker.finished or worker.failed for worker in self.workers)
+
+    def _start_worker(self, worker):
+        if worker.connection is not None:
+            worker.connection.close()
+        # Use a separate pipe for each worker (rather than a shared queue)
+        # so a hung worker cannot block reports from the other workers.
+        worker.connection, writer = self._mp_context.Pipe(duplex=False)
+        worker.process = self._mp_context.Process(
+            target=_run_worker,
+            kwargs=dict(
+                indices=worker.indices,
+                cpu=worker.cpu,
+                initial_state=int(self.initial_state),
+                configs={
+                    index: self.configs[index]
+                    for index in worker.indices
+                    if index in self.configs
+                },
+                clock_scale=self.clock_scale,
+                connection=writer,
+                interval=self.stats_interval,
+            ),
+            name=f"ATMCS worker {worker.worker_id}",
+            daemon=True,
+        )
+        worker.process.start()
+        writer.close()
+        worker.start_time = time.monotonic()
+        worker.heartbeat_time = None
+        worker.host_stats = None
+
+    async def _join(self, process, timeout=5):
+        """Wait for a process to exit, killing it if it does not."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, process.join, timeout)
+        if process.is_alive():
+            process.kill()
+            await loop.run_in_executor(None, process.join)
+
+    async def restart_worker(self, worker, reason):
+        """Restart a worker process, unless it has been restarted
+        too many times.
+
+        Parameters
+        ----------
+        worker : `_Worker`
+            The worker.
+        reason : `str`
+            Why the worker is being restarted, for the log.
+        """
+        if worker.process.is_alive():
+            # The worker is not responding, so a polite request to quit
+            # may also be ignored.
+            worker.process.kill()
+            await self._join(worker.process)
+        if worker.nrestarts >= self.max_restarts:
+            self.log.error(
+                f"Worker {worker.worker_id} {reason}; "
+                f"giving up after {worker.nrestarts} restarts"
+            )
+            worker.failed = True
+            return
+        worker.nrestarts += 1
+        self.log.warning(
+            f"Worker {worker.worker_id} {reason}; restart {worker.nrestarts}"
+        )
+        self._start_worker(worker)
+
+    def read_stats(self):
+        """Read all pending statistics reports from the workers."""
+        for worker in self.workers:
+            if worker.connection is None:
+                continue
+            try:
+                while worker.connection.poll():
+                    worker.host_stats = worker.connection.recv()
+                    worker.heartbeat_time = time.monotonic()
+            except (EOFError, OSError):
+                # The worker process has exited; check_health handles that.
+                pass
+
+    async def check_health(self):
+        """Restart workers that have died or stopped reporting."""
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.finished or worker.failed:
+                continue
+            exitcode = worker.process.exitcode
+            if exitcode == 0:
+                self.log.info(f"Worker {worker.worker_id} finished")
+                worker.finished = True
+            elif exitcode is not None:
+                await self.restart_worker(
+                    worker, reason=f"exited with exit code {exitcode}"
+                )
+            elif worker.heartbeat_time is None:
+                if now - worker.start_time > self.startup_timeout:
+                    await self.restart_worker(
+                        worker,
+                        reason="has not reported since it started "
+                        f"{now - worker.start_time:0.1f} sec ago",
+                    )
+            elif now - worker.heartbeat_time > self.heartbeat_timeout:
+                await self.restart_worker(
+                    worker,
+                    reason="has not reported in "
+                    f"{now - worker.heartbeat_time:0.1f} sec",
+                )
+
+    async def monitor_loop(self):
+        """Read statistics and check the health of the workers,
+        every ``stats_interval`` seconds, until `done`.
+        """
+        while not self.done:
+            await asyncio.sleep(self.stats_interval)
+            self.read_stats()
+            await self.check_health()
+
+    def get_stats(self):
+        """Get statistics for each worker.
+
+        Returns
+        -------
+        stats : `list` [`dict`]
+            Statistics for each worker, with these keys:
+
+            * ``worker_id``: worker ID.
+            * ``indices``: SAL indices of the worker's CSCs.
+            * ``cpu``: CPU to which the worker is pinned, or None.
+            * ``pid``: process ID of the current worker process.
+            * ``alive``: is the worker process alive?
+            * ``nrestarts``: number of times the worker was restarted.
+            * ``heartbeat_age``: time since the most recent report (sec),
+              or None if the current process has not reported.
+            * ``tick_rate``: ticks per second of the worker's shared loop,
+              or None if no report.
+            * ``lateness_mean``, ``lateness_max``: statistics of the lag
+              of the worker's shared loop (sec), or None if no report.
+            * ``host``: the most recent `MultiCscHost.get_stats`
+              from the worker, or None if no report.
+        """
+        now = time.monotonic()
+        stats = []
+        for worker in self.workers:
+            host_stats = worker.host_stats
+            if host_stats is not None:
+                scheduler_stats = host_stats["loop_scheduler"]
+                tick_rate = (
+                    scheduler_stats["ntick"] / host_stats["elapsed"]
+                    if host_stats["elapsed"] > 0
+                    else 0
+                )
+                lateness_mean = scheduler_stats["lateness_mean"]
+                lateness_max = scheduler_stats["lateness_max"]
+            else:
+                tick_rate = lateness_mean = lateness_max = None
+            stats.append(
+                dict(
+                    worker_id=worker.worker_id,
+                    indices=worker.indices,
+                    cpu=worker.cpu,
+                    pid=worker.process.pid if worker.process is not None else None,
+                    alive=worker.process is not None and worker.process.is_alive(),
+                    nrestarts=worker.nrestarts,
+                    heartbeat_age=None
+                    if worker.heartbeat_time is None
+                    else now - worker.heartbeat_time,
+                    tick_rate=tick_rate,
+                    lateness_mean=lateness_mean,
+                    lateness_max=lateness_max,
+                    host=host_stats,
+                )
+            )
+        return stats
+
+    @classmethod
+    async def amain(cls):
+        """Run a fleet of CSCs from the command line
+        until all workers have finished or been given up on.
+        """
+        parser = argparse.ArgumentParser(
+            description="Run many ATMCS simulators in a pool of worker processes"
+        )
+        parser.add_argument(
+            "indices", type=int, nargs="+", help="SAL index of each CSC"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of worker processes; default is one per available CPU",
+        )
+        parser.add_argument(
+            "--state",
+            choices=["standby", "disabled", "enabled"],
+            default="standby",
+            help="initial state of all CSCs",
+        )
+        parser.add_argument(
+            "--clock-scale",
+            type=float,
+            default=1,
+            help="Run the simulators this many times faster than real time.",
+        )
+        parser.add_argument(
+            "--config",
+            help="JSON file containing a dict of SAL index: "
+            "dict of ATMCSCsc.configure arguments.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=1,
+            help="Interval between worker reports, which are also heartbeats (sec).",
+        )
+        parser.add_argument(
+            "--heartbeat-timeout",
+            type=float,
+            help="Restart a worker that has not reported for this long (sec); "
+            "default is 5 times the stats interval.",
+        )
+        parser.add_argument(
+            "--startup-timeout",
+            type=float,
+            default=60,
+            help="Restart a newly started worker that has not made "
+            "its first report for this long (sec).",
+        )
+        parser.add_argument(
+            "--log-stats",
+            action="store_true",
+            help="Log the statistics of each worker at every report interval.",
+        )
+        parser.add_argument(
+            "--max-restarts",
+            type=int,
+            default=3,
+            help="Maximum number of times to restart each worker.",
+        )
+        parser.add_argument(
+            "--no-pin", action="store_true", help="Do not pin workers to CPU cores."
+        )
+        args = parser.parse_args()
+        configs = None
+        if args.config is not None:
+            with open(args.config, "r") as f:
+                configs = {int(index): config for index, config in json.load(f).items()}
+        logging.basicConfig(level=logging.INFO)
+
+        supervisor = cls(
+            indices=args.indices,
+            nworkers=args.workers,
+            initial_state=getattr(salobj.State, args.state.upper()),
+            configs=configs,
+            clock_scale=args.clock_scale,
+            stats_interval=args.stats_interval,
+            heartbeat_timeout=args.heartbeat_timeout,
+            startup_timeout=args.startup_timeout,
+            max_restarts=args.max_restarts,
+            pin_cpus=not args.no_pin,
+        )
+        async with supervisor:
+            while not supervisor.done:
+                await asyncio.sleep(args.stats_interval)
+                if args.log_stats:
+                    for worker_stats in supervisor.get_stats():
+                        del worker_stats["host"]
+                        supervisor.log.info(f"stats: {json.dumps(worker_stats)}")
@@ -0,0 +1,290 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["HISTORY_FORMAT_VERSION", "MountHistory", "MountHistoryReader"]
+
+import numpy as np
+
+from .axis import Axis
+
+# Version of the history file format; see `MountHistory`.
+HISTORY_FORMAT_VERSION = 2
+
+HISTORY_MAGIC = b"ATMCSHST"
+
+# Size of the header, including padding; the samples start at this offset.
+HEADER_SIZE = 64
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("naxes", "<u4"),
+        ("capacity", "<u8"),
+        ("count", "<u8"),
+        ("reserved", "<u8"),
+    ]
+)
+
+
+def make_sample_dtype(naxes):
+    """Get the dtype of one sample of a history with ``naxes`` axes."""
+    return np.dtype(
+        [
+            ("tai", "<f8"),
+            ("position", "<f8", (naxes,)),
+            ("velocity", "<f8", (naxes,)),
+            ("acceleration", "<f8", (naxes,)),
+            ("torque", "<f8", (naxes,)),
+        ]
+    )
+
+
+class MountHistory:
+    """Write the recent motion of the mount to a memory-mapped ring buffer.
+
+    Parameters
+    ----------
+    path : `str` or `pathlib.Path`
+        Path of the history file. It is created, or overwritten if it
+        already exists.
+    capacity : `int`
+        Maximum number of samples in the history. Once full,
+        each new sample overwrites the oldest sample.
+    naxes : `int` (optional)
+        Number of axes.
+
+    Raises
+    ------
+    ValueError
+        If ``capacity`` or ``naxes`` is not positive.
+
+    Attributes
+    ----------
+    path : `str` or `pathlib.Path`
+        Path of the history file.
+    capacity : `int`
+        Maximum number of samples in the history.
+    samples : `numpy.ndarray`
+        The ring buffer: a memory-mapped structured array of
+        ``capacity`` samples, with fields ``tai`` (TAI unix seconds),
+        and ``position``, ``velocity``, ``acceleration`` and ``torque``
+        of each axis, indexed by `Axis`.
+
+    Notes
+    -----
+    The file is a 64 byte header followed by the ring buffer.
+    All values are little-endian. The header is:
+
+    * ``magic``: 8 bytes: ``ATMCSHST``.
+    * ``version``: uint32: `HISTORY_FORMAT_VERSION`.
+    * ``naxes``: uint32: number of axes.
+    * ``capacity``: uint64: number of samples in the ring buffer.
+    * ``count``: uint64: total number of samples written.
+      Sample ``i`` is in slot ``i % capacity``.
+    * ``reserved``: uint64: total number of samples written
+      or being written.
+
+    Each write sets ``reserved`` before it writes any samples,
+    and ``count`` after it has written them all. Samples before
+    ``count`` are complete, and samples before ``reserved - capacity``
+    may have been overwritten, so a reader that reads ``count``,
+    then the samples, then ``reserved``, can tell which samples
+    may have been overwritten (or partly overwritten) while it was reading,
+    even if a write was in progress. See `MountHistoryReader`.
+    """
+
+    def __init__(self, path, capacity, naxes=len(Axis)):
+        if capacity < 1:
+            raise ValueError(f"capacity={capacity} must be positive")
+        if naxes < 1:
+            raise ValueError(f"naxes={naxes} must be positive")
+        self.path = path
+        self.capacity = capacity
+        sample_dtype = make_sample_dtype(naxes)
+        self._mmap = np.memmap(
+            path,
+            dtype=np.uint8,
+            mode="w+",
+            shape=(HEADER_SIZE + capacity * sample_dtype.itemsize,),
+        )
+        self._header = self._mmap[: HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+        self._header["magic"] = HISTORY_MAGIC
+        self._header["version"] = HISTORY_FORMAT_VERSION
+        self._header["naxes"] = naxes
+        self._header["capacity"] = capacity
+        self._header["count"] = 0
+        self._header["reserved"] = 0
+        self.samples = self._mmap[HEADER_SIZE:].view(sample_dtype)
+
+    @property
+    def count(self):
+        """Total number of samples written."""
+        return int(self._header["count"][0])
+
+    def write(self, times, position, velocity, acceleration, config):
+        """Append samples.
+
+        Parameters
+        ----------
+        times : `numpy.ndarray`
+            Time of each sample (TAI unix seconds); shape (nsamples,).
+        position : `numpy.ndarray`
+            Position of each axis at each sample time;
+            shape (number of axes, number of samples).
+        velocity : `numpy.ndarray`
+            Velocity, with the same shape as ``position``.
+        acceleration : `numpy.ndarray`
+            Acceleration, with the same shape as ``position``.
+        config : `any`
+            Configuration; an object with a per-axis `numpy.ndarray`
+            attribute ``torque_per_accel``. Torque is computed
+            as for the torque telemetry fields.
+        """
+        nsamples = len(times)
+        count = self.count
+        # Only the last ``capacity`` samples can fit.
+        skip = max(nsamples - self.capacity, 0)
+        values = dict(
+            tai=times,
+            position=position.T,
+            velocity=velocity.T,
+            acceleration=acceleration.T,
+            torque=(acceleration * config.torque_per_accel[:, np.newaxis]).T,
+        )
+        self._header["reserved"] = count + nsamples
+        start = (count + skip) % self.capacity
+        # Write in at most two contiguous pieces: to the end of the buffer,
+        # then from the beginning.
+        nfirst = min(nsamples - skip, self.capacity - start)
+        for dest, source in (
+            (slice(start, start + nfirst), slice(skip, skip + nfirst)),
+            (slice(0, nsamples - skip - nfirst), slice(skip + nfirst, nsamples)),
+        ):
+            for name, value in values.items():
+                self.samples[name][dest] = value[source]
+        self._header["count"] = count + nsamples
+
+    def close(self):
+        """Flush the history and close the file.
+
+        The file is not deleted, so it can still be read.
+        """
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        self._header = None
+        self.samples = None
+        self._mmap = None
+
+
+class MountHistoryReader:
+    """Read a history written by `MountHistory`, with zero copies.
+
+    The file is mapped read-only, so it can be read by any process
+    on the same host while the simulator writes it.
+
+    Parameters
+    ----------
+    path : `str` or `pathlib.Path`
+        Path of the history file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a history file
+        or has an unsupported format version.
+
+    Attributes
+    ----------
+    naxes : `int`
+        Number of axes.
+    capacity : `int`
+        Maximum number of samples in the history.
+    samples : `numpy.ndarray`
+        The ring buffer, as a read-only memory-mapped structured array;
+        see `MountHistory`. Slots that have not been written are zero.
+        Use `get_latest` to get samples in time order.
+    """
+
+    def __init__(self, path):
+        mmap = np.memmap(path, dtype=np.uint8, mode="r")
+        if mmap.size < HEADER_SIZE:
+            raise ValueError(f"{path} is too short to be a history file")
+        self._header = mmap[: HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+        if self._header["magic"][0] != HISTORY_MAGIC:
+            raise ValueError(f"{path} is not a history file")
+        version = int(self._header["version"][0])
+        if version != HISTORY_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported history format version={version}; "
+                f"must be {HISTORY_FORMAT_VERSION}"
+            )
+        self.naxes = int(self._header["naxes"][0])
+        self.capacity = int(self._header["capacity"][0])
+        sample_dtype = make_sample_dtype(self.naxes)
+        nbytes = HEADER_SIZE + self.capacity * sample_dtype.itemsize
+        if mmap.size != nbytes:
+            raise ValueError(
+                f"{path} has {mmap.size} bytes; expected {nbytes} "
+                f"for naxes={self.naxes} and capacity={self.capacity}"
+            )
+        self.samples = mmap[HEADER_SIZE:].view(sample_dtype)
+
+    @property
+    def count(self):
+        """Total number of samples written."""
+        return int(self._header["count"][0])
+
+    def get_latest(self, nsamples=None):
+        """Get a copy of the most recent samples, in time order.
+
+        Parameters
+        ----------
+        nsamples : `int` (optional)
+            Maximum number of samples to return.
+            If None then return all samples in the history.
+
+        Returns
+        -------
+        samples : `numpy.ndarray`
+            The samples, as a structured array with the same fields
+            as ``self.samples``. This may have fewer than ``nsamples``
+            samples, if fewer have been written, or if the writer
+            overwrote some of the oldest while they were being copied
+            (those are omitted).
+        """
+        count = self.count
+        navailable = min(count, self.capacity)
+        nsamples = navailable if nsamples is None else min(nsamples, navailable)
+        first = count - nsamples
+        indices = np.arange(first, count) % self.capacity
+        samples = self.samples[indices]
+        # Omit samples the writer may have overwritten while we copied,
+        # including those overwritten by a write that is still in progress.
+        reserved = int(self._header["reserved"][0])
+        noverwritten = max(reserved - self.capacity - first, 0)
+        return samples[noverwritten:]
+
+    def close(self):
+        """Unmap the file."""
+        self._header = None
+        self.samples = None
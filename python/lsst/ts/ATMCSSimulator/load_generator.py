@@ -0,0 +1,578 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["LoadPattern", "LoadGenerator", "find_saturation", "load_amain"]
+
+import argparse
+import asyncio
+import enum
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts.idl.enums.ATMCS import AtMountState
+from .axis import MainAxes
+from .benchmark import summarize
+
+# Timeout for commands (sec).
+STD_TIMEOUT = 10
+
+# Time to wait for telemetry and events after the last trackTarget (sec);
+# long enough for the next output of telemetry at the default rate.
+SETTLE_TIME = 1.5
+
+# Sidereal rate (deg/sec).
+SIDEREAL_RATE = 360 / 86164.1
+
+# Position of each main axis at the start of every pattern (deg).
+START_POSITION = np.array([45, 10, 0, 0], dtype=float)
+
+# Sine pattern: amplitude (deg) and period (sec).
+SINE_AMPLITUDE = 1
+SINE_PERIOD = 20
+
+# Step pattern: offset of the second position from the first (deg),
+# and time between steps (sec).
+STEP_OFFSET = np.array([5, 5, 5, 5], dtype=float)
+STEP_INTERVAL = 5
+
+# Elevation of an out-of-range target (deg); above the maximum
+# commanded elevation of the default configuration.
+OUT_OF_RANGE_ELEVATION = 95
+
+
+class LoadPattern(enum.Enum):
+    """Motion described by the targets of a `LoadGenerator`.
+
+    * ``SIDEREAL``: all main axes move at the sidereal rate.
+    * ``SINE``: all main axes oscillate with amplitude
+      `SINE_AMPLITUDE` and period `SINE_PERIOD`.
+    * ``STEP``: all main axes jump by `STEP_OFFSET` and back,
+      holding each position for `STEP_INTERVAL` seconds;
+      this measures the time to ``allAxesInPosition``.
+    """
+
+    SIDEREAL = "sidereal"
+    SINE = "sine"
+    STEP = "step"
+
+
+class LoadGenerator:
+    """Drive a running ATMCS simulator with a stream of trackTarget
+    commands and measure how it responds.
+
+    Parameters
+    ----------
+    remote : `lsst.ts.salobj.Remote`
+        Remote for the ATMCS. The CSC must be enabled.
+    rate : `float`
+        Number of bursts of trackTarget commands per second.
+    duration : `float`
+        How long to send commands (sec).
+    burst_size : `int` (optional)
+        Number of trackTarget commands sent at once in each burst.
+        Each has its own ``trackId``.
+    jitter : `float` (optional)
+        Maximum random delay of each burst, as a fraction
+        of the interval between bursts; in the range [0, 1).
+    pattern : `LoadPattern` (optional)
+        Motion described by the targets.
+    late_fraction : `float` (optional)
+        Fraction of commands with a ``taiTime`` ``late_delay``
+        seconds before the time they are sent (and a position
+        and velocity for that time), so the simulator must
+        extrapolate them to the current time.
+    late_delay : `float` (optional)
+        How late the late commands are (sec).
+    out_of_range_fraction : `float` (optional)
+        Fraction of commands whose elevation is out of range.
+        The simulator rejects them and goes to fault;
+        if ``recover`` is true then the generator re-enables
+        the CSC and tracking, and counts the fault.
+    recover : `bool` (optional)
+        Re-enable the CSC and tracking after a fault?
+        If False then the generator stops sending at the first fault.
+    seed : `int` (optional)
+        Seed for the random number generator.
+        If None then the sequence is not reproducible.
+
+    Raises
+    ------
+    ValueError
+        If an argument is out of range.
+
+    Notes
+    -----
+    Commands are sent open-loop: each burst is sent on schedule,
+    whether or not the previous commands have been acknowledged,
+    so a simulator that cannot keep up shows increasing
+    acknowledgement latency rather than a reduced offered rate.
+
+    ``taiTime`` is the current TAI time of this process,
+    so the simulator must use a real-time clock.
+
+    `run` sets the callbacks of the remote's ``mount_AzEl_Encoders``
+    telemetry and ``allAxesInPosition`` event.
+    """
+
+    def __init__(
+        self,
+        remote,
+        rate,
+        duration,
+        burst_size=1,
+        jitter=0,
+        pattern=LoadPattern.SIDEREAL,
+        late_fraction=0,
+        late_delay=0.5,
+        out_of_range_fraction=0,
+        recover=True,
+        seed=None,
+    ):
+        if rate <= 0:
+            raise ValueError(f"rate={rate} must be positive")
+        if duration <= 0:
+            raise ValueError(f"duration={duration} must be positive")
+        if burst_size < 1:
+            raise ValueError(f"burst_size={burst_size} must be positive")
+        if not 0 <= jitter < 1:
+            raise ValueError(f"jitter={jitter} must be in the range [0, 1)")
+        for name, fraction in (
+            ("late_fraction", late_fraction),
+            ("out_of_range_fraction", out_of_range_fraction),
+        ):
+            if not 0 <= fraction <= 1:
+                raise ValueError(f"{name}={fraction} must be in the range [0, 1]")
+        if late_delay < 0:
+            raise ValueError(f"late_delay={late_delay} must not be negative")
+        self.remote = remote
+        self.rate = rate
+        self.duration = duration
+        self.burst_size = burst_size
+        self.jitter = jitter
+        self.pattern = LoadPattern(pattern)
+        self.late_fraction = late_fraction
+        self.late_delay = late_delay
+        self.out_of_range_fraction = out_of_range_fraction
+        self.recover = recover
+        self.random = random.Random(seed)
+
+        self.nsent = 0
+        self.nacked = 0
+        self.nrejected = 0
+        self.ntimeouts = 0
+        self.nfaults = 0
+        self.ack_latency = []
+        self.telemetry_delay = []
+        self.time_to_in_position = []
+        self.elapsed = 0
+        # Dict of trackId: perf_counter time at which it was sent.
+        self._send_times = dict()
+        # Dict of trackId: perf_counter time of the first telemetry
+        # that reported it.
+        self._telemetry_times = dict()
+        # perf_counter time at which the first target of a new motion
+        # (the start, a step, or after recovering from a fault) was sent,
+        # or None if waiting for allAxesInPosition is not wanted.
+        self._motion_start_time = None
+        self._in_position = None
+        self._track_id = 0
+        self._recover_task = salobj.make_done_future()
+
+    def get_target(self, elapsed):
+        """Get the target position and velocity for the pattern.
+
+        Parameters
+        ----------
+        elapsed : `float`
+            Time since the start of the pattern (sec).
+
+        Returns
+        -------
+        position : `numpy.ndarray`
+            Position of each main axis (deg), indexed by `MainAxes`.
+        velocity : `numpy.ndarray`
+            Velocity of each main axis (deg/sec).
+        """
+        if self.pattern == LoadPattern.SIDEREAL:
+            velocity = np.full(len(MainAxes), SIDEREAL_RATE)
+            return START_POSITION + elapsed * velocity, velocity
+        elif self.pattern == LoadPattern.SINE:
+            phase = 2 * math.pi * elapsed / SINE_PERIOD
+            position = START_POSITION + SINE_AMPLITUDE * math.sin(phase)
+            velocity = np.full(
+                len(MainAxes),
+                SINE_AMPLITUDE * 2 * math.pi / SINE_PERIOD * math.cos(phase),
+            )
+            return position, velocity
+        else:
+            nsteps = int(elapsed // STEP_INTERVAL)
+            return (
+                START_POSITION + (nsteps % 2) * STEP_OFFSET,
+                np.zeros(len(MainAxes)),
+            )
+
+    async def run(self):
+        """Start tracking, send the trackTarget commands,
+        then stop tracking and wait for the axes to halt.
+
+        If the CSC went to fault and ``recover`` is false then
+        the CSC is left in fault: tracking is not stopped.
+
+        Returns
+        -------
+        results : `dict`
+            The results; see `get_results`.
+        """
+        self.remote.tel_mount_AzEl_Encoders.callback = self._telemetry_callback
+        self.remote.evt_allAxesInPosition.callback = self._in_position_callback
+        await self.remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+        period = 1 / self.rate
+        nbursts = max(int(self.duration * self.rate), 1)
+        send_tasks = []
+        t0 = time.perf_counter()
+        previous_step = None
+        for i in range(nbursts):
+            send_time = t0 + (i + self.random.uniform(0, self.jitter)) * period
+            await asyncio.sleep(max(send_time - time.perf_counter(), 0))
+            if not self._recover_task.done():
+                await self._recover_task
+            if self.nfaults > 0 and not self.recover:
+                break
+            elapsed = time.perf_counter() - t0
+            if self.pattern == LoadPattern.STEP:
+                step = int(elapsed // STEP_INTERVAL)
+                if step != previous_step:
+                    self._start_motion()
+                    previous_step = step
+            elif i == 0:
+                self._start_motion()
+            for j in range(self.burst_size):
+                send_tasks.append(
+                    asyncio.ensure_future(self._send_track_target(elapsed))
+                )
+        # Each burst accounts for one interval.
+        self.elapsed = time.perf_counter() - t0 + period
+        await asyncio.gather(*send_tasks)
+        await asyncio.sleep(SETTLE_TIME)
+        await self._recover_task
+        if self.nfaults > 0 and not self.recover:
+            # The CSC is in fault, so it would reject stopTracking.
+            return self.get_results()
+        await self.remote.cmd_stopTracking.start(timeout=STD_TIMEOUT)
+        # Wait for the halt, so tracking can be started again.
+        mount_state = self.remote.evt_atMountState.get()
+        while mount_state is None or mount_state.state != AtMountState.TRACKINGDISABLED:
+            mount_state = await self.remote.evt_atMountState.next(
+                flush=False, timeout=STD_TIMEOUT
+            )
+        return self.get_results()
+
+    def _start_motion(self):
+        """Note that a new motion starts with the next target."""
+        self._motion_start_time = time.perf_counter()
+
+    async def _send_track_target(self, elapsed):
+        """Send one trackTarget command and record the outcome.
+
+        Parameters
+        ----------
+        elapsed : `float`
+            Time since the start of the pattern (sec).
+        """
+        self._track_id += 1
+        track_id = self._track_id
+        late = self.random.random() < self.late_fraction
+        out_of_range = self.random.random() < self.out_of_range_fraction
+        tai = salobj.current_tai()
+        if late:
+            tai -= self.late_delay
+            elapsed -= self.late_delay
+        position, velocity = self.get_target(elapsed)
+        if out_of_range:
+            position[0] = OUT_OF_RANGE_ELEVATION
+        data = self.remote.cmd_trackTarget.DataType()
+        for axis, name in enumerate(
+            ("elevation", "azimuth", "nasmyth1RotatorAngle", "nasmyth2RotatorAngle")
+        ):
+            setattr(data, name, position[axis])
+            setattr(data, f"{name}Velocity", velocity[axis])
+        data.taiTime = tai
+        data.trackId = track_id
+        data.tracksys = "SIDEREAL"
+        data.radesys = "ICRS"
+
+        self.nsent += 1
+        t0 = time.perf_counter()
+        self._send_times[track_id] = t0
+        try:
+            await self.remote.cmd_trackTarget.start(data, timeout=STD_TIMEOUT)
+            self.nacked += 1
+            self.ack_latency.append(time.perf_counter() - t0)
+        except salobj.AckTimeoutError:
+            self.ntimeouts += 1
+        except salobj.AckError:
+            self.nrejected += 1
+            # The simulator goes to fault if a target is out of range;
+            # the summaryState event may not have arrived yet.
+            summary_state = self.remote.evt_summaryState.get()
+            faulted = out_of_range or (
+                summary_state is not None
+                and summary_state.summaryState == salobj.State.FAULT
+            )
+            if faulted and self._recover_task.done():
+                self.nfaults += 1
+                if self.recover:
+                    self._recover_task = asyncio.ensure_future(self._recover())
+
+    async def _recover(self):
+        """Re-enable the CSC and tracking after a fault."""
+        summary_state = self.remote.evt_summaryState.get()
+        while summary_state is None or summary_state.summaryState != salobj.State.FAULT:
+            summary_state = await self.remote.evt_summaryState.next(
+                flush=False, timeout=STD_TIMEOUT
+            )
+        await salobj.set_summary_state(
+            self.remote, salobj.State.ENABLED, timeout=STD_TIMEOUT
+        )
+        await self.remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+        self._start_motion()
+
+    def _telemetry_callback(self, data):
+        track_id = data.trackId
+        if track_id in self._send_times and track_id not in self._telemetry_times:
+            t = time.perf_counter()
+            self._telemetry_times[track_id] = t
+            self.telemetry_delay.append(t - self._send_times[track_id])
+
+    def _in_position_callback(self, data):
+        if (
+            data.inPosition
+            and not self._in_position
+            and self._motion_start_time is not None
+        ):
+            self.time_to_in_position.append(
+                time.perf_counter() - self._motion_start_time
+            )
+            self._motion_start_time = None
+        self._in_position = data.inPosition
+
+    def get_results(self):
+        """Get the results.
+
+        Returns
+        -------
+        results : `dict`
+            The results, with these keys:
+
+            * ``rate``: requested number of commands per second
+              (``rate * burst_size``).
+            * ``achieved_rate``: number of commands sent per second:
+              ``nsent`` divided by the time from the first burst
+              to one interval after the last burst.
+            * ``nsent``, ``nacked``, ``nrejected``, ``ntimeouts``:
+              number of commands sent, acknowledged as done,
+              rejected and timed out.
+            * ``rejection_rate``: ``nrejected / nsent``.
+            * ``nfaults``: number of times the CSC went to fault.
+            * ``ack_latency``: time from sending a command to its
+              final acknowledgement, for commands that succeeded.
+            * ``telemetry_delay``: time from sending a command to
+              receiving the first ``mount_AzEl_Encoders`` telemetry
+              with its ``trackId``. Telemetry only reports the latest
+              ``trackId``, so commands that were superseded before
+              telemetry was output are not included.
+            * ``time_to_in_position``: time from sending the first
+              target of a motion (the first target, each step of
+              `LoadPattern.STEP`, or the first after a fault)
+              to ``allAxesInPosition`` becoming true.
+
+            The last three are summaries (see `summarize`),
+            or None if there are no samples.
+        """
+
+        def summarize_or_none(samples):
+            return summarize(samples) if samples else None
+
+        return dict(
+            rate=self.rate * self.burst_size,
+            achieved_rate=self.nsent / self.elapsed if self.elapsed > 0 else 0,
+            nsent=self.nsent,
+            nacked=self.nacked,
+            nrejected=self.nrejected,
+            ntimeouts=self.ntimeouts,
+            rejection_rate=self.nrejected / self.nsent if self.nsent > 0 else 0,
+            nfaults=self.nfaults,
+            ack_latency=summarize_or_none(self.ack_latency),
+            telemetry_delay=summarize_or_none(self.telemetry_delay),
+            time_to_in_position=summarize_or_none(self.time_to_in_position),
+        )
+
+
+async def find_saturation(remote, rates, duration, **kwargs):
+    """Run a `LoadGenerator` at increasing rates to find the rate
+    at which the simulator can no longer keep up.
+
+    Parameters
+    ----------
+    remote : `lsst.ts.salobj.Remote`
+        Remote for the ATMCS. The CSC must be enabled.
+    rates : ``iterable`` of `float`
+        Rates to try (bursts per second), in increasing order.
+    duration : `float`
+        How long to run at each rate (sec).
+    **kwargs : `dict`
+        Other arguments for `LoadGenerator`.
+
+    Returns
+    -------
+    results : `list` [`dict`]
+        The results for each rate tried (see `LoadGenerator.get_results`),
+        each with additional keys ``saturated`` and ``faulted``.
+        Stops after the first saturated rate, or the first rate
+        at which the CSC was left in fault (``faulted`` is true):
+        if ``recover`` is false, after the first fault.
+
+    Notes
+    -----
+    A rate is saturated if fewer than 95% of the commands
+    were sent on schedule, any command timed out,
+    or the median acknowledgement latency exceeds
+    the interval between bursts.
+    """
+    recover = kwargs.get("recover", True)
+    all_results = []
+    for rate in rates:
+        generator = LoadGenerator(remote=remote, rate=rate, duration=duration, **kwargs)
+        results = await generator.run()
+        ack_latency = results["ack_latency"]
+        results["saturated"] = (
+            results["achieved_rate"] < 0.95 * results["rate"]
+            or results["ntimeouts"] > 0
+            or (ack_latency is not None and ack_latency["median"] > 1 / rate)
+        )
+        # The CSC is left in fault, so no more rates can be tried.
+        results["faulted"] = results["nfaults"] > 0 and not recover
+        all_results.append(results)
+        if results["saturated"] or results["faulted"]:
+            break
+    return all_results
+
+
+async def load_amain():
+    """Run the load generator from the command line.
+
+    Returns
+    -------
+    nsaturated : `int`
+        1 if the simulator was saturated at one of the rates, else 0.
+    """
+    parser = argparse.ArgumentParser(
+        description="Drive a running ATMCS simulator with trackTarget commands "
+        "and measure its response, at one or more rates."
+    )
+    parser.add_argument(
+        "rates",
+        type=float,
+        nargs="+",
+        help="Bursts of trackTarget commands per second. If more than one, "
+        "try each in turn, stopping at the first that saturates the simulator.",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Duration of each run (sec)."
+    )
+    parser.add_argument("--burst-size", type=int, default=1, help="Commands per burst.")
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="Maximum random delay of each burst, as a fraction of the interval "
+        "between bursts.",
+    )
+    parser.add_argument(
+        "--pattern",
+        choices=[pattern.value for pattern in LoadPattern],
+        default=LoadPattern.SIDEREAL.value,
+        help="Motion described by the targets.",
+    )
+    parser.add_argument(
+        "--late-fraction",
+        type=float,
+        default=0,
+        help="Fraction of targets whose taiTime is in the past.",
+    )
+    parser.add_argument(
+        "--late-delay", type=float, default=0.5, help="How late late targets are (sec)."
+    )
+    parser.add_argument(
+        "--out-of-range-fraction",
+        type=float,
+        default=0,
+        help="Fraction of targets that are out of range. "
+        "Each puts the CSC in fault, after which it is re-enabled "
+        "(unless --no-recover is specified).",
+    )
+    parser.add_argument(
+        "--no-recover",
+        dest="recover",
+        action="store_false",
+        help="Stop sending at the first fault and leave the CSC in fault, "
+        "instead of re-enabling it.",
+    )
+    parser.add_argument("--seed", type=int, help="Random number seed.")
+    parser.add_argument(
+        "--enable",
+        action="store_true",
+        help="Enable the CSC first, if it is not already enabled.",
+    )
+    parser.add_argument("-o", "--output", help="JSON file to which to write results.")
+    args = parser.parse_args()
+
+    async with salobj.Domain() as domain, salobj.Remote(
+        domain=domain, name="ATMCS", index=0
+    ) as remote:
+        if args.enable:
+            await salobj.set_summary_state(
+                remote, salobj.State.ENABLED, timeout=STD_TIMEOUT
+            )
+        all_results = await find_saturation(
+            remote=remote,
+            rates=args.rates,
+            duration=args.duration,
+            burst_size=args.burst_size,
+            jitter=args.jitter,
+            pattern=args.pattern,
+            late_fraction=args.late_fraction,
+            late_delay=args.late_delay,
+            out_of_range_fraction=args.out_of_range_fraction,
+            recover=args.recover,
+            seed=args.seed,
+        )
+    for results in all_results:
+        print(json.dumps(results))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(all_results, f, indent=2)
+    return int(any(results["saturated"] for results in all_results))
@@ -19,27 +19,28 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-__all__ = ["ATMCSCsc", "Axis", "MainAxes"]
+__all__ = ["ATMCSCsc"]
 
 import asyncio
-import enum
-
-import numpy as np
+import contextlib
+import time
 
 from lsst.ts import salobj
-from lsst.ts import simactuators
-from lsst.ts.idl.enums.ATMCS import AtMountState, M3ExitPort, M3State
-
-
-class Axis(enum.IntEnum):
-    Elevation = 0
-    Azimuth = 1
-    NA1 = 2
-    NA2 = 3
-    M3 = 4
 
+from .axis import MainAxes
+from .clock import Clock, ScaledClock
+from .event_group import EventBatch, EventGroup
+from .history import MountHistory
+from .metrics import MetricsRegistry
+from .mount_model import MountModel
+from .path_utils import evaluate_paths
+from .recording import Recorder
+from .scheduler import DeadlineScheduler, OverrunPolicy
+from .telemetry import TELEMETRY_TOPICS, TelemetryRate, TelemetrySchedule
 
-MainAxes = (Axis.Elevation, Axis.Azimuth, Axis.NA1, Axis.NA2)
+# Delay after a predicted transition at which to update events (sec),
+# to be sure the transition has happened.
+TRANSITION_MARGIN = 1e-6
 
 
 class ATMCSCsc(salobj.BaseCsc):
@@ -50,6 +51,94 @@ class ATMCSCsc(salobj.BaseCsc):
     initial_state : `salobj.State` or `int` (optional)
         The initial state of the CSC. This is provided for unit testing,
         as real CSCs should start up in `State.STANDBY`, the default.
+    overrun_policy : `OverrunPolicy` (optional)
+        What `events_and_telemetry_loop` does if it falls behind schedule.
+    clock : `Clock` (optional)
+        Clock used for all times and delays in the simulator.
+        If None then use a real-time `Clock`. Specify a `ScaledClock`
+        or `VirtualClock` to simulate faster than real time.
+    metrics_interval : `float` (optional)
+        Interval between dumps of ``self.metrics`` (sec of real time).
+        If 0 (the default) then the metrics are not dumped.
+    metrics_path : `str` or `pathlib.Path` (optional)
+        File to which to append the metrics, one line of JSON per dump.
+        If None then write the metrics to the log.
+    index : `int` (optional)
+        SAL index. ATMCS is not an indexed SAL component,
+        so a nonzero index requires an ATMCS interface built as indexed
+        (as used to run many simulators at once; see `MultiCscHost`).
+    run_loop : `bool` (optional)
+        Run `events_and_telemetry_loop` while the CSC is enabled
+        or disabled? Specify False if something else will call
+        `update_events` and `write_telemetry`, such as `MultiCscHost`.
+    telemetry_rates : `dict` [`str`, `TelemetryRate`] (optional)
+        Output rate and decimation for some or all telemetry topics;
+        see `TelemetrySchedule`. By default every topic is output
+        every second, with every sample computed.
+    record_path : `str` or `pathlib.Path` (optional)
+        Directory in which to record the commands received
+        and the events and telemetry output; see `Recorder`.
+        Must not exist. If None then do not record.
+    history_path : `str` or `pathlib.Path` (optional)
+        File in which to keep a history of the motion of every axis;
+        see `MountHistory`. If None then do not keep a history.
+    history_capacity : `int` (optional)
+        Number of samples in the history.
+        The default holds 10 minutes at the default telemetry rate.
+
+    Attributes
+    ----------
+    clock : `Clock`
+        Clock used for all times and delays in the simulator.
+    loop_scheduler : `DeadlineScheduler`
+        Scheduler for `events_and_telemetry_loop`.
+        Call ``loop_scheduler.get_stats()`` for timing statistics.
+    telemetry_schedule : `TelemetrySchedule`
+        Which telemetry topics are output when;
+        set by the ``telemetry_rates`` argument and `configure`.
+    recorder : `Recorder` or `None`
+        Recorder of commands and output, or None if not recording.
+    history : `MountHistory` or `None`
+        History of the motion of every axis at each sample computed
+        for ``telemetry_schedule.finest_group``,
+        or None if not keeping a history.
+    metrics : `MetricsRegistry`
+        Timing metrics. Histograms (in seconds) are:
+
+        * ``update_events``: each call to `update_events`.
+        * ``update_telemetry``: each call to `update_telemetry`
+          (under `MultiCscHost`: writing this CSC's telemetry,
+          not including the path evaluation shared by all CSCs).
+        * ``loop_iteration``: the work done for each tick of
+          `events_and_telemetry_loop` (not including the wait).
+        * ``do_<command>``: each command handler, e.g. ``do_trackTarget``.
+
+        Counters are:
+
+        * ``events_output``: number of events output by `update_events`.
+        * ``update_events_failed``: number of calls to `update_events`
+          that raised an exception.
+        * ``update_telemetry_failed``: number of calls to `update_telemetry`
+          that raised an exception.
+    startup_times : `dict` [`str`, `float`]
+        Duration of each phase of startup (sec), in order:
+
+        * ``salobj``: constructing `lsst.ts.salobj.BaseCsc`,
+          which creates the SAL topics.
+        * ``model``: constructing the `MountModel` and its actuators.
+        * ``telemetry``: constructing the `TelemetrySchedule`
+          (and `MountHistory`, if any).
+        * ``event_groups``: constructing the `EventGroup` of each event.
+        * ``construct``: the whole constructor, including the above.
+        * ``start``: `start`, including starting the SAL components.
+        * ``initial_events``: the first call to `update_events`,
+          which outputs every event.
+        * ``ready``: from the start of the constructor to the end
+          of the first call to `update_events`.
+
+        Each phase is added when it ends, so phases that have not
+        happened yet (e.g. ``initial_events`` for a CSC in standby)
+        are missing.
 
     Notes
     -----
@@ -80,30 +169,55 @@ class ATMCSCsc(salobj.BaseCsc):
 
     valid_simulation_modes = [1]
 
-    def __init__(self, initial_state=salobj.State.STANDBY):
+    def __init__(
+        self,
+        initial_state=salobj.State.STANDBY,
+        overrun_policy=OverrunPolicy.CATCH_UP,
+        clock=None,
+        metrics_interval=0,
+        metrics_path=None,
+        index=0,
+        run_loop=True,
+        telemetry_rates=None,
+        record_path=None,
+        history_path=None,
+        history_capacity=60000,
+    ):
+        self.clock = Clock() if clock is None else clock
+        self.run_loop = run_loop
+        self.startup_times = dict()
+        self._startup_t0 = time.perf_counter()
+        t0 = self._startup_t0
         super().__init__(
-            name="ATMCS", index=0, initial_state=initial_state, simulation_mode=1
+            name="ATMCS", index=index, initial_state=initial_state, simulation_mode=1
+        )
+        t0 = self._record_startup_time("salobj", t0)
+        self.metrics = MetricsRegistry()
+        self.metrics_interval = metrics_interval
+        self.metrics_path = metrics_path
+        # Time every command handler.
+        for command_name in self.salinfo.command_names:
+            command = getattr(self, f"cmd_{command_name}")
+            command.callback = self.metrics.wrap(f"do_{command_name}", command.callback)
+        self._update_events_metric = self.metrics.histogram("update_events")
+        self._update_telemetry_metric = self.metrics.histogram("update_telemetry")
+        self._loop_iteration_metric = self.metrics.histogram("loop_iteration")
+        self._events_output_metric = self.metrics.counter("events_output")
+        self._update_events_failed_metric = self.metrics.counter(
+            "update_events_failed"
+        )
+        self._update_telemetry_failed_metric = self.metrics.counter(
+            "update_telemetry_failed"
+        )
+        # task that dumps the metrics every metrics_interval seconds
+        self._metrics_task = salobj.make_done_future()
+        # interval between event updates (sec)
+        self._event_interval = 0.1
+        self.loop_scheduler = DeadlineScheduler(
+            period=self._event_interval, policy=overrun_policy, clock=self.clock,
         )
-        # interval between telemetry updates (sec)
-        self._telemetry_interval = 1
-        # number of event updates per telemetry update
-        self._events_per_telemetry = 10
         # task that runs while the events_and_telemetry_loop runs
         self._events_and_telemetry_task = salobj.make_done_future()
-        # task that runs while axes are slewing to a halt from stopTracking
-        self._stop_tracking_task = salobj.make_done_future()
-        # task that runs while axes are halting before being disabled
-        self._disable_all_drives_task = salobj.make_done_future()
-        # Dict of M3ExitPort (the instrument port M3 points to): tuple of:
-        # * index of self.m3_port_positions: the M3 position for this port
-        # * M3State (state of M3 axis when pointing to this port)
-        # * Rotator axis at this port, as an Axis enum,
-        #   or None if this port has no rotator.
-        self._port_info_dict = {
-            M3ExitPort.NASMYTH1: (0, M3State.NASMYTH1, Axis.NA1),
-            M3ExitPort.NASMYTH2: (1, M3State.NASMYTH2, Axis.NA2),
-            M3ExitPort.PORT3: (2, M3State.PORT3, None),
-        }
         # Name of minimum limit switch event for each axis.
         self._min_lim_names = (
             "elevationLimitSwitchLower",
@@ -145,232 +259,361 @@ class ATMCSCsc(salobj.BaseCsc):
             ("nasmyth2Brake",),
             (),
         )
-        # Has tracking been enabled by startTracking?
-        # This remains true until stopTracking is called or the
-        # summary state is no longer salobj.State.Enabled,
-        # even if some drives have been disabled by running into limits.
-        self._tracking_enabled = False
-        # Is this particular axis enabled?
-        # This remains true until stopTracking is called or the
-        # summary state is no longer salobj.State.Enabled,
-        # or the axis runs into a limit.
-        # Note that the brakes automatically come on/off
-        # if the axis is disabled/enabled, respectively.
-        self._axis_enabled = np.zeros([5], dtype=bool)
-        # Timer to kill tracking if trackTarget doesn't arrive in time.
-        self._kill_tracking_timer = salobj.make_done_future()
-
-        self.configure()
+        # The deterministic model of the mount that this CSC wraps.
+        self.model = MountModel(tai=self.clock.tai())
+        t0 = self._record_startup_time("model", t0)
+        # Tracking watchdog timer: a handle from self.clock.call_later
+        # that calls _check_tracking_deadline, or None if not running.
+        # There is at most one, regardless of the trackTarget rate.
+        self._tracking_timer = None
+        # The value of self.model.tracking_deadline
+        # when self._tracking_timer was scheduled.
+        self._tracking_timer_deadline = None
+        # Event update timer: a handle from self.clock.call_later
+        # that calls _handle_event_update_timer, or None if not running.
+        # See _schedule_event_update.
+        self._event_update_timer = None
+        # Telemetry rates specified when constructed; used by reset.
+        self._initial_telemetry_rates = telemetry_rates
+        self.telemetry_schedule = TelemetrySchedule(
+            csc=self, tick_interval=self._event_interval, rates=telemetry_rates
+        )
+        self.history = (
+            None
+            if history_path is None
+            else MountHistory(path=history_path, capacity=history_capacity)
+        )
+        t0 = self._record_startup_time("telemetry", t0)
+
+        # Groups of events output by update_events.
+        # Each keeps the most recently output values,
+        # so only events whose value has changed are output.
+        # Limit switch events: the min, max switch for each axis.
+        self._limit_switch_events = EventGroup(
+            topics=[
+                getattr(self, f"evt_{name}")
+                for names in zip(self._min_lim_names, self._max_lim_names)
+                for name in names
+            ],
+            field_name="active",
+        )
+        self._brake_events = self._make_event_group(
+            names_per_axis=self._brake_names, field_name="engaged"
+        )
+        self._drive_status_events = self._make_event_group(
+            names_per_axis=self._drive_status_names, field_name="enable"
+        )
+        self._mount_state_event = EventGroup(
+            topics=[self.evt_atMountState], field_name="state", dtype=int
+        )
+        self._topple_block_events = EventGroup(
+            topics=[self.evt_azimuthToppleBlockCCW, self.evt_azimuthToppleBlockCW],
+            field_name="active",
+        )
+        # In position events: M3, each main axis, then all axes.
+        self._in_position_events = EventGroup(
+            topics=[self.evt_m3InPosition]
+            + [
+                getattr(self, f"evt_{self._in_position_names[axis]}")
+                for axis in MainAxes
+            ]
+            + [self.evt_allAxesInPosition],
+            field_name="inPosition",
+        )
+        self._m3_state_event = EventGroup(
+            topics=[self.evt_m3State], field_name="state", dtype=int
+        )
+        # M3 state most recently reported by evt_m3RotatorDetentSwitches.
+        self._detent_m3_state = None
+        # Events staged by update_events, which writes them all at the end.
+        self._event_batch = EventBatch()
+        t0 = self._record_startup_time("event_groups", t0)
+
+        # Record last, so the recorder sees commands as they arrive,
+        # before any other wrapper of the command callbacks.
+        self.recorder = (
+            None if record_path is None else Recorder(csc=self, path=record_path)
+        )
+
+        self._put_position_limits()
         # note: initial events are output by handle_summary_state
+        self.startup_times["construct"] = time.perf_counter() - self._startup_t0
+
+    def _record_startup_time(self, phase, t0):
+        """Record the duration of a startup phase in ``startup_times``.
+
+        Parameters
+        ----------
+        phase : `str`
+            Name of the phase.
+        t0 : `float`
+            Time at which the phase started (`time.perf_counter` sec).
+
+        Returns
+        -------
+        t1 : `float`
+            Time at which the phase ended, which is also the start
+            of the next phase (`time.perf_counter` sec).
+        """
+        t1 = time.perf_counter()
+        self.startup_times[phase] = t1 - t0
+        return t1
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument(
+            "--clock-scale",
+            type=float,
+            default=1,
+            help="Run the simulator this many times faster than real time. "
+            "Note that the times in trackTarget commands must then be "
+            "computed using the simulator's clock.",
+        )
+        parser.add_argument(
+            "--telemetry-rate",
+            nargs=3,
+            action="append",
+            metavar=("TOPIC", "INTERVAL", "DECIMATION"),
+            help="Output telemetry topic TOPIC (without the tel_ prefix) "
+            "every INTERVAL seconds (0 to disable it), computing every "
+            "DECIMATION-th sample. May be repeated. "
+            f"Topics are: {', '.join(TELEMETRY_TOPICS)}.",
+        )
+        parser.add_argument(
+            "--metrics-interval",
+            type=float,
+            default=0,
+            help="Interval between dumps of timing metrics (sec); "
+            "0 to not dump metrics.",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            help="File to which to append timing metrics, as one line of JSON "
+            "per dump. If omitted then metrics are written to the log.",
+        )
+        parser.add_argument(
+            "--record",
+            help="Directory in which to record commands, events and telemetry; "
+            "must not exist. Replay the recording with run_atmcs_replay.py.",
+        )
+        parser.add_argument(
+            "--history-file",
+            help="File in which to keep a memory-mapped history of the motion "
+            "of every axis, which other processes can read with "
+            "MountHistoryReader. If omitted then no history is kept.",
+        )
+        parser.add_argument(
+            "--history-capacity",
+            type=int,
+            default=60000,
+            help="Number of samples in the history.",
+        )
+
+    @classmethod
+    def add_kwargs_from_args(cls, args, kwargs):
+        if args.clock_scale != 1:
+            kwargs["clock"] = ScaledClock(scale=args.clock_scale)
+        kwargs["metrics_interval"] = args.metrics_interval
+        kwargs["metrics_path"] = args.metrics_file
+        kwargs["record_path"] = args.record
+        kwargs["history_path"] = args.history_file
+        kwargs["history_capacity"] = args.history_capacity
+        if args.telemetry_rate:
+            kwargs["telemetry_rates"] = {
+                topic: TelemetryRate(
+                    interval=float(interval), decimation=int(decimation)
+                )
+                for topic, interval, decimation in args.telemetry_rate
+            }
+
+    async def start(self):
+        t0 = time.perf_counter()
+        await super().start()
+        self._record_startup_time("start", t0)
+        if self.metrics_interval > 0:
+            self._metrics_task = asyncio.ensure_future(self.metrics_loop())
 
     async def close_tasks(self):
         await super().close_tasks()
-        self._disable_all_drives_task.cancel()
-        self._stop_tracking_task.cancel()
+        self._metrics_task.cancel()
         self._events_and_telemetry_task.cancel()
-        self._kill_tracking_timer.cancel()
+        self._set_tracking_timer(restart=False)
+        self._cancel_event_update()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.history is not None:
+            self.history.close()
 
-    def configure(
-        self,
-        max_tracking_interval=2.5,
-        min_commanded_position=(5, -270, -165, -165, 0),
-        max_commanded_position=(90, 270, 165, 165, 180),
-        min_limit_switch_position=(3, -272, -167, -167, -2),
-        max_limit_switch_position=(92, 272, 167, 167, 182),
-        max_velocity=(5, 5, 5, 5, 5),
-        max_acceleration=(3, 3, 3, 3, 3),
-        topple_azimuth=(2, 5),
-        m3_port_positions=(0, 180, 90),
-        needed_in_pos=3,
-        axis_encoder_counts_per_deg=(3.6e6, 3.6e6, 3.6e6, 3.6e6, 3.6e6),
-        motor_encoder_counts_per_deg=(3.6e5, 3.6e5, 3.6e5, 3.6e5, 3.6e5),
-        motor_axis_ratio=(100, 100, 100, 100, 100),
-        torque_per_accel=(1, 1, 1, 1, 1),
-        nsettle=2,
-        limit_overtravel=1,
-    ):
+    @property
+    def actuators(self):
+        """Actuator for each axis, indexed by `Axis`.
+
+        An alias for ``self.model.actuators``.
+        """
+        return self.model.actuators
+
+    def configure(self, telemetry_rates=None, **kwargs):
         """Set configuration.
 
         Parameters
         ----------
-        max_tracking_interval : `float`
-            Maximum time between tracking updates (sec)
-        min_commanded_position : ``iterable`` of 5 `float`
-            Minimum commanded position for each axis, in deg
-        max_commanded_position : ``iterable`` of 5 `float`
-            Minimum commanded position for each axis, in deg
-        min_limit_switch_position : ``iterable`` of 5 `float`
-            Position of minimum L1 limit switch for each axis, in deg
-        max_limit_switch_position : ``iterable`` of 5 `float`
-            Position of maximum L1 limit switch for each axis, in deg
-        max_velocity : ``iterable`` of 5 `float`
-            Maximum velocity of each axis, in deg/sec
-        max_acceleration : ``iterable`` of 5 `float`
-            Maximum acceleration of each axis, in deg/sec
-        topple_azimuth : ``iterable`` of 2 `float`
-            Min, max azimuth at which the topple block moves, in deg
-        m3_port_positions : ``iterable`` of 3 `float`
-            M3 position of instrument ports NA1, NA2 and Port3,
-            in that order.
-        axis_encoder_counts_per_deg : `list` [`float`]
-            Axis encoder resolution, for each axis, in counts/deg
-        motor_encoder_counts_per_deg : `list` [`float`]
-            Motor encoder resolution, for each axis, in counts/deg
-        motor_axis_ratio : `list` [`float`]
-            Number of turns of the motor for one turn of the axis.
-        torque_per_accel :  `list` [`float`]
-            Motor torque per unit of acceleration,
-            in units of measuredTorque/(deg/sec^2)
-        nsettle : `int`
-            Number of consecutive trackPosition commands that result in
-            a tracking path before we report an axis is tracking.
-        limit_overtravel : `float`
-            Distance from limit switches to hard stops (deg).
+        telemetry_rates : `dict` [`str`, `TelemetryRate`] (optional)
+            Output rate and decimation for some or all telemetry topics;
+            topics that are not listed are output every second,
+            with every sample computed. See `TelemetrySchedule`
+            for details. If None then the rates are not changed.
+        **kwargs : `dict`
+            Configuration; see `MountModel.configure`
+            for the arguments and defaults.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If the configuration is invalid,
+            in which case the configuration is not changed.
         """
+        self._configure(
+            method_name="configure", telemetry_rates=telemetry_rates, kwargs=kwargs
+        )
 
-        def convert_values(name, values, nval):
-            out = np.array(values, dtype=float)
-            if out.shape != (nval,):
-                raise salobj.ExpectedError(
-                    f"Could not format {name}={values!r} as {nval} floats"
-                )
-            return out
+    def reconfigure(self, telemetry_rates=None, **kwargs):
+        """Change some configuration parameters,
+        without interrupting the motion of any axis.
 
-        # convert and check all values first,
-        # so nothing changes if any input is invalid
-        min_commanded_position = convert_values(
-            "min_commanded_position", min_commanded_position, 5
-        )
-        max_commanded_position = convert_values(
-            "max_commanded_position", max_commanded_position, 5
-        )
-        min_limit_switch_position = convert_values(
-            "min_limit_switch_position", min_limit_switch_position, 5
-        )
-        max_limit_switch_position = convert_values(
-            "max_limit_switch_position", max_limit_switch_position, 5
+        Parameters
+        ----------
+        telemetry_rates : `dict` [`str`, `TelemetryRate`] (optional)
+            Output rate and decimation for some or all telemetry topics;
+            see `configure`. If None then the rates are not changed.
+        **kwargs : `dict`
+            The configuration parameters to change;
+            see `MountModel.reconfigure`.
+
+        Raises
+        ------
+        TypeError
+            If a parameter name is not known.
+        lsst.ts.salobj.ExpectedError
+            If the configuration is invalid,
+            in which case the configuration is not changed.
+        """
+        self._configure(
+            method_name="reconfigure", telemetry_rates=telemetry_rates, kwargs=kwargs
         )
-        max_velocity = convert_values("max_velocity", max_velocity, 5)
-        max_acceleration = convert_values("max_acceleration", max_acceleration, 5)
-        if max_velocity.min() <= 0:
-            raise salobj.ExpectedError(
-                f"max_velocity={max_velocity}; all values must be positive"
-            )
-        if max_acceleration.min() <= 0:
-            raise salobj.ExpectedError(
-                f"max_acceleration={max_acceleration}; all values must be positive"
+
+    def _configure(self, method_name, telemetry_rates, kwargs):
+        """Implement `configure` and `reconfigure`.
+
+        Parameters
+        ----------
+        method_name : `str`
+            Name of the `MountModel` method to call:
+            "configure" or "reconfigure".
+        telemetry_rates : `dict` [`str`, `TelemetryRate`] or `None`
+            Output rate and decimation for some or all telemetry topics.
+        kwargs : `dict`
+            Arguments for the `MountModel` method, other than ``tai``.
+        """
+        if telemetry_rates is not None:
+            telemetry_schedule = TelemetrySchedule(
+                csc=self, tick_interval=self._event_interval, rates=telemetry_rates
             )
-        topple_azimuth = convert_values("topple_azimuth", topple_azimuth, 2)
-        m3_port_positions = convert_values("m3_port_positions", m3_port_positions, 3)
-        axis_encoder_counts_per_deg = convert_values(
-            "axis_encoder_counts_per_deg", axis_encoder_counts_per_deg, 5
-        )
-        motor_encoder_counts_per_deg = convert_values(
-            "motor_encoder_counts_per_deg", motor_encoder_counts_per_deg, 5
-        )
-        motor_axis_ratio = convert_values("motor_axis_ratio", motor_axis_ratio, 5)
-        torque_per_accel = convert_values("torque_per_accel", torque_per_accel, 5)
-        if limit_overtravel < 0:
-            raise ValueError(f"limit_overtravel={limit_overtravel} must be >= 0")
-
-        self.max_tracking_interval = max_tracking_interval
-        self.min_commanded_position = min_commanded_position
-        self.max_commanded_position = max_commanded_position
-        self.min_limit_switch_position = min_limit_switch_position
-        self.max_limit_switch_position = max_limit_switch_position
-        self.max_velocity = max_velocity
-        self.topple_azimuth = topple_azimuth
-        self.m3_port_positions = m3_port_positions
-        self.axis_encoder_counts_per_deg = axis_encoder_counts_per_deg
-        self.motor_encoder_counts_per_deg = motor_encoder_counts_per_deg
-        self.motor_axis_ratio = motor_axis_ratio
-        self.torque_per_accel = torque_per_accel
-        self.nsettle = nsettle
-        # allowed position error for M3 to be considered in position (deg)
-        self.m3tolerance = 1e-5
-        self.limit_overtravel = limit_overtravel
-
-        tai = salobj.current_tai()
-        self.actuators = [
-            simactuators.TrackingActuator(
-                min_position=self.min_commanded_position[axis],
-                max_position=self.max_commanded_position[axis],
-                max_velocity=max_velocity[axis],
-                max_acceleration=max_acceleration[axis],
-                # Use 0 for M3 to prevent tracking.
-                dtmax_track=0 if axis == 4 else self.max_tracking_interval,
-                nsettle=self.nsettle,
-                tai=tai,
+        getattr(self.model, method_name)(tai=self.clock.tai(), **kwargs)
+        if telemetry_rates is not None:
+            self.telemetry_schedule = telemetry_schedule
+        if self.model.tracking_deadline is not None:
+            # The tracking deadline may have moved earlier
+            # (see `MountModel.reconfigure`).
+            self._set_tracking_timer(restart=True)
+        if self.recorder is not None:
+            self.recorder.record_configure(
+                dict(kwargs)
+                if telemetry_rates is None
+                else dict(kwargs, telemetry_rates=telemetry_rates),
+                method_name=method_name,
             )
-            for axis in Axis
-        ]
-        self.actuators[0].verbose = True
+        self._put_position_limits()
+        self._schedule_event_update(tai=self.clock.tai())
+
+    def reset(self):
+        """Return the mount to the state it had when constructed.
+
+        Replace the mount model with a new one that has the default
+        configuration, restore the telemetry rates specified when
+        constructed, and arrange for the next `update_events`
+        to output every event, as for a newly constructed CSC.
+        This allows one CSC to be reused by many unit tests;
+        see `SharedCscTestCase`.
+
+        The recorder and history (if any) are not affected.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If the CSC is disabled or enabled.
+        """
+        if self.summary_state in (salobj.State.DISABLED, salobj.State.ENABLED):
+            raise salobj.ExpectedError(f"Cannot reset in state {self.summary_state!r}")
+        self._set_tracking_timer(restart=False)
+        self._cancel_event_update()
+        self.model = MountModel(tai=self.clock.tai())
+        self.telemetry_schedule = TelemetrySchedule(
+            csc=self,
+            tick_interval=self._event_interval,
+            rates=self._initial_telemetry_rates,
+        )
+        for event_group in (
+            self._limit_switch_events,
+            self._brake_events,
+            self._drive_status_events,
+            self._mount_state_event,
+            self._topple_block_events,
+            self._in_position_events,
+            self._m3_state_event,
+        ):
+            event_group.invalidate(force_output=True)
+        self._detent_m3_state = None
+        self._put_position_limits()
 
+    def _put_position_limits(self):
+        """Output the positionLimits event."""
         self.evt_positionLimits.set_put(
-            minimum=min_commanded_position,
-            maximum=max_commanded_position,
+            minimum=self.model.min_commanded_position,
+            maximum=self.model.max_commanded_position,
             force_output=True,
         )
 
     def do_startTracking(self, data):
         self.assert_enabled("startTracking")
-        if not self.evt_m3InPosition.data.inPosition:
-            raise salobj.ExpectedError(
-                "Cannot startTracking until M3 is at a known position"
-            )
-        if not self._stop_tracking_task.done():
-            raise salobj.ExpectedError("stopTracking not finished yet")
-        self._tracking_enabled = True
+        self.model.start_tracking(tai=self.clock.tai())
         self.update_events()
         self._set_tracking_timer(restart=True)
 
     def do_trackTarget(self, data):
         self.assert_enabled("trackTarget")
-        if not self._tracking_enabled:
+        if not self.model.tracking_enabled:
             raise salobj.ExpectedError("Cannot trackTarget until tracking is enabled")
         try:
-            position = np.array(
-                [
+            self.model.track_target(
+                tai=self.clock.tai(),
+                target_tai=data.taiTime,
+                position=[
                     data.elevation,
                     data.azimuth,
                     data.nasmyth1RotatorAngle,
                     data.nasmyth2RotatorAngle,
                 ],
-                dtype=float,
-            )
-            velocity = np.array(
-                [
+                velocity=[
                     data.elevationVelocity,
                     data.azimuthVelocity,
                     data.nasmyth1RotatorAngleVelocity,
                     data.nasmyth2RotatorAngleVelocity,
                 ],
-                dtype=float,
             )
-            dt = salobj.current_tai() - data.taiTime
-            current_position = position + dt * velocity
-            if np.any(current_position < self.min_commanded_position[0:4]) or np.any(
-                current_position > self.max_commanded_position[0:4]
-            ):
-                raise salobj.ExpectedError(
-                    f"One or more target positions {current_position} not in range "
-                    f"{self.min_commanded_position} to {self.max_commanded_position} "
-                    "at the current time"
-                )
-            if np.any(np.abs(velocity) > self.max_velocity[0:4]):
-                raise salobj.ExpectedError(
-                    "Magnitude of one or more target velocities "
-                    f"{velocity} > {self.max_velocity}"
-                )
         except Exception as e:
             self.fault(code=1, report=f"trackTarget failed: {e}")
             raise
 
-        for i in range(4):
-            self.actuators[i].set_target(
-                tai=data.taiTime, position=position[i], velocity=velocity[i]
-            )
-
         target_fields = (
             "azimuth",
             "azimuthVelocity",
@@ -391,185 +634,245 @@ class ATMCSCsc(salobj.BaseCsc):
         self.tel_mount_Nasmyth_Encoders.set(trackId=data.trackId)
 
         self._set_tracking_timer(restart=True)
+        self._schedule_event_update(tai=self.clock.tai())
+
+    def load_trajectory(self, target_tai, position, velocity, track_id=0):
+        """Load a block of future targets for the main axes.
+
+        This is a Python alternative to sending one ``trackTarget``
+        command per target: the block is validated in one pass
+        and each target is applied on schedule by `update_events`.
+        See `MountModel.load_trajectory` for details.
+
+        Parameters
+        ----------
+        target_tai : ``iterable`` of `float`
+            Time of each target, TAI unix seconds;
+            must be strictly increasing.
+        position : ``iterable`` of ``iterable`` of 4 `float`
+            Target position of each main axis (deg), one row per target,
+            in the order elevation, azimuth, nasmyth1, nasmyth2.
+        velocity : ``iterable`` of ``iterable`` of 4 `float`
+            Target velocity of each main axis (deg/sec),
+            one row per target.
+        track_id : `int` (optional)
+            Tracking ID reported in the ``mount_AzEl_Encoders``
+            and ``mount_Nasmyth_Encoders`` telemetry.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If the CSC is not enabled, tracking is not enabled,
+            or the block is invalid. Unlike ``trackTarget``,
+            a rejected block does not send the CSC to fault.
+
+        Notes
+        -----
+        The ``target`` event is not output for targets in a block,
+        and blocks are not recorded by `Recorder`.
+        """
+        self.assert_enabled("load_trajectory")
+        self.model.load_trajectory(
+            tai=self.clock.tai(),
+            target_tai=target_tai,
+            position=position,
+            velocity=velocity,
+        )
+        self.tel_mount_AzEl_Encoders.set(trackId=track_id)
+        self.tel_mount_Nasmyth_Encoders.set(trackId=track_id)
+        self._set_tracking_timer(restart=True)
+        self._schedule_event_update(tai=self.clock.tai())
+
+    def _schedule_event_update(self, tai=None):
+        """Schedule a call to `update_events`, replacing any call
+        already scheduled by this method.
+
+        Events are updated when something changes, rather than by polling:
+        immediately after a command that changes the model, and
+        at each transition predicted by `MountModel.next_transition_tai`.
+        Nothing is scheduled unless `events_and_telemetry_loop` should be
+        running (``run_loop`` is true and the CSC is disabled or enabled),
+        since otherwise something else is responsible for
+        calling `update_events` (e.g. `MultiCscHost`), with one exception:
+        a halt started by `disable_all_drives` or ``stopTracking``
+        is always finished at the predicted time, so that the drives
+        are disabled as soon as the axes stop, regardless of state.
+
+        Parameters
+        ----------
+        tai : `float` (optional)
+            Time at which to update events (TAI unix seconds).
+            If None then use the next transition predicted by
+            `MountModel.next_transition_tai`, if any.
+        """
+        self._cancel_event_update()
+        halting = (
+            self.model.stop_tracking_end_tai is not None
+            or self.model.disable_drives_end_tai is not None
+        )
+        active = self.summary_state in (salobj.State.DISABLED, salobj.State.ENABLED)
+        if not halting and not (self.run_loop and active):
+            return
+        current_tai = self.clock.tai()
+        if tai is None:
+            tai = self.model.next_transition_tai(current_tai)
+            if tai is None:
+                return
+            tai += TRANSITION_MARGIN
+        self._event_update_timer = self.clock.call_later(
+            max(tai - current_tai, 0), self._handle_event_update_timer
+        )
+
+    def _cancel_event_update(self):
+        """Cancel the call to `update_events` scheduled by
+        `_schedule_event_update`, if any.
+        """
+        if self._event_update_timer is not None:
+            self._event_update_timer.cancel()
+            self._event_update_timer = None
+
+    def _handle_event_update_timer(self):
+        """Update events. Called by the event update timer."""
+        self._event_update_timer = None
+        try:
+            self.update_events()
+        except Exception:
+            # update_events logged the error and counted it in self.metrics.
+            pass
 
     def _set_tracking_timer(self, restart):
-        """Restart or stop the tracking timer.
+        """Start or stop the tracking watchdog.
+
+        The watchdog goes to fault if ``self.model.tracking_deadline``
+        (which each ``trackTarget`` moves forward) passes.
+        Moving the deadline forward does not touch the timer;
+        when the timer fires it reschedules itself for the new deadline.
 
         Parameters
         ----------
         restart : `bool`
-            If True then start or restart the tracking timer, else stop it.
+            If True then make sure the watchdog is running
+            and will fire no later than the current deadline,
+            else stop it.
         """
-        self._kill_tracking_timer.cancel()
         if restart:
-            self._kill_tracking_timer = asyncio.ensure_future(self.kill_tracking())
+            if (
+                self._tracking_timer is not None
+                and self._tracking_timer_deadline <= self.model.tracking_deadline
+            ):
+                return
+            self._schedule_tracking_timer()
+        elif self._tracking_timer is not None:
+            self._tracking_timer.cancel()
+            self._tracking_timer = None
+
+    def _schedule_tracking_timer(self):
+        """Schedule the tracking watchdog timer
+        for ``self.model.tracking_deadline``.
+        """
+        if self._tracking_timer is not None:
+            self._tracking_timer.cancel()
+        deadline = self.model.tracking_deadline
+        self._tracking_timer_deadline = deadline
+        self._tracking_timer = self.clock.call_later(
+            max(deadline - self.clock.tai(), 0), self._check_tracking_deadline
+        )
 
     def do_setInstrumentPort(self, data):
         self.assert_enabled("setInstrumentPort")
-        if self._tracking_enabled:
-            raise salobj.ExpectedError(
-                "Cannot setInstrumentPort while tracking is enabled"
-            )
-        port = data.port
-        try:
-            m3_port_positions_ind = self._port_info_dict[port][0]
-        except IndexError:
-            raise salobj.ExpectedError(f"Invalid port={port}")
-        try:
-            m3_port_positions = self.m3_port_positions[m3_port_positions_ind]
-        except IndexError:
-            raise RuntimeError(
-                f"Bug! invalid m3_port_positions_ind={m3_port_positions_ind} for port={port}"
-            )
-        self.evt_m3PortSelected.set_put(selected=port)
-        m3actuator = self.actuators[Axis.M3]
-        if (
-            m3actuator.target.position == m3_port_positions
-            and self.evt_m3InPosition.data.inPosition
-        ):
-            # already there; don't do anything
-            return
-        self.actuators[Axis.M3].set_target(
-            tai=salobj.current_tai(), position=m3_port_positions, velocity=0
-        )
-        self._axis_enabled[Axis.NA1] = False
-        self._axis_enabled[Axis.NA2] = False
-        self.update_events()
+        moving = self.model.set_instrument_port(tai=self.clock.tai(), port=data.port)
+        self.evt_m3PortSelected.set_put(selected=data.port)
+        if moving:
+            self.update_events()
 
     async def do_stopTracking(self, data):
         self.assert_enabled("stopTracking")
-        if not self._stop_tracking_task.done():
-            raise salobj.ExpectedError("Already stopping")
+        self.model.stop_tracking(tai=self.clock.tai())
         self._set_tracking_timer(restart=False)
-        self._tracking_enabled = False
-        for axis in MainAxes:
-            self.actuators[axis].stop()
-        self._stop_tracking_task.cancel()
-        self._stop_tracking_task = asyncio.ensure_future(self._finish_stop_tracking())
         self.update_events()
 
-    async def kill_tracking(self):
-        """Wait ``self.max_tracking_interval`` seconds and disable tracking.
+    def _check_tracking_deadline(self):
+        """Go to fault if the tracking deadline has passed,
+        else reschedule the watchdog timer for the deadline.
 
-        Intended for use by `do_trackTarget` to abort tracking
-        if the next ``trackTarget`` command is not seen quickly enough.
+        Called by the tracking watchdog timer.
         """
-        await asyncio.sleep(self.max_tracking_interval)
+        self._tracking_timer = None
+        deadline = self.model.tracking_deadline
+        if deadline is None:
+            # Tracking was disabled.
+            return
+        if self.clock.tai() < deadline:
+            self._schedule_tracking_timer()
+            return
         self.fault(
-            code=2, report=f"trackTarget not seen in {self.max_tracking_interval} sec"
+            code=2,
+            report=f"trackTarget not seen in {self.model.max_tracking_interval} sec",
         )
 
     def disable_all_drives(self):
         """Stop all drives, disable them and put on brakes.
-        """
-        self._tracking_enabled = False
-        already_stopped = True
-        tai = salobj.current_tai()
-        for axis in Axis:
-            actuator = self.actuators[axis]
-            if actuator.kind(tai) == actuator.Kind.Stopped:
-                self._axis_enabled[axis] = False
-            else:
-                already_stopped = False
-                actuator.stop()
-        self._disable_all_drives_task.cancel()
-        if not already_stopped:
-            self._disable_all_drives_task = asyncio.ensure_future(
-                self._finish_disable_all_drives()
-            )
-        self.update_events()
 
-    async def _finish_disable_all_drives(self):
-        """Wait for the main axes to stop.
-        """
-        end_times = [actuator.path[-1].tai for actuator in self.actuators]
-        max_end_time = max(end_times)
-        # give a bit of margin to be sure the axes are stopped
-        dt = 0.1 + max_end_time - salobj.current_tai()
-        if dt > 0:
-            await asyncio.sleep(dt)
-        for axis in Axis:
-            self._axis_enabled[axis] = False
-        asyncio.ensure_future(self._run_update_events())
-
-    async def _finish_stop_tracking(self):
-        """Wait for the main axes to stop.
+        Axes that are moving are disabled once all axes have stopped,
+        when `update_events` runs at the end of the halt predicted by
+        `MountModel.next_transition_tai` (see `_schedule_event_update`).
         """
-        end_times = [self.actuators[axis].path[-1].tai for axis in MainAxes]
-        max_end_time = max(end_times)
-        dt = 0.1 + max_end_time - salobj.current_tai()
-        if dt > 0:
-            await asyncio.sleep(dt)
-        asyncio.ensure_future(self._run_update_events())
-
-    async def _run_update_events(self):
-        """Sleep then run update_events.
-
-        Used to call update_events shortly after the _disable_all_drives_task
-        _stop_tracking_task are done.
-        """
-        await asyncio.sleep(0)
+        self.model.disable_all_drives(tai=self.clock.tai())
+        self._set_tracking_timer(restart=False)
         self.update_events()
 
     def m3_port_rot(self, tai):
         """Return exit port and rotator axis.
 
-        Parameters
-        ----------
-        tai : `float`
-            Current time, TAI unix seconds.
-
-        Returns
-        -------
-        port_rot : `tuple`
-            Exit port and rotator axis, as a tuple:
-
-            * exit port: an M3ExitPort enum value
-            * rotator axis: the instrument rotator at this port,
-              as an Axis enum value, or None if the port has no rotator.
+        See `MountModel.m3_port_rot`.
         """
-        if not self.m3_in_position(tai):
-            return (None, None)
-        target_position = self.actuators[Axis.M3].target.position
-        for exit_port, (ind, m3state, rot_axis) in self._port_info_dict.items():
-            if self.m3_port_positions[ind] == target_position:
-                return (exit_port, rot_axis)
-        return (None, None)
+        return self.model.m3_port_rot(tai)
 
     def m3_in_position(self, tai):
         """Is the M3 actuator in position?
 
-        Parameters
-        ----------
-        tai : `float`
-            Current time, TAI unix seconds.
+        See `MountModel.m3_in_position`.
         """
-        m3actuator = self.actuators[Axis.M3]
-        if m3actuator.kind(tai) != m3actuator.Kind.Stopped:
-            return False
-        m3target_position = m3actuator.target.position
-        m3current = m3actuator.path[-1].at(tai)
-        m3position_difference = abs(m3target_position - m3current.position)
-        return m3position_difference < self.m3tolerance
+        return self.model.m3_in_position(tai)
 
     async def handle_summary_state(self):
         if self.summary_state == salobj.State.ENABLED:
-            axes_to_enable = set((Axis.Elevation, Axis.Azimuth))
-            tai = salobj.current_tai()
-            rot_axis = self.m3_port_rot(tai)[1]
-            if rot_axis is not None:
-                axes_to_enable.add(rot_axis)
-            for axis in Axis:
-                self._axis_enabled[axis] = axis in axes_to_enable
+            self.model.enable_drives(tai=self.clock.tai())
+            self._schedule_event_update(tai=self.clock.tai())
         else:
             self.disable_all_drives()
         if self.summary_state in (salobj.State.DISABLED, salobj.State.ENABLED):
-            if self._events_and_telemetry_task.done():
+            if self.run_loop and self._events_and_telemetry_task.done():
                 self._events_and_telemetry_task = asyncio.ensure_future(
                     self.events_and_telemetry_loop()
                 )
         else:
             self._events_and_telemetry_task.cancel()
+            self._schedule_event_update()
+
+    def _make_event_group(self, names_per_axis, field_name):
+        """Make an `EventGroup` for events that report per-axis values.
+
+        Parameters
+        ----------
+        names_per_axis : ``iterable`` [``iterable`` [`str`]]
+            Event names (without the ``evt_`` prefix) for each axis;
+            an axis may have zero or more events.
+        field_name : `str`
+            Name of the field to set.
+
+        Returns
+        -------
+        event_group : `EventGroup`
+            The event group. The ``values`` argument to ``update``
+            is an array with one value per axis.
+        """
+        topics = []
+        indices = []
+        for axis, names in enumerate(names_per_axis):
+            topics += [getattr(self, f"evt_{name}") for name in names]
+            indices += [axis] * len(names)
+        return EventGroup(topics=topics, field_name=field_name, indices=indices)
 
     def set_event(self, evt_name, **kwargs):
         """Call ``ControllerEvent.set_put`` for an event specified by name.
@@ -635,346 +938,162 @@ class ATMCSCsc(salobj.BaseCsc):
         * ``nasmyth1Brake``
         * ``nasmyth2Brake``
 
-        Report events that have changed,
-        and for axes that have run into a limit switch, abort the axis,
-        disable its drives and set its brakes.
+        Advance ``self.model`` to the current time with `MountModel.step`
+        (which, for axes that have run into a limit switch, aborts the axis
+        and disables its drives) and report events that have changed,
+        reading them all from ``self.model.state`` (a `MountState`).
+        Changed events are staged in an `EventBatch` and written together
+        at the end, so they report a consistent snapshot of the model.
+        Then schedule the next call for the next predicted transition
+        (see `_schedule_event_update`).
         """
+        t0 = time.perf_counter()
         try:
-            tai = salobj.current_tai()
-            current_position = np.array(
-                [actuator.path.at(tai).position for actuator in self.actuators],
-                dtype=float,
-            )
-            m3actuator = self.actuators[Axis.M3]
-            axes_in_use = set([Axis.Elevation, Axis.Azimuth, Axis.M3])
-
-            # Handle M3 actuator; set_target needs to be called to transition
-            # from slewing to tracking, and that is done here for M3
-            # (the trackPosition command does that for the other axes).
-            m3arrived = (
-                m3actuator.kind(tai) == m3actuator.Kind.Slewing
-                and tai > m3actuator.path[-1].tai
-            )
-            if m3arrived:
-                segment = simactuators.path.PathSegment(
-                    tai=tai, position=m3actuator.target.position
-                )
-                m3actuator.path = simactuators.path.Path(
-                    segment, kind=m3actuator.Kind.Stopped
-                )
-            exit_port, rot_axis = self.m3_port_rot(tai)
-            if rot_axis is not None:
-                axes_in_use.add(rot_axis)
-                if m3arrived:
-                    self._axis_enabled[rot_axis] = True
-
-            # Handle limit switches
-            # including aborting axes that are out of limits
-            # and putting on their brakes (if any)
-            abort_axes = []
-            for axis in Axis:
-                self.set_event(
-                    self._min_lim_names[axis],
-                    active=current_position[axis]
-                    < self.min_limit_switch_position[axis],
-                )
-                self.set_event(
-                    self._max_lim_names[axis],
-                    active=current_position[axis]
-                    > self.max_limit_switch_position[axis],
-                )
-                if (
-                    current_position[axis] < self.min_limit_switch_position[axis]
-                    or current_position[axis] > self.max_limit_switch_position[axis]
-                ):
-                    abort_axes.append(axis)
-            for axis in abort_axes:
-                position = current_position[axis]
-                position = max(
-                    position,
-                    self.min_limit_switch_position[axis] - self.limit_overtravel,
-                )
-                position = min(
-                    position,
-                    self.max_limit_switch_position[axis] + self.limit_overtravel,
-                )
-                self.actuators[axis].abort(tai=tai, position=position)
-                self._axis_enabled[axis] = False
-
-            # Handle brakes
-            for axis in Axis:
-                for brake_name in self._brake_names[axis]:
-                    self.set_event(brake_name, engaged=not self._axis_enabled[axis])
-
-            # Handle drive status (which means enabled)
-            for axis in Axis:
-                for evt_name in self._drive_status_names[axis]:
-                    self.set_event(evt_name, enable=self._axis_enabled[axis])
-
-            # Handle atMountState
-            if self._tracking_enabled:
-                mount_state = AtMountState.TRACKINGENABLED
-            elif (
-                not self._stop_tracking_task.done()
-                or not self._disable_all_drives_task.done()
-            ):
-                mount_state = AtMountState.STOPPING
-            else:
-                mount_state = AtMountState.TRACKINGDISABLED
-            self.evt_atMountState.set_put(state=mount_state)
-
-            # Handle azimuth topple block
-            if current_position[Axis.Azimuth] < self.topple_azimuth[0]:
-                self.evt_azimuthToppleBlockCCW.set_put(active=True)
-                self.evt_azimuthToppleBlockCW.set_put(active=False)
-            elif current_position[Axis.Azimuth] > self.topple_azimuth[1]:
-                self.evt_azimuthToppleBlockCCW.set_put(active=False)
-                self.evt_azimuthToppleBlockCW.set_put(active=True)
-            else:
-                self.evt_azimuthToppleBlockCCW.set_put(active=False)
-                self.evt_azimuthToppleBlockCW.set_put(active=False)
-
-            # Handle m3InPosition
-            # M3 is in position if the current velocity is 0
-            # and the current position equals the commanded position.
-            m3_in_position = self.m3_in_position(tai)
-            self.evt_m3InPosition.set_put(inPosition=m3_in_position)
-
-            # Handle "in position" events for the main axes.
-            # Main axes are in position if enabled
-            # and actuator.kind(tai) is tracking.
-            if not self._tracking_enabled:
-                for axis in MainAxes:
-                    self.set_event(self._in_position_names[axis], inPosition=False)
-                self.evt_allAxesInPosition.set_put(inPosition=False)
-            else:
-                all_in_position = m3_in_position
-                for axis in MainAxes:
-                    if not self._axis_enabled[axis]:
-                        in_position = False
-                    else:
-                        actuator = self.actuators[axis]
-                        in_position = actuator.kind(tai) == actuator.Kind.Tracking
-                    if not in_position and axis in axes_in_use:
-                        all_in_position = False
-                    self.set_event(
-                        self._in_position_names[axis], inPosition=in_position
-                    )
-                self.evt_allAxesInPosition.set_put(inPosition=all_in_position)
-
-            # compute m3_state for use setting m3State.state
-            # and m3RotatorDetentSwitches
-            m3_state = None
-            if m3_in_position:
-                # we are either at a port or at an unknown position
-                # exit port enum values = m3state enum values
-                # for the known exit ports
-                if exit_port is not None:
-                    m3_state = exit_port
-                else:
-                    # Move is finished, but not at a known point
-                    m3_state = M3State.UNKNOWNPOSITION
-            elif m3actuator.kind(tai) == m3actuator.Kind.Slewing:
-                m3_state = M3State.INMOTION
-            else:
-                m3_state = M3State.UNKNOWNPOSITION
-            assert m3_state is not None
-
-            # handle m3State
-            self.evt_m3State.set_put(state=m3_state)
+            self.model.step(tai=self.clock.tai())
+            state = self.model.state
+            batch = self._event_batch
+            self._limit_switch_events.update(state.limit_switch.ravel(), batch=batch)
+            self._brake_events.update(state.brake_engaged, batch=batch)
+            self._drive_status_events.update(state.axis_enabled, batch=batch)
+            self._mount_state_event.update([state.mount_state], batch=batch)
+            self._topple_block_events.update(state.topple_block, batch=batch)
+            self._in_position_events.update(state.in_position, batch=batch)
+            self._m3_state_event.update([state.m3_state], batch=batch)
 
             # Handle M3 detent switch
-            detent_map = {
-                1: "nasmyth1Active",
-                2: "nasmyth2Active",
-                3: "port3Active",
-            }
-            at_field = detent_map.get(m3_state, None)
-            detent_values = dict(
-                (field_name, field_name == at_field)
-                for field_name in detent_map.values()
-            )
-            self.evt_m3RotatorDetentSwitches.set_put(**detent_values)
-        except Exception as e:
-            print(f"update_events failed: {e}")
+            m3_state = state.m3_state
+            if m3_state != self._detent_m3_state:
+                detent_map = {
+                    1: "nasmyth1Active",
+                    2: "nasmyth2Active",
+                    3: "port3Active",
+                }
+                at_field = detent_map.get(m3_state, None)
+                detent_values = dict(
+                    (field_name, field_name == at_field)
+                    for field_name in detent_map.values()
+                )
+                batch.add(self.evt_m3RotatorDetentSwitches, **detent_values)
+                self._detent_m3_state = m3_state
+            self._events_output_metric.increment(batch.flush())
+            self._schedule_event_update()
+        except Exception:
+            self._update_events_failed_metric.increment()
+            self.log.exception("update_events failed")
             raise
+        finally:
+            t1 = time.perf_counter()
+            self._update_events_metric.record(t1 - t0)
+            if "initial_events" not in self.startup_times:
+                self.startup_times["initial_events"] = t1 - t0
+                self.startup_times["ready"] = t1 - self._startup_t0
+
+    def update_telemetry(self, tai=None, tick_index=None):
+        """Output telemetry topics.
 
-    def update_telemetry(self):
-        """Output all telemetry topics.
+        Parameters
+        ----------
+        tai : `float` (optional)
+            End of the telemetry window (TAI unix seconds).
+            If None then use the current time.
+            The window for each topic covers ``[tai - interval, tai)``,
+            where ``interval`` is the topic's output interval,
+            so consecutive windows with evenly spaced ``tai``
+            neither overlap nor leave gaps.
+        tick_index : `int` (optional)
+            Index of the event update tick; if specified then only
+            output the topics that are due at that tick
+            (see `TelemetrySchedule.due`), else output all enabled topics.
+
+        The paths of all axes are evaluated at every sample time
+        of a telemetry window in a single vectorized pass
+        (see `evaluate_paths`), once for each group of topics
+        that share a `TelemetryRate`, then the telemetry fields are filled
+        by the group's `TelemetryWriter`.
         """
-        try:
-            nitems = len(self.tel_mount_AzEl_Encoders.data.elevationEncoder1Raw)
-            curr_time = salobj.current_tai()
-
-            times = np.linspace(
-                start=curr_time - self._telemetry_interval,
-                stop=curr_time,
-                num=nitems,
-                endpoint=True,
-            )
+        with self.account_telemetry():
+            if tai is None:
+                tai = self.clock.tai()
+            if tick_index is None:
+                groups = self.telemetry_schedule.groups
+            else:
+                groups = self.telemetry_schedule.due(tick_index)
 
-            for i, tai in enumerate(times):
-                segments = [actuator.path.at(tai) for actuator in self.actuators]
-                current_position = np.array(
-                    [segment.position for segment in segments], dtype=float
-                )
-                curr_vel = np.array(
-                    [segment.velocity for segment in segments], dtype=float
+            for group in groups:
+                times = self.telemetry_schedule.sample_times(group, tai)
+                position, velocity, acceleration = evaluate_paths(
+                    [actuator.path for actuator in self.actuators], times
                 )
-                curr_accel = np.array(
-                    [segment.acceleration for segment in segments], dtype=float
+                self.write_telemetry(
+                    group=group,
+                    times=times,
+                    position=position,
+                    velocity=velocity,
+                    acceleration=acceleration,
                 )
 
-                axis_encoder_counts = (
-                    current_position * self.axis_encoder_counts_per_deg
-                ).astype(int)
-                torque = curr_accel * self.torque_per_accel
-                motor_pos = current_position * self.motor_axis_ratio
-                motor_pos = (motor_pos + 360) % 360 - 360
-                motor_encoder_counts = (
-                    motor_pos * self.motor_encoder_counts_per_deg
-                ).astype(int)
-
-                trajectory_data = self.tel_trajectory.data
-                trajectory_data.elevation[i] = current_position[Axis.Elevation]
-                trajectory_data.azimuth[i] = current_position[Axis.Azimuth]
-                trajectory_data.nasmyth1RotatorAngle[i] = current_position[Axis.NA1]
-                trajectory_data.nasmyth2RotatorAngle[i] = current_position[Axis.NA2]
-                trajectory_data.elevationVelocity[i] = curr_vel[Axis.Elevation]
-                trajectory_data.azimuthVelocity[i] = curr_vel[Axis.Azimuth]
-                trajectory_data.nasmyth1RotatorAngleVelocity[i] = curr_vel[Axis.NA1]
-                trajectory_data.nasmyth2RotatorAngleVelocity[i] = curr_vel[Axis.NA2]
-
-                azel_encoders_data = self.tel_mount_AzEl_Encoders.data
-                azel_encoders_data.elevationCalculatedAngle[i] = current_position[
-                    Axis.Elevation
-                ]
-                azel_encoders_data.elevationEncoder1Raw[i] = axis_encoder_counts[
-                    Axis.Elevation
-                ]
-                azel_encoders_data.elevationEncoder2Raw[i] = axis_encoder_counts[
-                    Axis.Elevation
-                ]
-                azel_encoders_data.elevationEncoder3Raw[i] = axis_encoder_counts[
-                    Axis.Elevation
-                ]
-                azel_encoders_data.azimuthCalculatedAngle[i] = current_position[
-                    Axis.Azimuth
-                ]
-                azel_encoders_data.azimuthEncoder1Raw[i] = axis_encoder_counts[
-                    Axis.Azimuth
-                ]
-                azel_encoders_data.azimuthEncoder2Raw[i] = axis_encoder_counts[
-                    Axis.Azimuth
-                ]
-                azel_encoders_data.azimuthEncoder3Raw[i] = axis_encoder_counts[
-                    Axis.Azimuth
-                ]
-
-                nasmyth_encoders_data = self.tel_mount_Nasmyth_Encoders.data
-                nasmyth_encoders_data.nasmyth1CalculatedAngle[i] = current_position[
-                    Axis.NA1
-                ]
-                nasmyth_encoders_data.nasmyth1Encoder1Raw[i] = axis_encoder_counts[
-                    Axis.NA1
-                ]
-                nasmyth_encoders_data.nasmyth1Encoder2Raw[i] = axis_encoder_counts[
-                    Axis.NA1
-                ]
-                nasmyth_encoders_data.nasmyth1Encoder3Raw[i] = axis_encoder_counts[
-                    Axis.NA1
-                ]
-                nasmyth_encoders_data.nasmyth2CalculatedAngle[i] = current_position[
-                    Axis.NA2
-                ]
-                nasmyth_encoders_data.nasmyth2Encoder1Raw[i] = axis_encoder_counts[
-                    Axis.NA2
-                ]
-                nasmyth_encoders_data.nasmyth2Encoder2Raw[i] = axis_encoder_counts[
-                    Axis.NA2
-                ]
-                nasmyth_encoders_data.nasmyth2Encoder3Raw[i] = axis_encoder_counts[
-                    Axis.NA2
-                ]
-
-                torqueDemand_data = self.tel_torqueDemand.data
-                torqueDemand_data.elevationMotorTorque[i] = torque[Axis.Elevation]
-                torqueDemand_data.azimuthMotor1Torque[i] = torque[Axis.Azimuth]
-                torqueDemand_data.azimuthMotor2Torque[i] = torque[Axis.Azimuth]
-                torqueDemand_data.nasmyth1MotorTorque[i] = torque[Axis.NA1]
-                torqueDemand_data.nasmyth2MotorTorque[i] = torque[Axis.NA2]
-
-                measuredTorque_data = self.tel_measuredTorque.data
-                measuredTorque_data.elevationMotorTorque[i] = torque[Axis.Elevation]
-                measuredTorque_data.azimuthMotor1Torque[i] = torque[Axis.Azimuth]
-                measuredTorque_data.azimuthMotor2Torque[i] = torque[Axis.Azimuth]
-                measuredTorque_data.nasmyth1MotorTorque[i] = torque[Axis.NA1]
-                measuredTorque_data.nasmyth2MotorTorque[i] = torque[Axis.NA2]
-
-                measuredMotorVelocity_data = self.tel_measuredMotorVelocity.data
-                measuredMotorVelocity_data.elevationMotorVelocity[i] = curr_vel[
-                    Axis.Elevation
-                ]
-                measuredMotorVelocity_data.azimuthMotor1Velocity[i] = curr_vel[
-                    Axis.Azimuth
-                ]
-                measuredMotorVelocity_data.azimuthMotor2Velocity[i] = curr_vel[
-                    Axis.Azimuth
-                ]
-                measuredMotorVelocity_data.nasmyth1MotorVelocity[i] = curr_vel[Axis.NA1]
-                measuredMotorVelocity_data.nasmyth2MotorVelocity[i] = curr_vel[Axis.NA2]
-
-                azel_mountMotorEncoders_data = self.tel_azEl_mountMotorEncoders.data
-                azel_mountMotorEncoders_data.elevationEncoder[i] = motor_pos[
-                    Axis.Elevation
-                ]
-                azel_mountMotorEncoders_data.azimuth1Encoder[i] = motor_pos[
-                    Axis.Azimuth
-                ]
-                azel_mountMotorEncoders_data.azimuth2Encoder[i] = motor_pos[
-                    Axis.Azimuth
-                ]
-                azel_mountMotorEncoders_data.elevationEncoderRaw[
-                    i
-                ] = motor_encoder_counts[Axis.Elevation]
-                azel_mountMotorEncoders_data.azimuth1EncoderRaw[
-                    i
-                ] = motor_encoder_counts[Axis.Azimuth]
-                azel_mountMotorEncoders_data.azimuth2EncoderRaw[
-                    i
-                ] = motor_encoder_counts[Axis.Azimuth]
-
-                nasmyth_m3_mountMotorEncoders_data = (
-                    self.tel_nasymth_m3_mountMotorEncoders.data
-                )
-                nasmyth_m3_mountMotorEncoders_data.nasmyth1Encoder[i] = motor_pos[
-                    Axis.NA1
-                ]
-                nasmyth_m3_mountMotorEncoders_data.nasmyth2Encoder[i] = motor_pos[
-                    Axis.NA2
-                ]
-                nasmyth_m3_mountMotorEncoders_data.m3Encoder[i] = motor_pos[Axis.M3]
-                nasmyth_m3_mountMotorEncoders_data.nasmyth1EncoderRaw[
-                    i
-                ] = motor_encoder_counts[Axis.NA1]
-                nasmyth_m3_mountMotorEncoders_data.nasmyth2EncoderRaw[
-                    i
-                ] = motor_encoder_counts[Axis.NA2]
-                nasmyth_m3_mountMotorEncoders_data.m3EncoderRaw[
-                    i
-                ] = motor_encoder_counts[Axis.M3]
-
-            self.tel_trajectory.set_put(cRIO_timestamp=times[0])
-            self.tel_mount_AzEl_Encoders.set_put(cRIO_timestamp=times[0])
-            self.tel_mount_Nasmyth_Encoders.set_put(cRIO_timestamp=times[0])
-            self.tel_torqueDemand.set_put(cRIO_timestamp=times[0])
-            self.tel_measuredTorque.set_put(cRIO_timestamp=times[0])
-            self.tel_measuredMotorVelocity.set_put(cRIO_timestamp=times[0])
-            self.tel_azEl_mountMotorEncoders.set_put(cRIO_timestamp=times[0])
-            self.tel_nasymth_m3_mountMotorEncoders.set_put(cRIO_timestamp=times[0])
-        except Exception as e:
-            print(f"update_telemetry failed: {e}")
+    @contextlib.contextmanager
+    def account_telemetry(self):
+        """Context manager that accounts for an update of telemetry.
+
+        Records the time taken in the ``update_telemetry`` histogram
+        of ``self.metrics`` and, if an exception is raised,
+        logs it and increments the ``update_telemetry_failed`` counter
+        (then re-raises it).
+        Used by `update_telemetry` and by `MultiCscHost`,
+        which computes the telemetry of several CSCs at once.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._update_telemetry_failed_metric.increment()
+            self.log.exception("update_telemetry failed")
             raise
+        finally:
+            self._update_telemetry_metric.record(time.perf_counter() - t0)
+
+    def write_telemetry(self, group, times, position, velocity, acceleration):
+        """Fill and output the telemetry topics of a group
+        from evaluated paths.
+
+        Parameters
+        ----------
+        group : `TelemetryGroup`
+            The group of topics to output.
+        times : `numpy.ndarray`
+            Sample times, from `TelemetrySchedule.sample_times`.
+        position : `numpy.ndarray`
+            Position of each axis at each sample time;
+            shape (number of axes, number of samples).
+        velocity : `numpy.ndarray`
+            Velocity, with the same shape as ``position``.
+        acceleration : `numpy.ndarray`
+            Acceleration, with the same shape as ``position``.
+
+        Notes
+        -----
+        If keeping a history and ``group`` is the finest group
+        of ``self.telemetry_schedule``, also add the samples
+        to ``self.history``.
+        """
+        group.writer.write(
+            position=position,
+            velocity=velocity,
+            acceleration=acceleration,
+            config=self.model,
+            decimation=group.rate.decimation,
+        )
+        if self.history is not None and group is self.telemetry_schedule.finest_group:
+            self.history.write(
+                times=times,
+                position=position,
+                velocity=velocity,
+                acceleration=acceleration,
+                config=self.model,
+            )
+        for topic in group.writer.topics:
+            topic.set_put(cRIO_timestamp=times[0])
 
     async def events_and_telemetry_loop(self):
         """Output telemetry and events that have changed
@@ -990,15 +1109,57 @@ class ATMCSCsc(salobj.BaseCsc):
         * mountMotorEncoders
 
         See `update_events` for the events that are output.
+
+        Events are updated when the loop starts, immediately after
+        commands that change the model, at each transition predicted
+        by `MountModel.next_transition_tai` (see `_schedule_event_update`),
+        and before each telemetry output, rather than by polling.
+        Each telemetry topic is output at the ticks
+        of ``self.loop_scheduler`` given by ``self.telemetry_schedule``;
+        the loop sleeps through ticks at which no telemetry is due
+        (unless all telemetry is disabled).
+        Ticks are scheduled at absolute deadlines, so the cadence
+        does not drift, and each telemetry window ends at the
+        scheduled time of its tick, so consecutive telemetry windows
+        are contiguous (unless ticks are skipped; see `OverrunPolicy`).
         """
-        i = 0
+        self.loop_scheduler.reset()
+        start_tai = self.clock.tai()
+        self.update_events()
+        tick_index = 1
         while self.summary_state in (salobj.State.DISABLED, salobj.State.ENABLED):
+            tick = await self.loop_scheduler.wait_next(
+                min_index=self.telemetry_schedule.next_due(tick_index)
+            )
+            tick_index = tick.index + 1
+            t0 = time.perf_counter()
+
             # update events first so that limits are handled
-            i += 1
             self.update_events()
 
-            if i >= self._events_per_telemetry:
-                i = 0
-                self.update_telemetry()
+            if self.telemetry_schedule.due(tick.index):
+                self.update_telemetry(
+                    tai=start_tai + tick.deadline - self.loop_scheduler.start_time,
+                    tick_index=tick.index,
+                )
+            self._loop_iteration_metric.record(time.perf_counter() - t0)
+
+    async def metrics_loop(self):
+        """Dump ``self.metrics`` every ``self.metrics_interval`` seconds.
 
-            await asyncio.sleep(self._telemetry_interval / self._events_per_telemetry)
+        Each dump is appended to ``self.metrics_path``, if specified,
+        else written to the log. Each dump includes the current time
+        (``tai``, from ``self.clock``) and the statistics of
+        ``self.loop_scheduler`` (``loop_scheduler``).
+        """
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            try:
+                self.metrics.dump(
+                    path=self.metrics_path,
+                    log=self.log,
+                    tai=self.clock.tai(),
+                    loop_scheduler=self.loop_scheduler.get_stats(),
+                )
+            except Exception as e:
+                self.log.warning(f"Could not dump metrics: {e}")
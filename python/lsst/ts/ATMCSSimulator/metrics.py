@@ -0,0 +1,288 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["Counter", "Histogram", "MetricsRegistry"]
+
+import asyncio
+import functools
+import json
+import time
+
+import numpy as np
+
+
+class Counter:
+    """A counter.
+
+    Attributes
+    ----------
+    value : `int`
+        The current count.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def increment(self, n=1):
+        """Increment the counter by ``n``."""
+        self.value += n
+
+    def reset(self):
+        self.value = 0
+
+
+class Histogram:
+    """Distribution of measured durations.
+
+    Recording a sample is cheap: it is stored in a fixed-size ring buffer
+    and the running count, sum and maximum are updated.
+    Percentiles are only computed when read, from the samples
+    in the ring buffer (the most recent ``window`` samples).
+
+    Parameters
+    ----------
+    window : `int` (optional)
+        Number of recent samples used to compute percentiles.
+
+    Attributes
+    ----------
+    count : `int`
+        Number of samples recorded.
+    total : `float`
+        Sum of all samples.
+    max : `float`
+        Maximum of all samples; 0 if no samples.
+    """
+
+    def __init__(self, window=1000):
+        if window < 1:
+            raise ValueError(f"window={window} must be positive")
+        self._samples = [0.0] * window
+        self.reset()
+
+    def record(self, value):
+        """Record a sample.
+
+        Parameters
+        ----------
+        value : `float`
+            The sample, e.g. a duration in seconds.
+        """
+        self._samples[self.count % len(self._samples)] = value
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Get a percentile of the recent samples.
+
+        Parameters
+        ----------
+        percent : `float`
+            Percentile, in the range [0, 100].
+
+        Returns
+        -------
+        value : `float`
+            The percentile; 0 if no samples.
+        """
+        nsamples = min(self.count, len(self._samples))
+        if nsamples == 0:
+            return 0
+        return float(np.percentile(self._samples[:nsamples], percent))
+
+    def reset(self):
+        """Forget all samples."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def summary(self):
+        """Get statistics as a dict.
+
+        The keys are: ``count``, ``mean``, ``p50``, ``p99`` and ``max``.
+        ``mean`` and ``max`` are for all samples; the percentiles
+        are for the most recent ``window`` samples.
+        """
+        return dict(
+            count=self.count,
+            mean=self.total / self.count if self.count > 0 else 0,
+            p50=self.percentile(50),
+            p99=self.percentile(99),
+            max=self.max,
+        )
+
+
+class MetricsRegistry:
+    """A registry of named histograms and counters.
+
+    Parameters
+    ----------
+    window : `int` (optional)
+        Number of recent samples each histogram uses
+        to compute percentiles.
+
+    Notes
+    -----
+    Histograms and counters are created the first time they are asked for.
+    Code on a hot path should get its histogram or counter once,
+    and then call ``record`` or ``increment`` directly.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.histograms = dict()
+        self.counters = dict()
+
+    def histogram(self, name):
+        """Get a histogram by name, creating it if necessary.
+
+        Parameters
+        ----------
+        name : `str`
+            Histogram name.
+
+        Returns
+        -------
+        histogram : `Histogram`
+            The histogram.
+        """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = Histogram(window=self.window)
+            self.histograms[name] = histogram
+        return histogram
+
+    def counter(self, name):
+        """Get a counter by name, creating it if necessary.
+
+        Parameters
+        ----------
+        name : `str`
+            Counter name.
+
+        Returns
+        -------
+        counter : `Counter`
+            The counter.
+        """
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = Counter()
+            self.counters[name] = counter
+        return counter
+
+    def wrap(self, name, func):
+        """Wrap a function so that the duration of each call is recorded.
+
+        Parameters
+        ----------
+        name : `str`
+            Name of the histogram in which to record durations (sec).
+        func : ``callable``
+            The function or coroutine function to wrap.
+            If a coroutine function, the duration includes
+            the time spent waiting.
+
+        Returns
+        -------
+        wrapper : ``callable``
+            The wrapped function; a coroutine function
+            if ``func`` is a coroutine function.
+        """
+        histogram = self.histogram(name)
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.record(time.perf_counter() - t0)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(time.perf_counter() - t0)
+
+        return wrapper
+
+    def snapshot(self):
+        """Get the current values of all metrics.
+
+        Returns
+        -------
+        snapshot : `dict`
+            A dict with two items:
+
+            * ``histograms``: a dict of name: `Histogram.summary`
+            * ``counters``: a dict of name: counter value
+        """
+        return dict(
+            histograms={
+                name: histogram.summary()
+                for name, histogram in sorted(self.histograms.items())
+            },
+            counters={
+                name: counter.value for name, counter in sorted(self.counters.items())
+            },
+        )
+
+    def reset(self):
+        """Reset all histograms and counters."""
+        for histogram in self.histograms.values():
+            histogram.reset()
+        for counter in self.counters.values():
+            counter.reset()
+
+    def dump(self, path=None, log=None, **kwargs):
+        """Write a snapshot of the metrics as one line of JSON.
+
+        Parameters
+        ----------
+        path : `str` or `pathlib.Path` (optional)
+            File to which to append the snapshot.
+        log : `logging.Logger` (optional)
+            Log to which to write the snapshot, at INFO level.
+            Ignored if ``path`` is specified.
+        **kwargs : `dict`
+            Additional items for the snapshot, such as a time stamp.
+
+        Raises
+        ------
+        ValueError
+            If neither ``path`` nor ``log`` is specified.
+        """
+        if path is None and log is None:
+            raise ValueError("Must specify path or log")
+        text = json.dumps(dict(**kwargs, **self.snapshot()))
+        if path is not None:
+            with open(path, "a") as f:
+                f.write(text + "\n")
+        else:
+            log.info(f"metrics: {text}")
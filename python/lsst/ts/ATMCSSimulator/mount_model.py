@@ -0,0 +1,1115 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["MountModel"]
+
+import collections
+import hashlib
+import json
+
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import simactuators
+from lsst.ts.idl.enums.ATMCS import AtMountState, M3ExitPort, M3State
+
+from .axis import Axis, MainAxes
+from .mount_state import MountState
+from .path_utils import next_crossing_tai, next_segment_tai
+
+# Dict of M3ExitPort (the instrument port M3 points to): tuple of:
+# * index of MountModel.m3_port_positions: the M3 position for this port
+# * M3State (state of M3 axis when pointing to this port)
+# * Rotator axis at this port, as an Axis enum,
+#   or None if this port has no rotator.
+PORT_INFO = {
+    M3ExitPort.NASMYTH1: (0, M3State.NASMYTH1, Axis.NA1),
+    M3ExitPort.NASMYTH2: (1, M3State.NASMYTH2, Axis.NA2),
+    M3ExitPort.PORT3: (2, M3State.PORT3, None),
+}
+
+# Indices of the main axes, for indexing per-axis arrays.
+MAIN_AXES_INDEX = np.array(MainAxes, dtype=int)
+
+# Dict of configuration parameter name: number of values,
+# for parameters that are arrays of floats.
+CONFIG_ARRAY_LENGTHS = dict(
+    min_commanded_position=5,
+    max_commanded_position=5,
+    min_limit_switch_position=5,
+    max_limit_switch_position=5,
+    max_velocity=5,
+    max_acceleration=5,
+    topple_azimuth=2,
+    m3_port_positions=3,
+    axis_encoder_counts_per_deg=5,
+    motor_encoder_counts_per_deg=5,
+    motor_axis_ratio=5,
+    torque_per_accel=5,
+)
+
+# Dict of configuration parameter name: name of the attribute
+# of `lsst.ts.simactuators.TrackingActuator` set from that parameter.
+ACTUATOR_ATTRIBUTES = dict(
+    min_commanded_position="min_position",
+    max_commanded_position="max_position",
+    max_velocity="max_velocity",
+    max_acceleration="max_acceleration",
+)
+
+
+def _config_key(config):
+    """Get a hash of the contents of a configuration,
+    or None if it has values that cannot be hashed.
+
+    Array parameters that are equal as arrays of floats,
+    e.g. a tuple of ints and a list of floats, have the same hash.
+    """
+    normalized_config = dict(config)
+    for name in CONFIG_ARRAY_LENGTHS:
+        try:
+            normalized_config[name] = np.asarray(config[name], dtype=float).tolist()
+        except (TypeError, ValueError):
+            pass
+    try:
+        text = json.dumps(
+            normalized_config,
+            sort_keys=True,
+            default=lambda value: np.asarray(value).tolist(),
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _state_property(name, settable=False):
+    """Make a property that is an alias for a field of
+    ``MountModel.state``.
+    """
+
+    def fget(self):
+        return getattr(self.state, name)
+
+    def fset(self, value):
+        setattr(self.state, name, value)
+
+    return property(
+        fget, fset if settable else None, doc=f"Alias for ``state.{name}``."
+    )
+
+
+class MountModel:
+    """Deterministic model of the auxiliary telescope mount.
+
+    The model has no SAL topics, event loop or clock: every method
+    that depends on time takes the current time as an argument.
+    Time only advances when you call `step`, which also updates
+    the state reported by events (the attributes listed below).
+    `ATMCSCsc` wraps this model, so the model can be used to simulate
+    the mount offline, much faster than real time, with the same results.
+
+    Parameters
+    ----------
+    tai : `float`
+        Current time, TAI unix seconds.
+    **config : `dict`
+        Configuration; see `configure` for the arguments and defaults.
+
+    Attributes
+    ----------
+    actuators : `list` [`lsst.ts.simactuators.TrackingActuator`]
+        Actuator for each axis, indexed by `Axis`.
+    config : `dict`
+        The configuration: a dict of parameter name: validated value
+        for every argument of `configure` except ``tai``.
+        Each parameter is also available as an attribute.
+        Do not modify the values; they may be shared with other models.
+    state : `MountState`
+        State of the mount, as reported by events.
+        Use `snapshot` to get a copy that does not change.
+        The following attributes are aliases for fields of ``state``;
+        all but ``tracking_enabled`` are read-only, though the arrays
+        are modified in place by this model.
+    tracking_enabled : `bool`
+        Has tracking been enabled by `start_tracking`?
+        This remains true until `stop_tracking` or `disable_all_drives`
+        is called, even if some drives have been disabled
+        by running into limits.
+    axis_enabled : `numpy.ndarray` [`bool`]
+        Is each axis enabled? This remains true until `stop_tracking`
+        or `disable_all_drives` is called, or the axis runs into a limit.
+        The brakes of an axis are engaged if and only if
+        the axis is disabled.
+    tracking_deadline : `float` or `None`
+        TAI time (unix seconds) by which the next `track_target`
+        must be called, or None if tracking is not enabled.
+        Enforcing this deadline is up to the caller;
+        `ATMCSCsc` goes to fault if it is missed.
+    stop_tracking_end_tai : `float` or `None`
+        TAI time (unix seconds) at which the halt started
+        by `stop_tracking` is predicted to be done, or None if not halting.
+        The halt is done when all main axes report ``Kind.Stopped``,
+        which is when the last segment of the slowest halt path begins.
+    disable_drives_end_tai : `float` or `None`
+        TAI time (unix seconds) at which the halt started by
+        `disable_all_drives` is predicted to be done, or None
+        if not halting. The halt is done, and all axes are disabled,
+        when all axes report ``Kind.Stopped``.
+
+    The following attributes are updated by `step`:
+
+    tai : `float`
+        Time of the most recent call to `step`, TAI unix seconds,
+        or None if `step` has not been called.
+    position : `numpy.ndarray` [`float`]
+        Position of each axis (deg).
+    velocity : `numpy.ndarray` [`float`]
+        Velocity of each axis (deg/sec).
+    brake_engaged : `numpy.ndarray` [`bool`]
+        Are the brakes of each axis engaged?
+    below_min_limit : `numpy.ndarray` [`bool`]
+        Is each axis below its minimum limit switch?
+    above_max_limit : `numpy.ndarray` [`bool`]
+        Is each axis above its maximum limit switch?
+    mount_state : `lsst.ts.idl.enums.ATMCS.AtMountState`
+        State of the mount.
+    topple_block : `numpy.ndarray` [`bool`]
+        Are the azimuth topple block CCW and CW switches active?
+    in_position : `numpy.ndarray` [`bool`]
+        Is each axis in position? Values are, in order:
+        M3, the main axes (`MainAxes`), then all axes.
+    exit_port : `lsst.ts.idl.enums.ATMCS.M3ExitPort` or `None`
+        The instrument port M3 points to,
+        or None if not in position at a known port.
+    m3_state : `lsst.ts.idl.enums.ATMCS.M3State`
+        State of M3.
+    """
+
+    # How long before its target time each target loaded by
+    # `load_trajectory` is applied (sec). This plays the role of
+    # the lead time of ``trackTarget`` commands sent by a client.
+    trajectory_lead = 0.1
+
+    # Maximum number of validated configurations
+    # kept in `MountModel._validated_configs`.
+    config_cache_size = 100
+
+    # Validated configurations, shared by all models:
+    # an ordered dict of content hash (see `_config_key`): config,
+    # in order of least to most recently used.
+    _validated_configs = collections.OrderedDict()
+
+    tai = _state_property("tai")
+    tracking_enabled = _state_property("tracking_enabled", settable=True)
+    axis_enabled = _state_property("axis_enabled")
+    position = _state_property("position")
+    velocity = _state_property("velocity")
+    brake_engaged = _state_property("brake_engaged")
+    below_min_limit = _state_property("below_min_limit")
+    above_max_limit = _state_property("above_max_limit")
+    mount_state = _state_property("mount_state")
+    topple_block = _state_property("topple_block")
+    in_position = _state_property("in_position")
+    exit_port = _state_property("exit_port")
+    m3_state = _state_property("m3_state")
+
+    def __init__(self, tai, **config):
+        self.state = MountState()
+        self.tracking_deadline = None
+        self.stop_tracking_end_tai = None
+        self.disable_drives_end_tai = None
+        self._clear_trajectory()
+        self.config = None
+        self.configure(tai=tai, **config)
+
+    def snapshot(self):
+        """Get a copy of the state that does not change.
+
+        The cost does not depend on the size of the state;
+        see `MountState.snapshot`.
+
+        Returns
+        -------
+        snapshot : `MountState`
+            Read-only copy of ``self.state``.
+        """
+        return self.state.snapshot()
+
+    def configure(
+        self,
+        tai,
+        max_tracking_interval=2.5,
+        min_commanded_position=(5, -270, -165, -165, 0),
+        max_commanded_position=(90, 270, 165, 165, 180),
+        min_limit_switch_position=(3, -272, -167, -167, -2),
+        max_limit_switch_position=(92, 272, 167, 167, 182),
+        max_velocity=(5, 5, 5, 5, 5),
+        max_acceleration=(3, 3, 3, 3, 3),
+        topple_azimuth=(2, 5),
+        m3_port_positions=(0, 180, 90),
+        needed_in_pos=3,
+        axis_encoder_counts_per_deg=(3.6e6, 3.6e6, 3.6e6, 3.6e6, 3.6e6),
+        motor_encoder_counts_per_deg=(3.6e5, 3.6e5, 3.6e5, 3.6e5, 3.6e5),
+        motor_axis_ratio=(100, 100, 100, 100, 100),
+        torque_per_accel=(1, 1, 1, 1, 1),
+        nsettle=2,
+        limit_overtravel=1,
+    ):
+        """Set configuration.
+
+        All actuators are replaced, so all axes are stopped.
+        To change some parameters without stopping, use `reconfigure`.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        max_tracking_interval : `float`
+            Maximum time between tracking updates (sec)
+        min_commanded_position : ``iterable`` of 5 `float`
+            Minimum commanded position for each axis, in deg
+        max_commanded_position : ``iterable`` of 5 `float`
+            Minimum commanded position for each axis, in deg
+        min_limit_switch_position : ``iterable`` of 5 `float`
+            Position of minimum L1 limit switch for each axis, in deg
+        max_limit_switch_position : ``iterable`` of 5 `float`
+            Position of maximum L1 limit switch for each axis, in deg
+        max_velocity : ``iterable`` of 5 `float`
+            Maximum velocity of each axis, in deg/sec
+        max_acceleration : ``iterable`` of 5 `float`
+            Maximum acceleration of each axis, in deg/sec
+        topple_azimuth : ``iterable`` of 2 `float`
+            Min, max azimuth at which the topple block moves, in deg
+        m3_port_positions : ``iterable`` of 3 `float`
+            M3 position of instrument ports NA1, NA2 and Port3,
+            in that order.
+        axis_encoder_counts_per_deg : `list` [`float`]
+            Axis encoder resolution, for each axis, in counts/deg
+        motor_encoder_counts_per_deg : `list` [`float`]
+            Motor encoder resolution, for each axis, in counts/deg
+        motor_axis_ratio : `list` [`float`]
+            Number of turns of the motor for one turn of the axis.
+        torque_per_accel :  `list` [`float`]
+            Motor torque per unit of acceleration,
+            in units of measuredTorque/(deg/sec^2)
+        nsettle : `int`
+            Number of consecutive trackPosition commands that result in
+            a tracking path before we report an axis is tracking.
+        limit_overtravel : `float`
+            Distance from limit switches to hard stops (deg).
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If any array value has the wrong length,
+            ``max_velocity`` or ``max_acceleration`` is not positive,
+            or a minimum commanded position is not less than
+            the corresponding maximum.
+        ValueError
+            If ``limit_overtravel`` is negative.
+        """
+        config = self._validate_config(
+            dict(
+                max_tracking_interval=max_tracking_interval,
+                min_commanded_position=min_commanded_position,
+                max_commanded_position=max_commanded_position,
+                min_limit_switch_position=min_limit_switch_position,
+                max_limit_switch_position=max_limit_switch_position,
+                max_velocity=max_velocity,
+                max_acceleration=max_acceleration,
+                topple_azimuth=topple_azimuth,
+                m3_port_positions=m3_port_positions,
+                needed_in_pos=needed_in_pos,
+                axis_encoder_counts_per_deg=axis_encoder_counts_per_deg,
+                motor_encoder_counts_per_deg=motor_encoder_counts_per_deg,
+                motor_axis_ratio=motor_axis_ratio,
+                torque_per_accel=torque_per_accel,
+                nsettle=nsettle,
+                limit_overtravel=limit_overtravel,
+            )
+        )
+        self._set_config(config)
+        # allowed position error for M3 to be considered in position (deg)
+        self.m3tolerance = 1e-5
+
+        self.actuators = [
+            simactuators.TrackingActuator(
+                min_position=self.min_commanded_position[axis],
+                max_position=self.max_commanded_position[axis],
+                max_velocity=self.max_velocity[axis],
+                max_acceleration=self.max_acceleration[axis],
+                # Use 0 for M3 to prevent tracking.
+                dtmax_track=0 if axis == 4 else self.max_tracking_interval,
+                nsettle=self.nsettle,
+                tai=tai,
+            )
+            for axis in Axis
+        ]
+        self.actuators[0].verbose = True
+
+    def reconfigure(self, tai, **changes):
+        """Change some configuration parameters,
+        without interrupting the motion of any axis.
+
+        Only the parameters that have changed are applied.
+        The actuators are kept, with their current paths and targets;
+        new actuator limits apply to the next target or halt.
+        If tracking, a change to ``max_tracking_interval`` moves
+        ``tracking_deadline`` by the same amount as the interval.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        **changes : `dict`
+            The parameters to change; see `configure` for the names.
+            Parameters that are not specified keep their current value.
+
+        Raises
+        ------
+        TypeError
+            If a parameter name is not a parameter of `configure`.
+        lsst.ts.salobj.ExpectedError
+            If the new configuration is invalid (see `configure`),
+            in which case the configuration is not changed.
+        ValueError
+            If ``limit_overtravel`` is negative.
+        """
+        unknown_names = sorted(changes.keys() - self.config.keys())
+        if unknown_names:
+            raise TypeError(f"Unknown configuration parameters {unknown_names}")
+        config = self._validate_config(dict(self.config, **changes))
+        old_config = self._set_config(config)
+        for name, value in config.items():
+            old_value = old_config[name]
+            if name in ACTUATOR_ATTRIBUTES:
+                attr_name = ACTUATOR_ATTRIBUTES[name]
+                for axis in np.flatnonzero(value != old_value):
+                    setattr(self.actuators[axis], attr_name, value[axis])
+            elif name == "max_tracking_interval" and value != old_value:
+                for axis in MainAxes:
+                    self.actuators[axis].dtmax_track = value
+                if self.tracking_deadline is not None:
+                    self.tracking_deadline += value - old_value
+            elif name == "nsettle" and value != old_value:
+                for actuator in self.actuators:
+                    actuator.nsettle = value
+
+    def _set_config(self, config):
+        """Set ``self.config`` and the configuration attributes.
+
+        Parameters
+        ----------
+        config : `dict`
+            The new configuration, from `_validate_config`.
+
+        Returns
+        -------
+        old_config : `dict` or `None`
+            The previous configuration, or None if none.
+        """
+        old_config = self.config
+        self.config = config
+        for name, value in config.items():
+            setattr(self, name, value)
+        return old_config
+
+    @classmethod
+    def _validate_config(cls, config):
+        """Check and convert a configuration.
+
+        Validated configurations are cached by the hash of their contents,
+        so validating a configuration that has been seen before
+        costs only computing the hash.
+
+        Parameters
+        ----------
+        config : `dict`
+            The configuration: a dict of parameter name: value,
+            for every argument of `configure` except ``tai``.
+
+        Returns
+        -------
+        validated_config : `dict`
+            The validated configuration, with array parameters
+            converted to read-only `numpy.ndarray`.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If the configuration is invalid; see `configure`.
+        ValueError
+            If ``limit_overtravel`` is negative.
+        """
+        key = _config_key(config)
+        if key is not None and key in cls._validated_configs:
+            cls._validated_configs.move_to_end(key)
+            return cls._validated_configs[key]
+
+        def convert_values(name, values, nval):
+            out = np.array(values, dtype=float)
+            if out.shape != (nval,):
+                raise salobj.ExpectedError(
+                    f"Could not format {name}={values!r} as {nval} floats"
+                )
+            return out
+
+        validated_config = dict(config)
+        for name, nval in CONFIG_ARRAY_LENGTHS.items():
+            values = convert_values(name, config[name], nval)
+            values.flags.writeable = False
+            validated_config[name] = values
+        for name in ("max_velocity", "max_acceleration"):
+            values = validated_config[name]
+            if values.min() <= 0:
+                raise salobj.ExpectedError(
+                    f"{name}={values}; all values must be positive"
+                )
+        min_commanded_position = validated_config["min_commanded_position"]
+        max_commanded_position = validated_config["max_commanded_position"]
+        if np.any(min_commanded_position >= max_commanded_position):
+            raise salobj.ExpectedError(
+                f"min_commanded_position={min_commanded_position} must be "
+                f"less than max_commanded_position={max_commanded_position}"
+            )
+        if config["limit_overtravel"] < 0:
+            raise ValueError(
+                f"limit_overtravel={config['limit_overtravel']} must be >= 0"
+            )
+
+        if key is not None:
+            cls._validated_configs[key] = validated_config
+            if len(cls._validated_configs) > cls.config_cache_size:
+                cls._validated_configs.popitem(last=False)
+        return validated_config
+
+    def command(self, name, tai, **kwargs):
+        """Execute a command, specified by its SAL name.
+
+        This is a convenience for replaying recorded commands;
+        it calls the method that implements the command.
+
+        Parameters
+        ----------
+        name : `str`
+            SAL command name, e.g. "trackTarget".
+            Supported commands are: "startTracking", "trackTarget",
+            "setInstrumentPort" and "stopTracking".
+        tai : `float`
+            Current time, TAI unix seconds.
+        **kwargs : `dict`
+            Command data, by SAL field name. Fields that are not used
+            by the model (such as ``trackId``) are ignored.
+
+        Raises
+        ------
+        ValueError
+            If ``name`` is not a supported command.
+        lsst.ts.salobj.ExpectedError
+            If the command is rejected.
+        """
+        if name == "startTracking":
+            self.start_tracking(tai=tai)
+        elif name == "trackTarget":
+            self.track_target(
+                tai=tai,
+                target_tai=kwargs["taiTime"],
+                position=[
+                    kwargs["elevation"],
+                    kwargs["azimuth"],
+                    kwargs["nasmyth1RotatorAngle"],
+                    kwargs["nasmyth2RotatorAngle"],
+                ],
+                velocity=[
+                    kwargs["elevationVelocity"],
+                    kwargs["azimuthVelocity"],
+                    kwargs["nasmyth1RotatorAngleVelocity"],
+                    kwargs["nasmyth2RotatorAngleVelocity"],
+                ],
+            )
+        elif name == "setInstrumentPort":
+            self.set_instrument_port(tai=tai, port=kwargs["port"])
+        elif name == "stopTracking":
+            self.stop_tracking(tai=tai)
+        else:
+            raise ValueError(f"Unsupported command {name!r}")
+
+    def start_tracking(self, tai):
+        """Enable tracking.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If M3 is not in position or `stop_tracking` is not done.
+        """
+        self._update_halts(tai)
+        if not self.in_position[0]:
+            raise salobj.ExpectedError(
+                "Cannot startTracking until M3 is at a known position"
+            )
+        if self.stop_tracking_end_tai is not None:
+            raise salobj.ExpectedError("stopTracking not finished yet")
+        self.tracking_enabled = True
+        self.tracking_deadline = tai + self.max_tracking_interval
+
+    def track_target(self, tai, target_tai, position, velocity):
+        """Set the target of the main axes.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        target_tai : `float`
+            Time of the target position and velocity, TAI unix seconds.
+        position : ``iterable`` of 4 `float`
+            Target position of each main axis (deg).
+        velocity : ``iterable`` of 4 `float`
+            Target velocity of each main axis (deg/sec).
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If tracking is not enabled, or the target position
+            (extrapolated to ``tai``) or velocity is out of range.
+            If this happens the actuators are not changed.
+        """
+        if not self.tracking_enabled:
+            raise salobj.ExpectedError("Cannot trackTarget until tracking is enabled")
+        position = np.array(position, dtype=float)
+        velocity = np.array(velocity, dtype=float)
+        current_position = position + (tai - target_tai) * velocity
+        if np.any(current_position < self.min_commanded_position[0:4]) or np.any(
+            current_position > self.max_commanded_position[0:4]
+        ):
+            raise salobj.ExpectedError(
+                f"One or more target positions {current_position} not in range "
+                f"{self.min_commanded_position} to {self.max_commanded_position} "
+                "at the current time"
+            )
+        if np.any(np.abs(velocity) > self.max_velocity[0:4]):
+            raise salobj.ExpectedError(
+                "Magnitude of one or more target velocities "
+                f"{velocity} > {self.max_velocity}"
+            )
+
+        self._clear_trajectory()
+        for axis in MainAxes:
+            self.actuators[axis].set_target(
+                tai=target_tai, position=position[axis], velocity=velocity[axis]
+            )
+        self.tracking_deadline = tai + self.max_tracking_interval
+
+    def load_trajectory(self, tai, target_tai, position, velocity):
+        """Load a block of future targets for the main axes.
+
+        Each target is applied, as if by `track_target`,
+        by the first call to `step` at or after
+        ``target_tai - trajectory_lead``. The whole block is validated
+        at once, so no target is rejected while the block is running.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        target_tai : ``iterable`` of `float`
+            Time of each target, TAI unix seconds;
+            must be strictly increasing.
+        position : ``iterable`` of ``iterable`` of 4 `float`
+            Target position of each main axis (deg),
+            one row per target.
+        velocity : ``iterable`` of ``iterable`` of 4 `float`
+            Target velocity of each main axis (deg/sec),
+            one row per target.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If tracking is not enabled, the block is empty or malformed,
+            or any target position (extrapolated to the time
+            the target is applied) or velocity is out of range.
+            If this happens the model is not changed.
+
+        Notes
+        -----
+        Loading a block replaces any block that is still running.
+        `track_target`, `stop_tracking` and `disable_all_drives`
+        discard the rest of the block.
+
+        The tracking deadline is moved to ``max_tracking_interval``
+        after the last target is applied, so the caller need not
+        send any other targets while the block is running.
+        """
+        if not self.tracking_enabled:
+            raise salobj.ExpectedError(
+                "Cannot load a trajectory until tracking is enabled"
+            )
+        target_tai = np.array(target_tai, dtype=float)
+        position = np.array(position, dtype=float)
+        velocity = np.array(velocity, dtype=float)
+        ntargets = len(target_tai)
+        if ntargets == 0 or target_tai.shape != (ntargets,):
+            raise salobj.ExpectedError(
+                f"target_tai has shape {target_tai.shape}; "
+                "must be a non-empty 1-dimensional array"
+            )
+        naxes = len(MainAxes)
+        if position.shape != (ntargets, naxes) or velocity.shape != (ntargets, naxes):
+            raise salobj.ExpectedError(
+                f"position has shape {position.shape} and velocity has shape "
+                f"{velocity.shape}; both must have shape ({ntargets}, {naxes})"
+            )
+        if np.any(np.diff(target_tai) <= 0):
+            raise salobj.ExpectedError("target_tai must be strictly increasing")
+        apply_tai = np.maximum(target_tai - self.trajectory_lead, tai)
+        current_position = position + (apply_tai - target_tai)[:, np.newaxis] * velocity
+        bad_targets = np.any(
+            current_position < self.min_commanded_position[0:naxes], axis=1
+        ) | np.any(current_position > self.max_commanded_position[0:naxes], axis=1)
+        if np.any(bad_targets):
+            i = np.flatnonzero(bad_targets)[0]
+            raise salobj.ExpectedError(
+                f"Target {i} position {current_position[i]} not in range "
+                f"{self.min_commanded_position} to {self.max_commanded_position} "
+                "at the time it is applied"
+            )
+        bad_targets = np.any(np.abs(velocity) > self.max_velocity[0:naxes], axis=1)
+        if np.any(bad_targets):
+            i = np.flatnonzero(bad_targets)[0]
+            raise salobj.ExpectedError(
+                f"Magnitude of one or more velocities {velocity[i]} of target {i} "
+                f"> {self.max_velocity}"
+            )
+
+        self._trajectory_apply_tai = apply_tai
+        self._trajectory_target_tai = target_tai
+        self._trajectory_position = position
+        self._trajectory_velocity = velocity
+        self._trajectory_index = 0
+        self.tracking_deadline = max(tai, apply_tai[-1]) + self.max_tracking_interval
+
+    @property
+    def trajectory_remaining(self):
+        """Number of targets loaded by `load_trajectory`
+        that have not yet been applied.
+        """
+        return len(self._trajectory_target_tai) - self._trajectory_index
+
+    def _apply_trajectory(self, tai):
+        """Apply the targets loaded by `load_trajectory` that are due.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        end_index = np.searchsorted(self._trajectory_apply_tai, tai, side="right")
+        for i in range(self._trajectory_index, end_index):
+            for axis in MainAxes:
+                self.actuators[axis].set_target(
+                    tai=self._trajectory_target_tai[i],
+                    position=self._trajectory_position[i, axis],
+                    velocity=self._trajectory_velocity[i, axis],
+                )
+        self._trajectory_index = max(self._trajectory_index, end_index)
+
+    def _clear_trajectory(self):
+        """Discard the targets loaded by `load_trajectory`."""
+        self._trajectory_apply_tai = np.zeros(0, dtype=float)
+        self._trajectory_target_tai = np.zeros(0, dtype=float)
+        self._trajectory_position = np.zeros((0, len(MainAxes)), dtype=float)
+        self._trajectory_velocity = np.zeros((0, len(MainAxes)), dtype=float)
+        self._trajectory_index = 0
+
+    def set_instrument_port(self, tai, port):
+        """Point M3 to an instrument port.
+
+        Disables both Nasmyth rotators; the rotator at the new port
+        (if any) is enabled by `step` when M3 arrives.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        port : `lsst.ts.idl.enums.ATMCS.M3ExitPort` or `int`
+            The desired port.
+
+        Returns
+        -------
+        moving : `bool`
+            True if M3 was commanded to move,
+            False if it was already in position at that port.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If tracking is enabled or ``port`` is invalid.
+        """
+        if self.tracking_enabled:
+            raise salobj.ExpectedError(
+                "Cannot setInstrumentPort while tracking is enabled"
+            )
+        try:
+            m3_port_positions_ind = PORT_INFO[port][0]
+        except KeyError:
+            raise salobj.ExpectedError(f"Invalid port={port}")
+        m3_port_position = self.m3_port_positions[m3_port_positions_ind]
+        m3actuator = self.actuators[Axis.M3]
+        if m3actuator.target.position == m3_port_position and self.in_position[0]:
+            return False
+        m3actuator.set_target(tai=tai, position=m3_port_position, velocity=0)
+        self.state.make_writable()
+        self.axis_enabled[Axis.NA1] = False
+        self.axis_enabled[Axis.NA2] = False
+        return True
+
+    def stop_tracking(self, tai):
+        """Disable tracking and halt the main axes.
+
+        If the main axes are already stopped then the halt is done
+        immediately (``stop_tracking_end_tai`` is None).
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+
+        Raises
+        ------
+        lsst.ts.salobj.ExpectedError
+            If a previous `stop_tracking` is not done.
+        """
+        self._update_halts(tai)
+        if self.stop_tracking_end_tai is not None:
+            raise salobj.ExpectedError("Already stopping")
+        self.tracking_enabled = False
+        self.tracking_deadline = None
+        self._clear_trajectory()
+        for axis in MainAxes:
+            self.actuators[axis].stop(tai=tai)
+        if self._all_stopped(axes=MainAxes, tai=tai):
+            self.stop_tracking_end_tai = None
+        else:
+            self.stop_tracking_end_tai = max(
+                self.actuators[axis].path[-1].tai for axis in MainAxes
+            )
+
+    def enable_drives(self, tai):
+        """Enable the drives of elevation, azimuth,
+        and the rotator that M3 points to (if any).
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        axes_to_enable = set((Axis.Elevation, Axis.Azimuth))
+        rot_axis = self.m3_port_rot(tai)[1]
+        if rot_axis is not None:
+            axes_to_enable.add(rot_axis)
+        self.state.make_writable()
+        for axis in Axis:
+            self.axis_enabled[axis] = axis in axes_to_enable
+
+    def disable_all_drives(self, tai):
+        """Disable tracking, halt all axes, and disable them.
+
+        Axes that are already stopped are disabled immediately;
+        the others are disabled once all axes have stopped
+        (see ``disable_drives_end_tai``).
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        self.tracking_enabled = False
+        self.tracking_deadline = None
+        self._clear_trajectory()
+        self.state.make_writable()
+        already_stopped = True
+        for axis in Axis:
+            actuator = self.actuators[axis]
+            if actuator.kind(tai) == actuator.Kind.Stopped:
+                self.axis_enabled[axis] = False
+            else:
+                already_stopped = False
+                actuator.stop(tai=tai)
+        if already_stopped:
+            self.disable_drives_end_tai = None
+        else:
+            self.disable_drives_end_tai = max(
+                actuator.path[-1].tai for actuator in self.actuators
+            )
+
+    def m3_port_rot(self, tai):
+        """Return exit port and rotator axis.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+
+        Returns
+        -------
+        port_rot : `tuple`
+            Exit port and rotator axis, as a tuple:
+
+            * exit port: an M3ExitPort enum value
+            * rotator axis: the instrument rotator at this port,
+              as an Axis enum value, or None if the port has no rotator.
+        """
+        if not self.m3_in_position(tai):
+            return (None, None)
+        target_position = self.actuators[Axis.M3].target.position
+        for exit_port, (ind, m3state, rot_axis) in PORT_INFO.items():
+            if self.m3_port_positions[ind] == target_position:
+                return (exit_port, rot_axis)
+        return (None, None)
+
+    def m3_in_position(self, tai):
+        """Is the M3 actuator in position?
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        m3actuator = self.actuators[Axis.M3]
+        if m3actuator.kind(tai) != m3actuator.Kind.Stopped:
+            return False
+        m3target_position = m3actuator.target.position
+        m3current = m3actuator.path[-1].at(tai)
+        m3position_difference = abs(m3target_position - m3current.position)
+        return m3position_difference < self.m3tolerance
+
+    def step(self, tai):
+        """Advance the model to the specified time.
+
+        Finish halts that are done, apply targets loaded by
+        `load_trajectory` that are due, handle M3 arriving at a port
+        and axes running into limit switches (which aborts the axis
+        and disables its drive), then update the state reported by events.
+        Limit switches, drive enables (which also determine the brakes)
+        and in-position flags are computed as boolean masks over all axes.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        self._update_halts(tai)
+        if self.trajectory_remaining > 0:
+            self._apply_trajectory(tai)
+        state = self.state
+        state.make_writable()
+        state.tai = tai
+        segments = [actuator.path.at(tai) for actuator in self.actuators]
+        state.position[:] = [segment.position for segment in segments]
+        state.velocity[:] = [segment.velocity for segment in segments]
+        m3actuator = self.actuators[Axis.M3]
+        axes_in_use = np.zeros(len(Axis), dtype=bool)
+        axes_in_use[[Axis.Elevation, Axis.Azimuth, Axis.M3]] = True
+
+        # Handle M3 actuator; set_target needs to be called to transition
+        # from slewing to tracking, and that is done here for M3
+        # (the trackPosition command does that for the other axes).
+        m3arrived = (
+            m3actuator.kind(tai) == m3actuator.Kind.Slewing
+            and tai > m3actuator.path[-1].tai
+        )
+        if m3arrived:
+            segment = simactuators.path.PathSegment(
+                tai=tai, position=m3actuator.target.position
+            )
+            m3actuator.path = simactuators.path.Path(
+                segment, kind=m3actuator.Kind.Stopped
+            )
+        exit_port, rot_axis = self.m3_port_rot(tai)
+        state.exit_port = exit_port
+        if rot_axis is not None:
+            axes_in_use[rot_axis] = True
+            if m3arrived:
+                state.axis_enabled[rot_axis] = True
+
+        # Handle limit switches with masks over all axes: abort axes
+        # that are out of limits, at their current position clamped
+        # to the overtravel range, and disable their drives.
+        np.less(
+            state.position, self.min_limit_switch_position, out=state.below_min_limit
+        )
+        np.greater(
+            state.position, self.max_limit_switch_position, out=state.above_max_limit
+        )
+        out_of_limits = state.below_min_limit | state.above_max_limit
+        if out_of_limits.any():
+            abort_position = np.clip(
+                state.position,
+                self.min_limit_switch_position - self.limit_overtravel,
+                self.max_limit_switch_position + self.limit_overtravel,
+            )
+            for axis in np.flatnonzero(out_of_limits):
+                self.actuators[axis].abort(tai=tai, position=abort_position[axis])
+            state.axis_enabled &= ~out_of_limits
+        np.logical_not(state.axis_enabled, out=state.brake_engaged)
+
+        if state.tracking_enabled:
+            state.mount_state = AtMountState.TRACKINGENABLED
+        elif (
+            self.stop_tracking_end_tai is not None
+            or self.disable_drives_end_tai is not None
+        ):
+            state.mount_state = AtMountState.STOPPING
+        else:
+            state.mount_state = AtMountState.TRACKINGDISABLED
+
+        azimuth = state.position[Axis.Azimuth]
+        state.topple_block[0] = azimuth < self.topple_azimuth[0]
+        state.topple_block[1] = azimuth > self.topple_azimuth[1]
+
+        # M3 is in position if the current velocity is 0
+        # and the current position equals the commanded position.
+        # Main axes are in position if tracking is enabled,
+        # the axis is enabled and actuator.kind(tai) is tracking.
+        in_position = state.in_position
+        in_position[:] = False
+        m3_in_position = self.m3_in_position(tai)
+        in_position[0] = m3_in_position
+        if state.tracking_enabled:
+            tracking = np.array(
+                [
+                    self.actuators[axis].kind(tai) == simactuators.path.Kind.Tracking
+                    for axis in MainAxes
+                ]
+            )
+            main_in_position = state.axis_enabled[MAIN_AXES_INDEX] & tracking
+            in_position[1:-1] = main_in_position
+            in_position[-1] = m3_in_position and np.all(
+                main_in_position | ~axes_in_use[MAIN_AXES_INDEX]
+            )
+
+        if m3_in_position:
+            # we are either at a port or at an unknown position
+            # exit port enum values = m3state enum values
+            # for the known exit ports
+            if exit_port is not None:
+                state.m3_state = M3State(exit_port)
+            else:
+                # Move is finished, but not at a known point
+                state.m3_state = M3State.UNKNOWNPOSITION
+        elif m3actuator.kind(tai) == m3actuator.Kind.Slewing:
+            state.m3_state = M3State.INMOTION
+        else:
+            state.m3_state = M3State.UNKNOWNPOSITION
+
+    def next_transition_tai(self, tai):
+        """Predict when the state reported by events may next change,
+        if no commands are received.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+
+        Returns
+        -------
+        transition_tai : `float` or `None`
+            The earliest time after ``tai`` at which `step` may change
+            the state reported by events (TAI unix seconds),
+            or None if the state will not change without a command.
+
+        Notes
+        -----
+        The candidate transitions are: the end of a halt started by
+        `stop_tracking` or `disable_all_drives`, the next target
+        loaded by `load_trajectory`, the start of the next segment
+        of the path of any axis (which includes the end of a slew,
+        e.g. M3 arriving at a port), and any axis reaching
+        a limit switch or (for azimuth) a topple block switch.
+        Some candidates may not change any event; calling `step`
+        then is harmless.
+        """
+        candidates = [
+            self.stop_tracking_end_tai,
+            self.disable_drives_end_tai,
+        ]
+        if self.trajectory_remaining > 0:
+            candidates.append(self._trajectory_apply_tai[self._trajectory_index])
+        for axis in Axis:
+            path = self.actuators[axis].path
+            candidates.append(next_segment_tai(path, tai))
+            switch_positions = [
+                self.min_limit_switch_position[axis],
+                self.max_limit_switch_position[axis],
+            ]
+            if axis == Axis.Azimuth:
+                switch_positions += list(self.topple_azimuth)
+            candidates.append(
+                next_crossing_tai(path=path, tai=tai, positions=switch_positions)
+            )
+        return min(
+            (
+                candidate
+                for candidate in candidates
+                if candidate is not None and candidate > tai
+            ),
+            default=None,
+        )
+
+    def _update_halts(self, tai):
+        """Finish halts started by `stop_tracking`
+        and `disable_all_drives` that are done.
+
+        Parameters
+        ----------
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        if self.stop_tracking_end_tai is not None and self._all_stopped(
+            axes=MainAxes, tai=tai
+        ):
+            self.stop_tracking_end_tai = None
+        if self.disable_drives_end_tai is not None and self._all_stopped(
+            axes=Axis, tai=tai
+        ):
+            self.state.make_writable()
+            self.axis_enabled[:] = False
+            self.disable_drives_end_tai = None
+
+    def _all_stopped(self, axes, tai):
+        """Do the actuators of all specified axes report ``Kind.Stopped``?
+
+        Parameters
+        ----------
+        axes : ``iterable`` [`Axis`]
+            The axes to check.
+        tai : `float`
+            Current time, TAI unix seconds.
+        """
+        for axis in axes:
+            actuator = self.actuators[axis]
+            if actuator.kind(tai) != actuator.Kind.Stopped:
+                return False
+        return True
@@ -0,0 +1,191 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["MountState"]
+
+import numpy as np
+
+from lsst.ts.idl.enums.ATMCS import AtMountState, M3State
+
+from .axis import Axis, MainAxes
+
+NAXES = len(Axis)
+
+# Layout of the float buffer of MountState: field name: (start, shape).
+FLOAT_FIELDS = dict(position=(0, (NAXES,)), velocity=(NAXES, (NAXES,)))
+
+# Layout of the bool buffer of MountState: field name: (start, shape).
+# limit_switch interleaves the minimum and maximum switch of each axis,
+# which is the order of the limit switch events of `ATMCSCsc`.
+BOOL_FIELDS = dict(
+    axis_enabled=(0, (NAXES,)),
+    brake_engaged=(NAXES, (NAXES,)),
+    limit_switch=(2 * NAXES, (NAXES, 2)),
+    topple_block=(4 * NAXES, (2,)),
+    in_position=(4 * NAXES + 2, (len(MainAxes) + 2,)),
+)
+
+# Names of all array fields of MountState.
+ARRAY_FIELDS = (
+    tuple(FLOAT_FIELDS) + tuple(BOOL_FIELDS) + ("below_min_limit", "above_max_limit")
+)
+
+
+def _buffer_size(fields):
+    """Get the number of elements needed for a buffer layout."""
+    return max(start + int(np.prod(shape)) for start, shape in fields.values())
+
+
+class MountState:
+    """State of the mount, as reported by events, in one compact object.
+
+    The per-axis state is kept as a struct of arrays: every array field
+    is a view of one of two preallocated buffers (one of floats,
+    one of bools), so updating the state in place allocates nothing.
+    `snapshot` returns a read-only copy in constant time by sharing
+    the buffers; the next call to `make_writable` then copies them
+    (copy on write), so a snapshot never changes.
+
+    Attributes
+    ----------
+    tai : `float` or `None`
+        Time of the state, TAI unix seconds,
+        or None if the state has not been computed.
+    tracking_enabled : `bool`
+        Is tracking enabled?
+    mount_state : `lsst.ts.idl.enums.ATMCS.AtMountState`
+        State of the mount.
+    m3_state : `lsst.ts.idl.enums.ATMCS.M3State`
+        State of M3.
+    exit_port : `lsst.ts.idl.enums.ATMCS.M3ExitPort` or `None`
+        The instrument port M3 points to,
+        or None if not in position at a known port.
+    position : `numpy.ndarray` [`float`]
+        Position of each axis (deg).
+    velocity : `numpy.ndarray` [`float`]
+        Velocity of each axis (deg/sec).
+    axis_enabled : `numpy.ndarray` [`bool`]
+        Is the drive of each axis enabled?
+    brake_engaged : `numpy.ndarray` [`bool`]
+        Are the brakes of each axis engaged?
+    limit_switch : `numpy.ndarray` [`bool`]
+        Is each limit switch active? Shape (number of axes, 2):
+        the minimum then the maximum switch of each axis.
+    below_min_limit : `numpy.ndarray` [`bool`]
+        Is each axis below its minimum limit switch?
+        A view of ``limit_switch[:, 0]``.
+    above_max_limit : `numpy.ndarray` [`bool`]
+        Is each axis above its maximum limit switch?
+        A view of ``limit_switch[:, 1]``.
+    topple_block : `numpy.ndarray` [`bool`]
+        Are the azimuth topple block CCW and CW switches active?
+    in_position : `numpy.ndarray` [`bool`]
+        Is each axis in position? Values are, in order:
+        M3, the main axes (`MainAxes`), then all axes.
+
+    Notes
+    -----
+    Array fields must be modified in place (e.g. ``position[:] = ...``),
+    and only after calling `make_writable`; the arrays of a snapshot,
+    and of a state that has been snapshotted since the last call
+    to `make_writable`, are read-only.
+    """
+
+    __slots__ = (
+        "tai",
+        "tracking_enabled",
+        "mount_state",
+        "m3_state",
+        "exit_port",
+        "position",
+        "velocity",
+        "axis_enabled",
+        "brake_engaged",
+        "limit_switch",
+        "below_min_limit",
+        "above_max_limit",
+        "topple_block",
+        "in_position",
+        "_float_buffer",
+        "_bool_buffer",
+        "_shared",
+    )
+
+    def __init__(self):
+        self.tai = None
+        self.tracking_enabled = False
+        self.mount_state = AtMountState.TRACKINGDISABLED
+        self.m3_state = M3State.UNKNOWNPOSITION
+        self.exit_port = None
+        self._set_buffers(
+            float_buffer=np.zeros(_buffer_size(FLOAT_FIELDS), dtype=float),
+            bool_buffer=np.zeros(_buffer_size(BOOL_FIELDS), dtype=bool),
+        )
+        self.brake_engaged[:] = True
+
+    def snapshot(self):
+        """Get a read-only copy of this state.
+
+        The copy shares the array buffers of this state,
+        so the cost does not depend on the size of the state.
+
+        Returns
+        -------
+        snapshot : `MountState`
+            The copy. Its arrays are read-only and it never changes.
+        """
+        if not self._shared:
+            for name in ARRAY_FIELDS:
+                getattr(self, name).flags.writeable = False
+            self._shared = True
+        snapshot = MountState.__new__(MountState)
+        for name in self.__slots__:
+            setattr(snapshot, name, getattr(self, name))
+        return snapshot
+
+    def make_writable(self):
+        """Make the array fields writable, copying the buffers
+        if they are shared with a snapshot.
+
+        Call this before modifying any array field in place.
+        The array fields may be replaced by new arrays,
+        so do not hold onto them across this call.
+        """
+        if self._shared:
+            self._set_buffers(
+                float_buffer=self._float_buffer.copy(),
+                bool_buffer=self._bool_buffer.copy(),
+            )
+
+    def _set_buffers(self, float_buffer, bool_buffer):
+        """Set the buffers and make the array fields views of them."""
+        self._float_buffer = float_buffer
+        self._bool_buffer = bool_buffer
+        self._shared = False
+        for buffer, fields in (
+            (float_buffer, FLOAT_FIELDS),
+            (bool_buffer, BOOL_FIELDS),
+        ):
+            for name, (start, shape) in fields.items():
+                size = int(np.prod(shape))
+                setattr(self, name, buffer[start : start + size].reshape(shape))
+        self.below_min_limit = self.limit_switch[:, 0]
+        self.above_max_limit = self.limit_switch[:, 1]
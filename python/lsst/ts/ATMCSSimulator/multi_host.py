@@ -0,0 +1,363 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["MultiCscHost"]
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import time
+
+from lsst.ts import salobj
+from .axis import Axis
+from .clock import Clock, ScaledClock
+from .mcs_csc import ATMCSCsc
+from .path_utils import evaluate_paths
+from .scheduler import DeadlineScheduler, OverrunPolicy
+
+# Summary states in which a CSC outputs events and telemetry.
+ACTIVE_STATES = (salobj.State.DISABLED, salobj.State.ENABLED)
+
+
+class MultiCscHost:
+    """Run many simulated ATMCS CSCs in one process, on one event loop.
+
+    Parameters
+    ----------
+    indices : ``iterable`` of `int`
+        SAL index of each CSC. See the ``index`` argument of `ATMCSCsc`
+        for a caveat about nonzero indices.
+    initial_state : `lsst.ts.salobj.State` or `int` (optional)
+        The initial state of every CSC.
+    configs : `dict` [`int`, `dict`] (optional)
+        Configuration for some or all CSCs: a dict of SAL index:
+        keyword arguments for `ATMCSCsc.configure`.
+        CSCs that are not listed use the default configuration.
+    overrun_policy : `OverrunPolicy` (optional)
+        What to do when the shared loop falls behind.
+    clock : `Clock` (optional)
+        Clock shared by all CSCs. If None then use a real-time `Clock`.
+
+    Raises
+    ------
+    ValueError
+        If ``indices`` is empty or has duplicates,
+        or ``configs`` has an index that is not in ``indices``.
+    lsst.ts.salobj.ExpectedError
+        If a configuration is invalid.
+
+    Attributes
+    ----------
+    cscs : `dict` [`int`, `ATMCSCsc`]
+        The CSCs, by SAL index.
+    loop_scheduler : `DeadlineScheduler`
+        Schedules the ticks of the shared event and telemetry loop.
+    instance_cpu : `dict` [`int`, `float`]
+        CPU time used by each CSC (sec); see Notes.
+    shared_cpu : `float`
+        CPU time used by work done for all CSCs at once (sec),
+        such as evaluating the paths of all axes for telemetry.
+    start_task : `asyncio.Task`
+        Task that is done when all CSCs have started
+        and the shared loop is running.
+
+    Notes
+    -----
+    The CSCs are constructed with ``run_loop=False`` and a single loop
+    updates the events of every CSC that is disabled or enabled at each
+    tick, then outputs the telemetry topics that are due.
+    The telemetry of all CSCs whose topics share a `TelemetryRate`
+    is computed with one call to `evaluate_paths`, so the cost
+    of computing telemetry grows much more slowly than the number of CSCs.
+
+    CPU time is measured with `time.thread_time` around the work done
+    for each CSC: updating events, writing telemetry, and synchronous
+    command handlers. Asynchronous command handlers are not included,
+    because other tasks run while they wait, nor is the time salobj
+    spends reading commands and writing topics outside of that work;
+    `get_stats` reports the total process CPU time for comparison.
+    """
+
+    def __init__(
+        self,
+        indices,
+        initial_state=salobj.State.STANDBY,
+        configs=None,
+        overrun_policy=OverrunPolicy.CATCH_UP,
+        clock=None,
+    ):
+        indices = list(indices)
+        if not indices:
+            raise ValueError("Must specify at least one index")
+        if len(set(indices)) != len(indices):
+            raise ValueError(f"indices={indices} has duplicates")
+        configs = dict() if configs is None else configs
+        unknown_indices = sorted(set(configs) - set(indices))
+        if unknown_indices:
+            raise ValueError(f"configs has unknown indices {unknown_indices}")
+
+        self.clock = Clock() if clock is None else clock
+        self.log = logging.getLogger("MultiCscHost")
+        self.cscs = dict()
+        self.instance_cpu = dict()
+        self.shared_cpu = 0
+        for index in indices:
+            csc = ATMCSCsc(
+                initial_state=initial_state,
+                clock=self.clock,
+                index=index,
+                run_loop=False,
+            )
+            if index in configs:
+                csc.configure(**configs[index])
+            self._account_commands(csc)
+            self.cscs[index] = csc
+            self.instance_cpu[index] = 0
+
+        self.loop_scheduler = DeadlineScheduler(
+            period=self.cscs[indices[0]].loop_scheduler.period,
+            policy=overrun_policy,
+            clock=self.clock,
+        )
+        self._loop_task = salobj.make_done_future()
+        self._stats_task = salobj.make_done_future()
+        self._start_monotonic = time.monotonic()
+        self._start_process_cpu = time.process_time()
+        self.start_task = asyncio.ensure_future(self.start())
+
+    def _account_commands(self, csc):
+        """Add the CPU time of the synchronous command handlers of a CSC
+        to ``self.instance_cpu``.
+        """
+        for command_name in csc.salinfo.command_names:
+            command = getattr(csc, f"cmd_{command_name}")
+            if asyncio.iscoroutinefunction(command.callback):
+                continue
+            command.callback = functools.partial(
+                self._call_accounted, csc.salinfo.index, command.callback
+            )
+
+    def _call_accounted(self, index, func, *args, **kwargs):
+        t0 = time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.instance_cpu[index] += time.thread_time() - t0
+
+    async def start(self):
+        """Wait for all CSCs to start, then start the shared loop."""
+        await asyncio.gather(*[csc.start_task for csc in self.cscs.values()])
+        self._start_monotonic = time.monotonic()
+        self._start_process_cpu = time.process_time()
+        self._loop_task = asyncio.ensure_future(self.events_and_telemetry_loop())
+
+    async def close(self):
+        """Stop the shared loop and close all CSCs."""
+        self._stats_task.cancel()
+        self._loop_task.cancel()
+        await asyncio.gather(*[csc.close() for csc in self.cscs.values()])
+
+    async def __aenter__(self):
+        await self.start_task
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+    async def events_and_telemetry_loop(self):
+        """Update events and output telemetry for all active CSCs.
+
+        This plays the role of `ATMCSCsc.events_and_telemetry_loop`
+        for every CSC: events are updated at every tick of
+        ``self.loop_scheduler`` and each telemetry topic at the ticks
+        given by the CSC's ``telemetry_schedule``.
+        """
+        self.loop_scheduler.reset()
+        start_tai = self.clock.tai()
+        while True:
+            tick = await self.loop_scheduler.wait_next()
+            active_cscs = [
+                csc for csc in self.cscs.values() if csc.summary_state in ACTIVE_STATES
+            ]
+            for csc in active_cscs:
+                t0 = time.thread_time()
+                try:
+                    csc.update_events()
+                except Exception:
+                    # update_events logged the error and counted it
+                    # in csc.metrics; keep updating the other CSCs.
+                    pass
+                finally:
+                    self.instance_cpu[csc.salinfo.index] += time.thread_time() - t0
+
+            # Dict of TelemetryRate: list of (CSC, TelemetryGroup)
+            groups_for_rate = dict()
+            for csc in active_cscs:
+                for group in csc.telemetry_schedule.due(tick.index):
+                    groups_for_rate.setdefault(group.rate, []).append((csc, group))
+            tai = start_tai + tick.deadline - self.loop_scheduler.start_time
+            for csc_groups in groups_for_rate.values():
+                self.update_telemetry(csc_groups=csc_groups, tai=tai)
+
+    def update_telemetry(self, csc_groups, tai):
+        """Compute and output telemetry topics for several CSCs.
+
+        Parameters
+        ----------
+        csc_groups : `list` [`tuple`]
+            The topics to output: a list of (`ATMCSCsc`, `TelemetryGroup`).
+            All groups must have the same `TelemetryRate`.
+        tai : `float`
+            End of the telemetry window (TAI unix seconds);
+            see `ATMCSCsc.update_telemetry`.
+        """
+        t0 = time.thread_time()
+        first_csc, first_group = csc_groups[0]
+        times = first_csc.telemetry_schedule.sample_times(first_group, tai)
+        position, velocity, acceleration = evaluate_paths(
+            [actuator.path for csc, group in csc_groups for actuator in csc.actuators],
+            times,
+        )
+        self.shared_cpu += time.thread_time() - t0
+
+        naxes = len(Axis)
+        for i, (csc, group) in enumerate(csc_groups):
+            t0 = time.thread_time()
+            rows = slice(i * naxes, (i + 1) * naxes)
+            try:
+                with csc.account_telemetry():
+                    csc.write_telemetry(
+                        group=group,
+                        times=times,
+                        position=position[rows],
+                        velocity=velocity[rows],
+                        acceleration=acceleration[rows],
+                    )
+            except Exception:
+                # account_telemetry logged the error and counted it
+                # in csc.metrics; keep writing the other CSCs.
+                pass
+            finally:
+                self.instance_cpu[csc.salinfo.index] += time.thread_time() - t0
+
+    def get_stats(self):
+        """Get CPU usage and timing statistics.
+
+        Returns
+        -------
+        stats : `dict`
+            Statistics since the shared loop started, with these keys:
+
+            * ``ninstances``: number of CSCs.
+            * ``nactive``: number of CSCs that are disabled or enabled.
+            * ``elapsed``: elapsed real time (sec).
+            * ``process_cpu``: CPU time used by the process (sec).
+            * ``instance_cpu``: a dict of SAL index: CPU time used
+              for that CSC (sec); see Notes for `MultiCscHost`.
+            * ``shared_cpu``: CPU time used for all CSCs at once (sec).
+            * ``instances_per_core``: estimated number of CSCs
+              that one core could run at the current load:
+              ``ninstances * elapsed / process_cpu``.
+            * ``loop_scheduler``: ``self.loop_scheduler.get_stats()``.
+        """
+        elapsed = time.monotonic() - self._start_monotonic
+        process_cpu = time.process_time() - self._start_process_cpu
+        ninstances = len(self.cscs)
+        return dict(
+            ninstances=ninstances,
+            nactive=sum(
+                csc.summary_state in ACTIVE_STATES for csc in self.cscs.values()
+            ),
+            elapsed=elapsed,
+            process_cpu=process_cpu,
+            instance_cpu=dict(self.instance_cpu),
+            shared_cpu=self.shared_cpu,
+            instances_per_core=ninstances * elapsed / process_cpu
+            if process_cpu > 0
+            else 0,
+            loop_scheduler=self.loop_scheduler.get_stats(),
+        )
+
+    async def stats_loop(self, interval):
+        """Log `get_stats` every ``interval`` seconds (real time)."""
+        while True:
+            await asyncio.sleep(interval)
+            self.log.info(f"stats: {json.dumps(self.get_stats())}")
+
+    @classmethod
+    async def amain(cls):
+        """Run CSCs from the command line until all of them have quit.
+        """
+        parser = argparse.ArgumentParser(
+            description="Run many ATMCS simulators in one process"
+        )
+        parser.add_argument(
+            "indices", type=int, nargs="+", help="SAL index of each CSC"
+        )
+        parser.add_argument(
+            "--state",
+            choices=["standby", "disabled", "enabled"],
+            default="standby",
+            help="initial state of all CSCs",
+        )
+        parser.add_argument(
+            "--clock-scale",
+            type=float,
+            default=1,
+            help="Run the simulators this many times faster than real time.",
+        )
+        parser.add_argument(
+            "--config",
+            help="JSON file containing a dict of SAL index: "
+            "dict of ATMCSCsc.configure arguments.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=0,
+            help="Interval between logging CPU statistics (sec); "
+            "0 to not log statistics.",
+        )
+        args = parser.parse_args()
+        configs = None
+        if args.config is not None:
+            with open(args.config, "r") as f:
+                configs = {int(index): config for index, config in json.load(f).items()}
+        clock = ScaledClock(scale=args.clock_scale) if args.clock_scale != 1 else None
+        logging.basicConfig(level=logging.INFO)
+
+        host = cls(
+            indices=args.indices,
+            initial_state=getattr(salobj.State, args.state.upper()),
+            configs=configs,
+            clock=clock,
+        )
+        try:
+            await host.start_task
+            if args.stats_interval > 0:
+                host._stats_task = asyncio.ensure_future(
+                    host.stats_loop(args.stats_interval)
+                )
+            await asyncio.gather(*[csc.done_task for csc in host.cscs.values()])
+        finally:
+            await host.close()
@@ -0,0 +1,219 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["evaluate_paths", "next_crossing_tai", "next_segment_tai"]
+
+import math
+
+import numpy as np
+
+
+def evaluate_paths(paths, times):
+    """Evaluate several paths at many times in one pass.
+
+    This is a vectorized equivalent of calling ``path.at(tai)``
+    for every path and every time.
+
+    Parameters
+    ----------
+    paths : ``iterable`` of `lsst.ts.simactuators.path.Path`
+        The paths to evaluate, e.g. one per axis.
+    times : ``iterable`` of `float`
+        Times at which to evaluate the paths (TAI unix seconds).
+
+    Returns
+    -------
+    position : `numpy.ndarray`
+        Position of each path at each time;
+        shape (number of paths, number of times).
+    velocity : `numpy.ndarray`
+        Velocity, with the same shape as ``position``.
+    acceleration : `numpy.ndarray`
+        Acceleration, with the same shape as ``position``.
+
+    Notes
+    -----
+    As with ``Path.at``, each time is evaluated using the last segment
+    that starts at or before that time, or the first segment
+    if the time is before the start of the path.
+
+    If ``times`` is sorted (as it is for a telemetry window) then
+    the segment for each time is found by walking the segment start times
+    and the sample times together, so the cost is proportional to
+    the number of samples plus the number of segments.
+    Otherwise each time is looked up separately.
+    """
+    times = np.asarray(times, dtype=float)
+    segment_lists = [path.segments for path in paths]
+    # Coefficients of all segments of all paths: tai, position,
+    # velocity, acceleration; shape (total number of segments, 4).
+    coeffs = np.array(
+        [
+            (segment.tai, segment.position, segment.velocity, segment.acceleration)
+            for segments in segment_lists
+            for segment in segments
+        ],
+        dtype=float,
+    )
+    nsegments = np.array([len(segments) for segments in segment_lists], dtype=int)
+    # Index in coeffs of the first segment of each path.
+    offsets = np.cumsum(nsegments) - nsegments
+    if np.all(times[1:] >= times[:-1]):
+        indices = _sorted_segment_indices(coeffs[:, 0], nsegments, offsets, times)
+    else:
+        indices = np.empty((len(segment_lists), len(times)), dtype=int)
+        for i, (offset, nseg) in enumerate(zip(offsets, nsegments)):
+            segment_tais = coeffs[offset : offset + nseg, 0]
+            indices[i] = offset + np.maximum(
+                np.searchsorted(segment_tais, times, side="right") - 1, 0
+            )
+
+    selected = coeffs[indices]
+    dt = times - selected[..., 0]
+    start_velocity = selected[..., 2]
+    acceleration = selected[..., 3]
+    position = selected[..., 1] + dt * (start_velocity + dt * 0.5 * acceleration)
+    velocity = start_velocity + dt * acceleration
+    return position, velocity, acceleration
+
+
+def _sorted_segment_indices(segment_tais, nsegments, offsets, times):
+    """Find the segment to use for each path at each of a sorted
+    array of times.
+
+    Parameters
+    ----------
+    segment_tais : `numpy.ndarray`
+        Start time of every segment of every path, grouped by path.
+    nsegments : `numpy.ndarray`
+        Number of segments in each path.
+    offsets : `numpy.ndarray`
+        Index in ``segment_tais`` of the first segment of each path.
+    times : `numpy.ndarray`
+        Times, in increasing order.
+
+    Returns
+    -------
+    indices : `numpy.ndarray`
+        Index in ``segment_tais`` of the segment to use for each path
+        at each time; shape (number of paths, number of times).
+    """
+    # For each segment: index of the first time at or after its start.
+    # Each segment after the first of its path is a boundary
+    # at which the segment index for that path increases by one,
+    # so the segment indices are a running sum of boundary counts.
+    first_time_indices = np.searchsorted(times, segment_tais, side="left")
+    path_indices = np.repeat(np.arange(len(nsegments)), nsegments)
+    is_boundary = np.ones(len(segment_tais), dtype=bool)
+    is_boundary[offsets[nsegments > 0]] = False
+    counts = np.zeros((len(nsegments), len(times) + 1), dtype=int)
+    np.add.at(counts, (path_indices[is_boundary], first_time_indices[is_boundary]), 1)
+    return offsets[:, np.newaxis] + np.cumsum(counts[:, :-1], axis=1)
+
+
+def next_segment_tai(path, tai):
+    """Get the start time of the next segment of a path.
+
+    Parameters
+    ----------
+    path : `lsst.ts.simactuators.path.Path`
+        The path.
+    tai : `float`
+        Current time (TAI unix seconds).
+
+    Returns
+    -------
+    segment_tai : `float` or `None`
+        Start time of the first segment that starts after ``tai``
+        (TAI unix seconds), or None if there is no such segment.
+    """
+    for segment in path.segments:
+        if segment.tai > tai:
+            return segment.tai
+    return None
+
+
+def next_crossing_tai(path, tai, positions):
+    """Predict when a path will next reach any of several positions.
+
+    Parameters
+    ----------
+    path : `lsst.ts.simactuators.path.Path`
+        The path. As with ``Path.at``, the last segment
+        is extrapolated forever.
+    tai : `float`
+        Current time (TAI unix seconds).
+    positions : ``iterable`` of `float`
+        Positions of interest, e.g. limit switch positions (deg).
+
+    Returns
+    -------
+    crossing_tai : `float` or `None`
+        The earliest time after ``tai`` at which the path
+        is at one of ``positions`` (TAI unix seconds),
+        or None if it never will be.
+
+    Notes
+    -----
+    Each segment is a quadratic in time, so the crossings
+    of each segment are found by solving a quadratic equation.
+    Touching a position without crossing it counts as reaching it.
+    """
+    segments = path.segments
+    # Index of the segment in use at time tai.
+    start_index = 0
+    for i, segment in enumerate(segments):
+        if segment.tai <= tai:
+            start_index = i
+    for i in range(start_index, len(segments)):
+        segment = segments[i]
+        end_tai = segments[i + 1].tai if i + 1 < len(segments) else math.inf
+        if end_tai <= tai:
+            continue
+        # Each segment is used from its start (or from tai, for the segment
+        # in use at tai, which may be the first segment extrapolated
+        # backwards) until the start of the next segment.
+        start_tai = tai if i == start_index else segment.tai
+        # Solve 0.5 a dt^2 + v dt + (p0 - p) = 0 for dt = t - segment.tai.
+        # There are only a few positions and roots, so plain Python
+        # is faster than numpy.
+        half_accel = 0.5 * segment.acceleration
+        velocity = segment.velocity
+        dts = []
+        for position in positions:
+            offset = segment.position - position
+            if half_accel == 0:
+                if velocity != 0:
+                    dts.append(-offset / velocity)
+            else:
+                discriminant = velocity * velocity - 4 * half_accel * offset
+                if discriminant >= 0:
+                    sqrt_discriminant = math.sqrt(discriminant)
+                    dts.append((-velocity - sqrt_discriminant) / (2 * half_accel))
+                    dts.append((-velocity + sqrt_discriminant) / (2 * half_accel))
+        crossing_tais = [
+            segment.tai + dt
+            for dt in dts
+            if start_tai <= segment.tai + dt < end_tai and segment.tai + dt > tai
+        ]
+        if crossing_tais:
+            return min(crossing_tais)
+    return None
@@ -0,0 +1,619 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = [
+    "RECORDING_FORMAT_VERSION",
+    "Recorder",
+    "Recording",
+    "StreamDiff",
+    "compare_recordings",
+    "replay_recording",
+    "replay_amain",
+]
+
+import argparse
+import asyncio
+import collections
+import functools
+import inspect
+import itertools
+import json
+import pathlib
+import tempfile
+
+import numpy as np
+
+from lsst.ts import salobj
+from .clock import VirtualClock
+
+# Version of the recording format; see `Recorder`.
+RECORDING_FORMAT_VERSION = 1
+
+# Names of the files in a recording directory.
+SCHEMA_FILENAME = "schema.json"
+CONFIGURE_FILENAME = "configure.jsonl"
+
+# Names of the columns that every stream has.
+TAI_COLUMN = "tai"
+SEQ_COLUMN = "seq"
+
+# Time to continue a replay after the last recorded record (sec).
+END_MARGIN = 0.001
+
+# Python type of each field type name in the schema.
+FIELD_TYPES = dict(bool=bool, int=int, float=float)
+
+StreamDiff = collections.namedtuple(
+    "StreamDiff", ["name", "nexpected", "nactual", "max_abs_diff", "field"]
+)
+StreamDiff.__doc__ = """Difference between an output stream of two recordings.
+
+Parameters
+----------
+name : `str`
+    Stream name, e.g. ``evt_atMountState`` or ``tel_trajectory``.
+nexpected : `int`
+    Number of records in the expected recording.
+nactual : `int`
+    Number of records in the actual recording.
+max_abs_diff : `float`
+    Maximum absolute difference of any field of the records
+    that both recordings have (the first ``min(nexpected, nactual)``).
+    0 if there are no such records.
+field : `str` or `None`
+    Name of the field with the maximum difference,
+    or None if there is no difference.
+"""
+
+
+def _field_type_name(value):
+    """Get the `FIELD_TYPES` key for a scalar field value,
+    or None if the value is not numeric.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    elif isinstance(value, (int, np.integer)):
+        return "int"
+    elif isinstance(value, (float, np.floating)):
+        return "float"
+    return None
+
+
+def _field_schema(data):
+    """Get the recordable fields of a topic's data.
+
+    Numeric scalars and arrays are recorded; other fields, such as
+    strings and the ``private_`` fields, are not.
+
+    Returns
+    -------
+    fields : `list` [`list`]
+        A list of [field name, type name, shape] for each recorded field,
+        where type name is one of the keys of `FIELD_TYPES`
+        and shape is a list: [] for a scalar, [length] for an array.
+    """
+    fields = []
+    for name, value in data.get_vars().items():
+        if name.startswith("private_"):
+            continue
+        shape = []
+        if isinstance(value, (list, tuple, np.ndarray)):
+            if len(value) == 0:
+                continue
+            shape = [len(value)]
+            value = value[0]
+        type_name = _field_type_name(value)
+        if type_name is not None:
+            fields.append([name, type_name, shape])
+    return fields
+
+
+def _stream_dtype(fields):
+    """Get the record dtype of a stream with the specified fields."""
+    return np.dtype(
+        [(TAI_COLUMN, "<f8"), (SEQ_COLUMN, "<i8")]
+        + [(name, "<f8", tuple(shape)) for name, type_name, shape in fields]
+    )
+
+
+class _Stream:
+    """A stream of records being written by a `Recorder`."""
+
+    def __init__(self, directory, name, kind, fields):
+        self.name = name
+        self.kind = kind
+        self.fields = fields
+        self.field_names = [name for name, type_name, shape in fields]
+        self.row = np.zeros(1, dtype=_stream_dtype(fields))
+        # Unbuffered, so readers can see each record as soon as it is written.
+        self.file = open(directory / f"{name}.bin", "ab", buffering=0)
+
+
+class Recorder:
+    """Record the commands received and the events and telemetry
+    output by an `ATMCSCsc`.
+
+    Parameters
+    ----------
+    csc : `ATMCSCsc`
+        The CSC to record.
+    path : `str` or `pathlib.Path`
+        Directory in which to write the recording.
+        Must not exist (but its parent directory must).
+
+    Raises
+    ------
+    FileExistsError
+        If ``path`` already exists.
+
+    Notes
+    -----
+    A recording is a directory containing:
+
+    * ``schema.json``: the format version, the initial summary state
+      and start time of the CSC, and the name, kind (command, event
+      or telemetry) and fields of each stream.
+    * ``<stream>.bin``: one file per stream, e.g. ``cmd_trackTarget.bin``
+      or ``tel_trajectory.bin``, containing fixed-size little-endian
+      records with no header: the ``tai`` at which the command was
+      received or the topic output, a ``seq`` number that orders records
+      across all streams, then every recorded field as float64 scalars
+      or arrays. Each file can be memory-mapped as a `numpy` structured
+      array (see `Recording`), whose fields are the columns.
+    * ``configure.jsonl``: one line of JSON for each call to
+      `ATMCSCsc.configure` or `ATMCSCsc.reconfigure`, with the ``tai``,
+      ``seq``, ``method`` name and arguments. ``method`` may be absent,
+      in which case it is "configure".
+
+    Files are only appended to. Records are written unbuffered,
+    so a recording can be read while it is being written.
+
+    Recorded fields are numeric scalars and arrays; strings and
+    ``private_`` fields are not recorded, nor are the topics in
+    ``ignored_topics``, which are output at real-time intervals
+    or only contain text.
+    """
+
+    ignored_topics = ("evt_heartbeat", "evt_logMessage")
+
+    def __init__(self, csc, path):
+        self.csc = csc
+        self.path = pathlib.Path(path)
+        self.path.mkdir()
+        self._seq = itertools.count()
+        self.streams = dict()
+        for kind, prefix, names in (
+            ("command", "cmd", csc.salinfo.command_names),
+            ("event", "evt", csc.salinfo.event_names),
+            ("telemetry", "tel", csc.salinfo.telemetry_names),
+        ):
+            for name in names:
+                stream_name = f"{prefix}_{name}"
+                if stream_name in self.ignored_topics:
+                    continue
+                topic = getattr(csc, stream_name)
+                data = topic.DataType() if kind == "command" else topic.data
+                stream = _Stream(
+                    directory=self.path,
+                    name=stream_name,
+                    kind=kind,
+                    fields=_field_schema(data),
+                )
+                self.streams[stream_name] = stream
+                if kind == "command":
+                    topic.callback = self._wrap_command(stream, topic.callback)
+                else:
+                    topic.put = functools.partial(
+                        self._put_and_record, stream, topic, topic.put
+                    )
+        schema = dict(
+            format_version=RECORDING_FORMAT_VERSION,
+            initial_state=int(csc.summary_state),
+            start_tai=csc.clock.tai(),
+            streams={
+                name: dict(kind=stream.kind, fields=stream.fields)
+                for name, stream in self.streams.items()
+            },
+        )
+        with open(self.path / SCHEMA_FILENAME, "w") as f:
+            json.dump(schema, f, indent=1)
+        self._configure_file = open(self.path / CONFIGURE_FILENAME, "a")
+
+    def _wrap_command(self, stream, callback):
+        """Wrap a command callback so the command is recorded
+        when it is received.
+        """
+        if asyncio.iscoroutinefunction(callback):
+
+            @functools.wraps(callback)
+            async def wrapper(data):
+                self.write(stream, data)
+                return await callback(data)
+
+        else:
+
+            @functools.wraps(callback)
+            def wrapper(data):
+                self.write(stream, data)
+                return callback(data)
+
+        return wrapper
+
+    def _put_and_record(self, stream, topic, put, data=None):
+        put(data)
+        self.write(stream, topic.data if data is None else data)
+
+    def write(self, stream, data):
+        """Append a record to a stream.
+
+        Parameters
+        ----------
+        stream : `_Stream`
+            The stream.
+        data : `any`
+            Topic data, with a ``get_vars`` method.
+        """
+        if stream.file.closed:
+            return
+        row = stream.row
+        row[TAI_COLUMN] = self.csc.clock.tai()
+        row[SEQ_COLUMN] = next(self._seq)
+        values = data.get_vars()
+        for name in stream.field_names:
+            row[name] = values[name]
+        stream.file.write(row.tobytes())
+
+    def record_configure(self, kwargs, method_name="configure"):
+        """Record a call to `ATMCSCsc.configure`
+        or `ATMCSCsc.reconfigure`.
+
+        Parameters
+        ----------
+        kwargs : `dict`
+            The arguments to the method.
+        method_name : `str` (optional)
+            The name of the method: "configure" or "reconfigure".
+        """
+        if self._configure_file.closed:
+            return
+        line = json.dumps(
+            dict(
+                tai=self.csc.clock.tai(),
+                seq=next(self._seq),
+                method=method_name,
+                kwargs=kwargs,
+            ),
+            default=lambda value: np.asarray(value).tolist(),
+        )
+        self._configure_file.write(line + "\n")
+        self._configure_file.flush()
+
+    def close(self):
+        """Stop recording and close the files."""
+        for stream in self.streams.values():
+            stream.file.close()
+        self._configure_file.close()
+
+
+class Recording:
+    """A recording made by `Recorder`, memory-mapped read-only.
+
+    Parameters
+    ----------
+    path : `str` or `pathlib.Path`
+        Directory containing the recording.
+
+    Raises
+    ------
+    ValueError
+        If the recording has an unsupported format version.
+
+    Attributes
+    ----------
+    path : `pathlib.Path`
+        Directory containing the recording.
+    initial_state : `lsst.ts.salobj.State`
+        Summary state of the CSC when recording started.
+    start_tai : `float`
+        Time at which recording started (TAI unix seconds).
+    kinds : `dict` [`str`, `str`]
+        Kind of each stream: "command", "event" or "telemetry".
+    field_types : `dict` [`str`, `dict` [`str`, `type`]]
+        Python type of each recorded field of each stream.
+    streams : `dict` [`str`, `numpy.ndarray`]
+        The records of each stream, as a read-only memory-mapped
+        structured array whose fields are ``tai``, ``seq``
+        and the recorded fields of the topic.
+        A record that was only partly written is ignored.
+    configure_calls : `list` [`dict`]
+        The recorded calls to `ATMCSCsc.configure`
+        and `ATMCSCsc.reconfigure`, each a dict with keys
+        ``tai``, ``seq``, ``kwargs`` and (optionally) ``method``.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        with open(self.path / SCHEMA_FILENAME, "r") as f:
+            schema = json.load(f)
+        if schema["format_version"] != RECORDING_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported recording format_version={schema['format_version']}; "
+                f"must be {RECORDING_FORMAT_VERSION}"
+            )
+        self.initial_state = salobj.State(schema["initial_state"])
+        self.start_tai = schema["start_tai"]
+        self.kinds = dict()
+        self.field_types = dict()
+        self.streams = dict()
+        for name, stream_info in schema["streams"].items():
+            self.kinds[name] = stream_info["kind"]
+            self.field_types[name] = {
+                field_name: FIELD_TYPES[type_name]
+                for field_name, type_name, shape in stream_info["fields"]
+            }
+            dtype = _stream_dtype(stream_info["fields"])
+            stream_path = self.path / f"{name}.bin"
+            nrecords = stream_path.stat().st_size // dtype.itemsize
+            if nrecords > 0:
+                self.streams[name] = np.memmap(
+                    stream_path, dtype=dtype, mode="r", shape=(nrecords,)
+                )
+            else:
+                self.streams[name] = np.zeros(0, dtype=dtype)
+        with open(self.path / CONFIGURE_FILENAME, "r") as f:
+            self.configure_calls = [json.loads(line) for line in f if line.strip()]
+
+    @property
+    def end_tai(self):
+        """Time of the last record (TAI unix seconds),
+        or ``start_tai`` if there are no records.
+        """
+        return max(
+            [self.start_tai]
+            + [
+                records[TAI_COLUMN][-1]
+                for records in self.streams.values()
+                if records.size > 0
+            ]
+            + [call["tai"] for call in self.configure_calls]
+        )
+
+    def get_fields(self, name, record):
+        """Get the recorded fields of a record as a dict
+        of Python values of the original types.
+
+        Parameters
+        ----------
+        name : `str`
+            Stream name.
+        record : `numpy.void`
+            A record of that stream.
+        """
+        fields = dict()
+        for field_name, field_type in self.field_types[name].items():
+            value = record[field_name]
+            if value.ndim > 0:
+                fields[field_name] = [field_type(item) for item in value]
+            else:
+                fields[field_name] = field_type(value)
+        return fields
+
+    def get_inputs(self):
+        """Get all commands and calls to ``configure`` and ``reconfigure``,
+        in order received.
+
+        Returns
+        -------
+        inputs : `list` [`tuple`]
+            A list of (tai, name, kwargs), where name is the command
+            stream name (e.g. ``cmd_trackTarget``), ``configure``
+            or ``reconfigure``, and kwargs is a dict of the command fields
+            or the method arguments.
+        """
+        inputs = []
+        for name, records in self.streams.items():
+            if self.kinds[name] != "command":
+                continue
+            for record in records:
+                inputs.append(
+                    (
+                        record[SEQ_COLUMN],
+                        float(record[TAI_COLUMN]),
+                        name,
+                        self.get_fields(name, record),
+                    )
+                )
+        for call in self.configure_calls:
+            inputs.append(
+                (
+                    call["seq"],
+                    call["tai"],
+                    call.get("method", "configure"),
+                    call["kwargs"],
+                )
+            )
+        return [(tai, name, kwargs) for seq, tai, name, kwargs in sorted(inputs)]
+
+
+def compare_recordings(expected, actual):
+    """Compare the events and telemetry output in two recordings.
+
+    Parameters
+    ----------
+    expected : `Recording`
+        The expected recording, e.g. of a production incident.
+    actual : `Recording`
+        The actual recording, e.g. from `replay_recording`.
+
+    Returns
+    -------
+    diffs : `list` [`StreamDiff`]
+        The difference for each event and telemetry stream
+        in either recording, sorted by name.
+        Records are compared in order, field by field,
+        ignoring the ``tai`` and ``seq`` columns.
+    """
+    diffs = []
+    names = sorted(
+        name
+        for name in set(expected.streams) | set(actual.streams)
+        if (expected.kinds.get(name) or actual.kinds.get(name)) != "command"
+    )
+    for name in names:
+        expected_records = expected.streams.get(name)
+        actual_records = actual.streams.get(name)
+        nexpected = 0 if expected_records is None else len(expected_records)
+        nactual = 0 if actual_records is None else len(actual_records)
+        max_abs_diff = 0
+        max_field = None
+        nboth = min(nexpected, nactual)
+        if nboth > 0:
+            for field_name in expected.field_types[name]:
+                if field_name not in actual.field_types[name]:
+                    continue
+                abs_diff = np.max(
+                    np.abs(
+                        expected_records[field_name][:nboth]
+                        - actual_records[field_name][:nboth]
+                    )
+                )
+                if abs_diff > max_abs_diff:
+                    max_abs_diff = float(abs_diff)
+                    max_field = field_name
+        diffs.append(
+            StreamDiff(
+                name=name,
+                nexpected=nexpected,
+                nactual=nactual,
+                max_abs_diff=max_abs_diff,
+                field=max_field,
+            )
+        )
+    return diffs
+
+
+async def replay_recording(recording, path, log=None):
+    """Replay the commands of a recording into a new simulator,
+    as fast as possible, and record its output.
+
+    Parameters
+    ----------
+    recording : `Recording`
+        The recording to replay.
+    path : `str` or `pathlib.Path`
+        Directory in which to record the replay. Must not exist.
+    log : `logging.Logger` (optional)
+        Log for commands that fail. If None then use the CSC's log.
+
+    Returns
+    -------
+    replay : `Recording`
+        The recording of the replay.
+
+    Notes
+    -----
+    The new `ATMCSCsc` starts in the recorded initial state and uses
+    a `VirtualClock` that starts at the recorded start time.
+    Each command (and call to ``configure`` or ``reconfigure``)
+    is issued at the time
+    it was recorded, by calling the command's callback directly,
+    and the simulation continues until just after the last record.
+    Commands are issued whether or not they succeeded when recorded,
+    so the replay also reproduces rejected commands.
+    """
+    # Avoid a circular import.
+    from .mcs_csc import ATMCSCsc
+
+    clock = VirtualClock(start_tai=recording.start_tai)
+    csc = ATMCSCsc(initial_state=recording.initial_state, clock=clock, record_path=path)
+    if log is None:
+        log = csc.log
+    try:
+        await csc.start_task
+        for tai, name, kwargs in recording.get_inputs():
+            await clock.sleep(tai - clock.tai())
+            try:
+                if name in ("configure", "reconfigure"):
+                    getattr(csc, name)(**kwargs)
+                    continue
+                command = getattr(csc, name)
+                data = command.DataType()
+                for field_name, value in kwargs.items():
+                    setattr(data, field_name, value)
+                result = command.callback(data)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                log.info(f"Replayed {name} failed: {e!r}")
+        # Run just past the last record, so that all work scheduled
+        # at that time is done.
+        await clock.sleep(recording.end_tai + END_MARGIN - clock.tai())
+    finally:
+        await csc.close()
+        clock.close()
+    return Recording(path)
+
+
+async def replay_amain():
+    """Replay a recording from the command line and report differences.
+
+    Returns
+    -------
+    nmismatched : `int`
+        Number of streams that differ by more than the tolerance.
+    """
+    parser = argparse.ArgumentParser(
+        description="Replay the commands of an ATMCS simulator recording "
+        "as fast as possible, and compare the output to the recording."
+    )
+    parser.add_argument("recording", help="Directory containing the recording.")
+    parser.add_argument(
+        "--output",
+        help="Directory in which to record the replay; must not exist. "
+        "If omitted then use a temporary directory.",
+    )
+    parser.add_argument(
+        "--atol",
+        type=float,
+        default=1e-6,
+        help="Maximum allowed absolute difference of any field.",
+    )
+    args = parser.parse_args()
+    salobj.set_random_lsst_dds_domain()
+    recording = Recording(args.recording)
+    with tempfile.TemporaryDirectory() as tempdir:
+        output = (
+            pathlib.Path(tempdir) / "replay" if args.output is None else args.output
+        )
+        replay = await replay_recording(recording, output)
+        diffs = compare_recordings(recording, replay)
+
+    nmismatched = 0
+    for diff in diffs:
+        mismatched = diff.nexpected != diff.nactual or diff.max_abs_diff > args.atol
+        nmismatched += mismatched
+        print(
+            f"{'MISMATCH' if mismatched else 'ok':8s} {diff.name:34s} "
+            f"n={diff.nexpected}/{diff.nactual} "
+            f"max_abs_diff={diff.max_abs_diff:0.3g} {diff.field or ''}"
+        )
+    print(f"{nmismatched} of {len(diffs)} streams differ")
+    return nmismatched
@@ -0,0 +1,191 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["OverrunPolicy", "Tick", "DeadlineScheduler"]
+
+import collections
+import enum
+import math
+
+from .clock import Clock
+
+
+class OverrunPolicy(enum.Enum):
+    """What `DeadlineScheduler` does when one or more deadlines
+    have already passed.
+
+    * CATCH_UP: run every missed tick, back to back, until caught up.
+    * SKIP: skip all missed ticks except the most recent one,
+      which is run immediately.
+    """
+
+    CATCH_UP = enum.auto()
+    SKIP = enum.auto()
+
+
+Tick = collections.namedtuple("Tick", ["index", "deadline"])
+Tick.__doc__ = """A tick of a `DeadlineScheduler`.
+
+Parameters
+----------
+index : `int`
+    Tick index; 0 for the tick at the start time.
+    Skipped ticks are counted, so the index always equals
+    ``(deadline - start_time) / period``.
+deadline : `float`
+    Scheduled time of the tick, in the ``monotonic`` time
+    of the scheduler's clock (sec).
+"""
+
+
+class DeadlineScheduler:
+    """Produce ticks at absolute deadlines on a monotonic clock.
+
+    Tick ``n`` is due at ``start_time + n * period``, so the mean
+    period does not drift, regardless of how long the work done
+    for each tick takes or how late the event loop wakes up.
+
+    Parameters
+    ----------
+    period : `float`
+        Interval between ticks (sec). Must be positive.
+    policy : `OverrunPolicy` (optional)
+        What to do if a deadline has already passed
+        when the next tick is requested.
+    clock : `Clock` (optional)
+        Clock whose ``monotonic`` time is used for the deadlines.
+        If None then use a real-time `Clock`.
+
+    Raises
+    ------
+    ValueError
+        If ``period`` is not positive.
+    """
+
+    def __init__(self, period, policy=OverrunPolicy.CATCH_UP, clock=None):
+        if period <= 0:
+            raise ValueError(f"period={period} must be positive")
+        self.period = period
+        self.policy = OverrunPolicy(policy)
+        self.clock = Clock() if clock is None else clock
+        self.reset()
+
+    def reset(self, start_time=None):
+        """Restart the schedule and clear the statistics.
+
+        Parameters
+        ----------
+        start_time : `float` (optional)
+            Deadline of tick 0, in the scheduler's clock (sec).
+            If None then use the current time.
+        """
+        self.start_time = self.clock.monotonic() if start_time is None else start_time
+        self._next_index = 0
+        self._ntick = 0
+        self._noverrun = 0
+        self._nskipped = 0
+        self._lateness_sum = 0
+        self._lateness_sumsq = 0
+        self._lateness_max = 0
+        self._last_lateness = 0
+
+    def deadline(self, index):
+        """Get the deadline of the tick with a given index.
+
+        Parameters
+        ----------
+        index : `int`
+            Tick index.
+        """
+        return self.start_time + index * self.period
+
+    async def wait_next(self, min_index=None):
+        """Wait until the next tick is due.
+
+        Parameters
+        ----------
+        min_index : `int` (optional)
+            If specified, the index of the earliest tick wanted:
+            ticks before it are passed over without being returned.
+            Unlike ticks skipped by `OverrunPolicy.SKIP`, these ticks
+            are not counted in the statistics. This allows a caller
+            that has no work for some ticks to sleep through them.
+
+        Returns
+        -------
+        tick : `Tick`
+            The tick.
+        """
+        if min_index is not None and min_index > self._next_index:
+            self._next_index = min_index
+        index = self._next_index
+        deadline = self.deadline(index)
+        now = self.clock.monotonic()
+        if now < deadline:
+            await self.clock.sleep(deadline - now)
+        elif index > 0:
+            # The work for the previous tick ran past this deadline.
+            self._noverrun += 1
+            if self.policy == OverrunPolicy.SKIP:
+                latest_index = int(math.floor((now - self.start_time) / self.period))
+                if latest_index > index:
+                    self._nskipped += latest_index - index
+                    index = latest_index
+                    deadline = self.deadline(index)
+        lateness = self.clock.monotonic() - deadline
+        self._ntick += 1
+        self._lateness_sum += lateness
+        self._lateness_sumsq += lateness * lateness
+        self._lateness_max = max(self._lateness_max, lateness)
+        self._last_lateness = lateness
+        self._next_index = index + 1
+        return Tick(index=index, deadline=deadline)
+
+    def get_stats(self):
+        """Get timing statistics.
+
+        Returns
+        -------
+        stats : `dict`
+            Statistics since the last call to `reset`, with these keys:
+
+            * ``ntick``: number of ticks returned by `wait_next`.
+            * ``noverrun``: number of ticks whose deadline
+              had already passed when they were requested.
+            * ``nskipped``: number of ticks skipped
+              (only possible with `OverrunPolicy.SKIP`).
+            * ``lateness_mean``, ``lateness_std``, ``lateness_max``,
+              ``lateness_last``: statistics of the difference
+              between the time each tick was returned
+              and its deadline (sec).
+        """
+        ntick = self._ntick
+        mean = self._lateness_sum / ntick if ntick > 0 else 0
+        variance = self._lateness_sumsq / ntick - mean * mean if ntick > 0 else 0
+        return dict(
+            ntick=ntick,
+            noverrun=self._noverrun,
+            nskipped=self._nskipped,
+            lateness_mean=mean,
+            lateness_std=math.sqrt(max(variance, 0)),
+            lateness_max=self._lateness_max,
+            lateness_last=self._last_lateness,
+        )
@@ -0,0 +1,136 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = ["SharedCscTestCase"]
+
+import asyncio
+
+from lsst.ts import salobj
+from .mcs_csc import ATMCSCsc
+
+# Timeout for commands sent by SharedCscTestCase (sec).
+STD_TIMEOUT = 30
+
+
+class SharedCscTestCase:
+    """Mixin for unit tests that share one `ATMCSCsc` and remote.
+
+    Constructing a CSC and remote creates DDS participants, readers
+    and writers, which takes far longer than most tests of the CSC.
+    This mixin constructs one CSC and one `lsst.ts.salobj.Remote`
+    the first time a test of the class calls `make_shared_csc`,
+    and closes them when all tests of the class have run.
+    Between tests the CSC is returned to standby and `ATMCSCsc.reset`,
+    so each test starts with a mount in its initial state.
+
+    Combine this class with ``asynctest.TestCase``
+    and set ``use_default_loop = True``, so that all tests
+    run on the event loop used by the shared CSC::
+
+        class MyTestCase(ATMCSSimulator.SharedCscTestCase, asynctest.TestCase):
+            use_default_loop = True
+
+            async def test_something(self):
+                await self.make_shared_csc(initial_state=salobj.State.ENABLED)
+                ...
+
+    Attributes
+    ----------
+    csc_kwargs : `dict`
+        Keyword arguments for `ATMCSCsc`, other than ``initial_state``
+        and ``index``. Override in a subclass to change them.
+    index : `int`
+        SAL index of the CSC. See the ``index`` argument of `ATMCSCsc`
+        for a caveat about nonzero indices.
+    csc : `ATMCSCsc`
+        The shared CSC. Set by `make_shared_csc`.
+    remote : `lsst.ts.salobj.Remote`
+        The shared remote. Set by `make_shared_csc`.
+
+    Notes
+    -----
+    The first call to `make_shared_csc` in each test class picks
+    a random DDS domain, so test processes run in parallel
+    (e.g. with ``pytest-xdist``) cannot see each other's CSCs.
+    """
+
+    csc_kwargs = dict()
+    index = 0
+
+    async def make_shared_csc(self, initial_state=salobj.State.STANDBY):
+        """Get the shared CSC and remote, reset to the specified state.
+
+        Set ``self.csc`` and ``self.remote``, constructing them if needed.
+        Then send the CSC to standby, flush all events and telemetry
+        the remote has read, call `ATMCSCsc.reset`,
+        and send the CSC to ``initial_state``.
+        Thus the remote sees the same mount events as it would
+        for a newly constructed CSC, though it also sees
+        the ``summaryState`` events of the state transitions.
+
+        Parameters
+        ----------
+        initial_state : `lsst.ts.salobj.State` or `int` (optional)
+            The desired state: one of standby, disabled or enabled.
+        """
+        cls = type(self)
+        if "_shared_csc" not in cls.__dict__:
+            salobj.set_random_lsst_dds_domain()
+            csc = ATMCSCsc(
+                initial_state=salobj.State.STANDBY, index=cls.index, **cls.csc_kwargs
+            )
+            await csc.start_task
+            remote = salobj.Remote(
+                domain=csc.domain, name="ATMCS", index=csc.salinfo.index
+            )
+            await remote.start_task
+            cls._shared_csc = csc
+            cls._shared_remote = remote
+        self.csc = cls._shared_csc
+        self.remote = cls._shared_remote
+
+        await salobj.set_summary_state(
+            self.remote, salobj.State.STANDBY, timeout=STD_TIMEOUT
+        )
+        for name in self.remote.salinfo.event_names:
+            getattr(self.remote, f"evt_{name}").flush()
+        for name in self.remote.salinfo.telemetry_names:
+            getattr(self.remote, f"tel_{name}").flush()
+        self.csc.reset()
+        await salobj.set_summary_state(self.remote, initial_state, timeout=STD_TIMEOUT)
+
+    @classmethod
+    async def close_shared_csc(cls):
+        """Close the shared CSC and remote, if they exist.
+        """
+        if "_shared_csc" not in cls.__dict__:
+            return
+        try:
+            await cls._shared_remote.close()
+            await cls._shared_csc.close()
+        finally:
+            del cls._shared_csc
+            del cls._shared_remote
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.get_event_loop().run_until_complete(cls.close_shared_csc())
+        super().tearDownClass()
@@ -0,0 +1,633 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__all__ = [
+    "Quantity",
+    "TelemetryField",
+    "TELEMETRY_FIELDS",
+    "TELEMETRY_TOPICS",
+    "TelemetryRate",
+    "TelemetryWriter",
+    "TelemetryGroup",
+    "TelemetrySchedule",
+]
+
+import collections
+import enum
+import math
+
+import numpy as np
+
+from lsst.ts import salobj
+from .axis import Axis
+
+
+class Quantity(enum.Enum):
+    """A quantity reported in telemetry.
+
+    Position, velocity and acceleration come directly from
+    the axis paths; the other quantities are derived from those
+    using the transforms in `TelemetryWriter.transforms`.
+    """
+
+    POSITION = enum.auto()
+    VELOCITY = enum.auto()
+    ACCELERATION = enum.auto()
+    AXIS_COUNTS = enum.auto()
+    MOTOR_POSITION = enum.auto()
+    MOTOR_COUNTS = enum.auto()
+    TORQUE = enum.auto()
+
+
+TelemetryField = collections.namedtuple(
+    "TelemetryField", ["topic", "field", "axis", "quantity"]
+)
+TelemetryField.__doc__ = """An array field of a telemetry topic.
+
+Parameters
+----------
+topic : `str`
+    Telemetry topic name, without the ``tel_`` prefix.
+field : `str`
+    Name of the array field.
+axis : `Axis`
+    The axis whose motion the field reports.
+quantity : `Quantity`
+    The quantity the field reports.
+"""
+
+# All array fields of all telemetry topics, in the order the topics
+# are output. Fields that report the same quantity for the same axis
+# (e.g. redundant encoders) share a single computed value.
+TELEMETRY_FIELDS = (
+    TelemetryField("trajectory", "elevation", Axis.Elevation, Quantity.POSITION),
+    TelemetryField("trajectory", "azimuth", Axis.Azimuth, Quantity.POSITION),
+    TelemetryField("trajectory", "nasmyth1RotatorAngle", Axis.NA1, Quantity.POSITION),
+    TelemetryField("trajectory", "nasmyth2RotatorAngle", Axis.NA2, Quantity.POSITION),
+    TelemetryField(
+        "trajectory", "elevationVelocity", Axis.Elevation, Quantity.VELOCITY
+    ),
+    TelemetryField("trajectory", "azimuthVelocity", Axis.Azimuth, Quantity.VELOCITY),
+    TelemetryField(
+        "trajectory", "nasmyth1RotatorAngleVelocity", Axis.NA1, Quantity.VELOCITY
+    ),
+    TelemetryField(
+        "trajectory", "nasmyth2RotatorAngleVelocity", Axis.NA2, Quantity.VELOCITY
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders",
+        "elevationCalculatedAngle",
+        Axis.Elevation,
+        Quantity.POSITION,
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders",
+        "elevationEncoder1Raw",
+        Axis.Elevation,
+        Quantity.AXIS_COUNTS,
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders",
+        "elevationEncoder2Raw",
+        Axis.Elevation,
+        Quantity.AXIS_COUNTS,
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders",
+        "elevationEncoder3Raw",
+        Axis.Elevation,
+        Quantity.AXIS_COUNTS,
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders", "azimuthCalculatedAngle", Axis.Azimuth, Quantity.POSITION
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders", "azimuthEncoder1Raw", Axis.Azimuth, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders", "azimuthEncoder2Raw", Axis.Azimuth, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_AzEl_Encoders", "azimuthEncoder3Raw", Axis.Azimuth, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth1CalculatedAngle", Axis.NA1, Quantity.POSITION
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth1Encoder1Raw", Axis.NA1, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth1Encoder2Raw", Axis.NA1, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth1Encoder3Raw", Axis.NA1, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth2CalculatedAngle", Axis.NA2, Quantity.POSITION
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth2Encoder1Raw", Axis.NA2, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth2Encoder2Raw", Axis.NA2, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "mount_Nasmyth_Encoders", "nasmyth2Encoder3Raw", Axis.NA2, Quantity.AXIS_COUNTS
+    ),
+    TelemetryField(
+        "torqueDemand", "elevationMotorTorque", Axis.Elevation, Quantity.TORQUE
+    ),
+    TelemetryField(
+        "torqueDemand", "azimuthMotor1Torque", Axis.Azimuth, Quantity.TORQUE
+    ),
+    TelemetryField(
+        "torqueDemand", "azimuthMotor2Torque", Axis.Azimuth, Quantity.TORQUE
+    ),
+    TelemetryField("torqueDemand", "nasmyth1MotorTorque", Axis.NA1, Quantity.TORQUE),
+    TelemetryField("torqueDemand", "nasmyth2MotorTorque", Axis.NA2, Quantity.TORQUE),
+    TelemetryField(
+        "measuredTorque", "elevationMotorTorque", Axis.Elevation, Quantity.TORQUE
+    ),
+    TelemetryField(
+        "measuredTorque", "azimuthMotor1Torque", Axis.Azimuth, Quantity.TORQUE
+    ),
+    TelemetryField(
+        "measuredTorque", "azimuthMotor2Torque", Axis.Azimuth, Quantity.TORQUE
+    ),
+    TelemetryField("measuredTorque", "nasmyth1MotorTorque", Axis.NA1, Quantity.TORQUE),
+    TelemetryField("measuredTorque", "nasmyth2MotorTorque", Axis.NA2, Quantity.TORQUE),
+    TelemetryField(
+        "measuredMotorVelocity",
+        "elevationMotorVelocity",
+        Axis.Elevation,
+        Quantity.VELOCITY,
+    ),
+    TelemetryField(
+        "measuredMotorVelocity",
+        "azimuthMotor1Velocity",
+        Axis.Azimuth,
+        Quantity.VELOCITY,
+    ),
+    TelemetryField(
+        "measuredMotorVelocity",
+        "azimuthMotor2Velocity",
+        Axis.Azimuth,
+        Quantity.VELOCITY,
+    ),
+    TelemetryField(
+        "measuredMotorVelocity", "nasmyth1MotorVelocity", Axis.NA1, Quantity.VELOCITY
+    ),
+    TelemetryField(
+        "measuredMotorVelocity", "nasmyth2MotorVelocity", Axis.NA2, Quantity.VELOCITY
+    ),
+    TelemetryField(
+        "azEl_mountMotorEncoders",
+        "elevationEncoder",
+        Axis.Elevation,
+        Quantity.MOTOR_POSITION,
+    ),
+    TelemetryField(
+        "azEl_mountMotorEncoders",
+        "azimuth1Encoder",
+        Axis.Azimuth,
+        Quantity.MOTOR_POSITION,
+    ),
+    TelemetryField(
+        "azEl_mountMotorEncoders",
+        "azimuth2Encoder",
+        Axis.Azimuth,
+        Quantity.MOTOR_POSITION,
+    ),
+    TelemetryField(
+        "azEl_mountMotorEncoders",
+        "elevationEncoderRaw",
+        Axis.Elevation,
+        Quantity.MOTOR_COUNTS,
+    ),
+    TelemetryField(
+        "azEl_mountMotorEncoders",
+        "azimuth1EncoderRaw",
+        Axis.Azimuth,
+        Quantity.MOTOR_COUNTS,
+    ),
+    TelemetryField(
+        "azEl_mountMotorEncoders",
+        "azimuth2EncoderRaw",
+        Axis.Azimuth,
+        Quantity.MOTOR_COUNTS,
+    ),
+    TelemetryField(
+        "nasymth_m3_mountMotorEncoders",
+        "nasmyth1Encoder",
+        Axis.NA1,
+        Quantity.MOTOR_POSITION,
+    ),
+    TelemetryField(
+        "nasymth_m3_mountMotorEncoders",
+        "nasmyth2Encoder",
+        Axis.NA2,
+        Quantity.MOTOR_POSITION,
+    ),
+    TelemetryField(
+        "nasymth_m3_mountMotorEncoders", "m3Encoder", Axis.M3, Quantity.MOTOR_POSITION
+    ),
+    TelemetryField(
+        "nasymth_m3_mountMotorEncoders",
+        "nasmyth1EncoderRaw",
+        Axis.NA1,
+        Quantity.MOTOR_COUNTS,
+    ),
+    TelemetryField(
+        "nasymth_m3_mountMotorEncoders",
+        "nasmyth2EncoderRaw",
+        Axis.NA2,
+        Quantity.MOTOR_COUNTS,
+    ),
+    TelemetryField(
+        "nasymth_m3_mountMotorEncoders", "m3EncoderRaw", Axis.M3, Quantity.MOTOR_COUNTS,
+    ),
+)
+
+# Names of all telemetry topics, in the order they are output.
+TELEMETRY_TOPICS = tuple(dict.fromkeys(field.topic for field in TELEMETRY_FIELDS))
+
+TelemetryRate = collections.namedtuple("TelemetryRate", ["interval", "decimation"])
+TelemetryRate.__doc__ = """How often to output a telemetry topic,
+and how many of its samples to compute.
+
+Parameters
+----------
+interval : `float`
+    Interval between outputs of the topic (sec); each output reports
+    the motion during the preceding ``interval`` seconds.
+    Must be a multiple of the event update interval.
+    0 to disable the topic.
+decimation : `int`
+    Compute every ``decimation``-th sample; each computed value is
+    repeated ``decimation`` times to fill the array fields.
+    1 to compute every sample.
+"""
+
+
+def _axis_counts(values, config):
+    return (
+        values[Quantity.POSITION] * config.axis_encoder_counts_per_deg[:, np.newaxis]
+    ).astype(int)
+
+
+def _motor_position(values, config):
+    motor_pos = values[Quantity.POSITION] * config.motor_axis_ratio[:, np.newaxis]
+    return (motor_pos + 360) % 360 - 360
+
+
+def _motor_counts(values, config):
+    return (
+        values[Quantity.MOTOR_POSITION]
+        * config.motor_encoder_counts_per_deg[:, np.newaxis]
+    ).astype(int)
+
+
+def _torque(values, config):
+    return values[Quantity.ACCELERATION] * config.torque_per_accel[:, np.newaxis]
+
+
+class TelemetryWriter:
+    """Fill telemetry topics from a table of fields.
+
+    The table is compiled once, when first needed (so constructing
+    a writer that is never used is cheap): each quantity is computed
+    at most once per call to `write`, for all axes at once,
+    and each distinct (quantity, axis) pair is converted to a list once
+    and then copied into every field that reports it.
+
+    Parameters
+    ----------
+    csc : `lsst.ts.salobj.BaseCsc`
+        CSC with the telemetry topics, as ``tel_<topic>`` attributes.
+    fields : ``iterable`` of `TelemetryField` (optional)
+        The fields to fill. Defaults to `TELEMETRY_FIELDS`.
+
+    Attributes
+    ----------
+    nitems : `int`
+        Number of elements in each array field
+        (all must have the same length).
+    """
+
+    # Dict of derived Quantity: function that computes that quantity
+    # for all axes. Each function receives a dict of Quantity: value
+    # (already including position, velocity and acceleration)
+    # and the configuration. The functions are called in the order
+    # listed, so each may use the quantities listed before it.
+    transforms = {
+        Quantity.AXIS_COUNTS: _axis_counts,
+        Quantity.MOTOR_POSITION: _motor_position,
+        Quantity.MOTOR_COUNTS: _motor_counts,
+        Quantity.TORQUE: _torque,
+    }
+
+    def __init__(self, csc, fields=TELEMETRY_FIELDS):
+        self._csc = csc
+        self._fields = list(fields)
+        first_field = self._fields[0]
+        self.nitems = len(
+            getattr(getattr(csc, f"tel_{first_field.topic}").data, first_field.field)
+        )
+        # The compiled table, set by _compile:
+        # a list of (topic, [(field name, source index), ...]).
+        self._writers = None
+
+    @property
+    def topics(self):
+        """The telemetry topics that are written,
+        in order of first appearance in ``fields``.
+        """
+        if self._writers is None:
+            self._compile()
+        return self._topics
+
+    def _compile(self):
+        """Compile the table of fields."""
+        self._topics = []
+        # List of (quantity, axis) sources, in order of first use.
+        self._sources = []
+        source_indices = dict()
+        writers = []
+        writer_dict = dict()
+        for field in self._fields:
+            topic = getattr(self._csc, f"tel_{field.topic}")
+            if field.topic not in writer_dict:
+                self._topics.append(topic)
+                writer_dict[field.topic] = []
+                writers.append((topic, writer_dict[field.topic]))
+            source = (field.quantity, field.axis)
+            if source not in source_indices:
+                source_indices[source] = len(self._sources)
+                self._sources.append(source)
+            writer_dict[field.topic].append((field.field, source_indices[source]))
+        used_quantities = set(quantity for quantity, axis in self._sources)
+        # Motor counts are computed from motor position.
+        if Quantity.MOTOR_COUNTS in used_quantities:
+            used_quantities.add(Quantity.MOTOR_POSITION)
+        # Derived quantities to compute, in order.
+        self._derived_quantities = [
+            quantity for quantity in self.transforms if quantity in used_quantities
+        ]
+        self._writers = writers
+
+    def write(self, position, velocity, acceleration, config, decimation=1):
+        """Fill the array fields of all topics.
+
+        Parameters
+        ----------
+        position : `numpy.ndarray`
+            Position of each axis at each sample time;
+            shape (number of axes, number of samples).
+            If ``decimation`` > 1 then the samples are for every
+            ``decimation``-th element of the array fields.
+        velocity : `numpy.ndarray`
+            Velocity, with the same shape as ``position``.
+        acceleration : `numpy.ndarray`
+            Acceleration, with the same shape as ``position``.
+        config : `any`
+            Configuration; an object with these per-axis `numpy.ndarray`
+            attributes: ``axis_encoder_counts_per_deg``,
+            ``motor_encoder_counts_per_deg``, ``motor_axis_ratio``
+            and ``torque_per_accel``.
+        decimation : `int` (optional)
+            Number of array elements filled by each sample.
+
+        Notes
+        -----
+        This fills the data of the topics but does not output them.
+        """
+        if self._writers is None:
+            self._compile()
+        values = {
+            Quantity.POSITION: position,
+            Quantity.VELOCITY: velocity,
+            Quantity.ACCELERATION: acceleration,
+        }
+        for quantity in self._derived_quantities:
+            values[quantity] = self.transforms[quantity](values, config)
+        if decimation > 1:
+            rows = [
+                np.repeat(values[quantity][axis], decimation)[: self.nitems].tolist()
+                for quantity, axis in self._sources
+            ]
+        else:
+            rows = [values[quantity][axis].tolist() for quantity, axis in self._sources]
+        for topic, field_sources in self._writers:
+            data = topic.data
+            for field_name, source_index in field_sources:
+                getattr(data, field_name)[:] = rows[source_index]
+
+
+TelemetryGroup = collections.namedtuple("TelemetryGroup", ["rate", "nticks", "writer"])
+TelemetryGroup.__doc__ = """Telemetry topics that are output together.
+
+Parameters
+----------
+rate : `TelemetryRate`
+    How often the topics are output, and their decimation.
+nticks : `int`
+    Interval between outputs, as a number of event update ticks.
+writer : `TelemetryWriter`
+    Writer for the topics.
+"""
+
+
+class TelemetrySchedule:
+    """Which telemetry topics to output at which event update tick,
+    for per-topic rates and decimation.
+
+    Parameters
+    ----------
+    csc : `lsst.ts.salobj.BaseCsc`
+        CSC with the telemetry topics, as ``tel_<topic>`` attributes.
+    tick_interval : `float`
+        Interval between event update ticks (sec).
+    rates : `dict` [`str`, `TelemetryRate`] (optional)
+        Rate for some or all topics: a dict of topic name (without the
+        ``tel_`` prefix): rate. Each rate may be a `TelemetryRate`,
+        a sequence of (interval, decimation) or a dict with those keys.
+        Topics that are not listed use ``default_rate``.
+    default_rate : `TelemetryRate` (optional)
+        Rate for topics not in ``rates``.
+
+    Raises
+    ------
+    lsst.ts.salobj.ExpectedError
+        If a topic name is not one of `TELEMETRY_TOPICS`, an interval
+        is negative or not a multiple of ``tick_interval``,
+        or a decimation is not a positive integer.
+
+    Attributes
+    ----------
+    rates : `dict` [`str`, `TelemetryRate`]
+        The rate of every topic.
+    groups : `list` [`TelemetryGroup`]
+        One group for each distinct rate of the enabled topics.
+        Disabled topics are in no group, so they are never computed.
+    finest_group : `TelemetryGroup` or `None`
+        The group with the shortest interval between computed samples
+        (the first such group, if there is a tie),
+        or None if all topics are disabled.
+    """
+
+    def __init__(
+        self, csc, tick_interval, rates=None, default_rate=TelemetryRate(1, 1)
+    ):
+        rates = dict() if rates is None else rates
+        unknown_topics = sorted(set(rates) - set(TELEMETRY_TOPICS))
+        if unknown_topics:
+            raise salobj.ExpectedError(f"Unknown telemetry topics {unknown_topics}")
+        self.tick_interval = tick_interval
+        self.rates = dict()
+        # Dict of TelemetryRate: list of topic names
+        topics_for_rate = dict()
+        for topic in TELEMETRY_TOPICS:
+            rate = self._cast_rate(topic, rates.get(topic, default_rate))
+            self.rates[topic] = rate
+            if rate.interval > 0:
+                topics_for_rate.setdefault(rate, []).append(topic)
+        self.groups = []
+        for rate, topics in topics_for_rate.items():
+            writer = TelemetryWriter(
+                csc,
+                fields=[field for field in TELEMETRY_FIELDS if field.topic in topics],
+            )
+            if rate.decimation > writer.nitems:
+                raise salobj.ExpectedError(
+                    f"decimation={rate.decimation} for {topics} "
+                    f"must not exceed the array length {writer.nitems}"
+                )
+            self.groups.append(
+                TelemetryGroup(
+                    rate=rate,
+                    nticks=int(round(rate.interval / tick_interval)),
+                    writer=writer,
+                )
+            )
+        self.finest_group = min(
+            self.groups,
+            key=lambda group: group.rate.interval
+            * group.rate.decimation
+            / group.writer.nitems,
+            default=None,
+        )
+
+    def _cast_rate(self, topic, rate):
+        """Convert a rate to a `TelemetryRate` and check it."""
+        try:
+            if isinstance(rate, dict):
+                rate = TelemetryRate(**rate)
+            else:
+                rate = TelemetryRate(*rate)
+            rate = TelemetryRate(
+                interval=float(rate.interval), decimation=rate.decimation
+            )
+        except (TypeError, ValueError) as e:
+            raise salobj.ExpectedError(f"Invalid rate {rate} for {topic}: {e}")
+        if not math.isfinite(rate.interval) or rate.interval < 0:
+            raise salobj.ExpectedError(
+                f"interval={rate.interval} for {topic} must be finite "
+                "and not negative"
+            )
+        nticks = rate.interval / self.tick_interval
+        if rate.interval > 0 and round(nticks) < 1:
+            raise salobj.ExpectedError(
+                f"interval={rate.interval} for {topic} must be 0 "
+                f"or at least {self.tick_interval}"
+            )
+        if not math.isclose(nticks, round(nticks), abs_tol=1e-7):
+            raise salobj.ExpectedError(
+                f"interval={rate.interval} for {topic} must be a multiple "
+                f"of {self.tick_interval}"
+            )
+        if not isinstance(rate.decimation, int) or rate.decimation < 1:
+            raise salobj.ExpectedError(
+                f"decimation={rate.decimation} for {topic} must be a positive integer"
+            )
+        return rate
+
+    def due(self, tick_index):
+        """Get the groups to output at a given event update tick.
+
+        Parameters
+        ----------
+        tick_index : `int`
+            Tick index; 0 at the start of the event loop.
+            Nothing is output at tick 0, since no time has elapsed.
+
+        Returns
+        -------
+        groups : `list` [`TelemetryGroup`]
+            The groups to output.
+        """
+        if tick_index <= 0:
+            return []
+        return [group for group in self.groups if tick_index % group.nticks == 0]
+
+    def next_due(self, tick_index):
+        """Get the index of the next tick at which any group is due.
+
+        Parameters
+        ----------
+        tick_index : `int`
+            Index of the earliest tick to consider.
+
+        Returns
+        -------
+        next_index : `int` or `None`
+            The smallest index ``>= tick_index`` for which `due`
+            returns at least one group, or None if all topics
+            are disabled.
+        """
+        tick_index = max(tick_index, 1)
+        return min(
+            (-(-tick_index // group.nticks) * group.nticks for group in self.groups),
+            default=None,
+        )
+
+    def sample_times(self, group, tai):
+        """Get the times at which to compute the samples of a group.
+
+        Parameters
+        ----------
+        group : `TelemetryGroup`
+            The group.
+        tai : `float`
+            End of the telemetry window (TAI unix seconds).
+            The window covers ``[tai - group.rate.interval, tai)``.
+
+        Returns
+        -------
+        times : `numpy.ndarray`
+            Every ``group.rate.decimation``-th sample time
+            (TAI unix seconds).
+        """
+        return np.linspace(
+            start=tai - group.rate.interval,
+            stop=tai,
+            num=group.writer.nitems,
+            endpoint=False,
+        )[:: group.rate.decimation]
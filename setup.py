@@ -26,7 +26,14 @@ setuptools.setup(
     package_dir={"": "python"},
     packages=setuptools.find_namespace_packages(where="python"),
     package_data={"": ["*.rst", "*.yaml"]},
-    scripts=["bin/run_atmcs_simulator.py"],
+    scripts=[
+        "bin/run_atmcs_simulator.py",
+        "bin/run_atmcs_benchmarks.py",
+        "bin/run_atmcs_host.py",
+        "bin/run_atmcs_fleet.py",
+        "bin/run_atmcs_replay.py",
+        "bin/run_atmcs_load.py",
+    ],
     tests_require=tests_require,
     extras_require={"dev": dev_requires},
     license="GPL",
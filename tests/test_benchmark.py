@@ -0,0 +1,121 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import json
+import pathlib
+import tempfile
+import unittest
+
+from lsst.ts import ATMCSSimulator
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def make_results(self, medians):
+        """Make benchmark results with the specified median times.
+
+        Parameters
+        ----------
+        medians : `dict` [`str`, `float`]
+            Dict of benchmark name: median time.
+        """
+        return dict(
+            format_version=ATMCSSimulator.benchmark.RESULTS_FORMAT_VERSION,
+            metadata=dict(host="test"),
+            benchmarks={
+                name: ATMCSSimulator.summarize([median])
+                for name, median in medians.items()
+            },
+        )
+
+    def test_summarize(self):
+        summary = ATMCSSimulator.summarize([3, 1, 2])
+        self.assertEqual(summary["nsamples"], 3)
+        self.assertEqual(summary["median"], 2)
+        self.assertEqual(summary["mean"], 2)
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 3)
+        self.assertAlmostEqual(summary["stdev"], 1)
+        self.assertEqual(ATMCSSimulator.summarize([5])["stdev"], 0)
+
+    def test_time_function(self):
+        ncalls = 0
+
+        def func():
+            nonlocal ncalls
+            ncalls += 1
+
+        min_time = 0.01
+        repeat = 3
+        summary = ATMCSSimulator.time_function(func, min_time=min_time, repeat=repeat)
+        self.assertEqual(summary["nsamples"], repeat)
+        self.assertGreater(summary["number"], 1)
+        self.assertGreaterEqual(ncalls, summary["number"] * (repeat + 1))
+        self.assertGreater(summary["min"], 0)
+        self.assertLessEqual(summary["min"], summary["median"])
+        self.assertLessEqual(summary["median"], summary["max"])
+
+    def test_compare_results(self):
+        baseline = self.make_results(dict(a=1.0, b=2.0, c=3.0))
+        results = self.make_results(dict(a=1.1, b=3.0, d=1.0))
+        comparisons = ATMCSSimulator.compare_results(results, baseline, tolerance=0.2)
+        # Benchmarks that are not in both are ignored.
+        self.assertEqual([comparison.name for comparison in comparisons], ["a", "b"])
+        self.assertAlmostEqual(comparisons[0].ratio, 1.1)
+        self.assertFalse(comparisons[0].regressed)
+        self.assertEqual(comparisons[1].baseline, 2.0)
+        self.assertEqual(comparisons[1].current, 3.0)
+        self.assertAlmostEqual(comparisons[1].ratio, 1.5)
+        self.assertTrue(comparisons[1].regressed)
+
+        comparisons = ATMCSSimulator.compare_results(results, baseline, tolerance=0.6)
+        self.assertFalse(any(comparison.regressed for comparison in comparisons))
+
+    def test_measure_import_times(self):
+        results = ATMCSSimulator.measure_import_times(nruns=1)
+        self.assertEqual(
+            list(results),
+            [
+                "startup.import.numpy",
+                "startup.import.lsst.ts.salobj",
+                "startup.import.lsst.ts.idl.enums.ATMCS",
+                "startup.import.lsst.ts.simactuators",
+                "startup.import.lsst.ts.ATMCSSimulator",
+            ],
+        )
+        for summary in results.values():
+            self.assertEqual(summary["nsamples"], 1)
+            self.assertGreater(summary["median"], 0)
+
+    def test_save_load(self):
+        results = self.make_results(dict(a=1.0, b=2.0))
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = pathlib.Path(tempdir) / "results.json"
+            ATMCSSimulator.save_results(results, path)
+            self.assertEqual(ATMCSSimulator.load_results(path), results)
+
+            results["format_version"] += 1
+            with open(path, "w") as f:
+                json.dump(results, f)
+            with self.assertRaises(ValueError):
+                ATMCSSimulator.load_results(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import asyncio
+import time
+import unittest
+
+import asynctest
+
+from lsst.ts import ATMCSSimulator
+
+START_TAI = 1600000000  # arbitrary start time for virtual clocks
+
+
+class ClockTestCase(asynctest.TestCase):
+    async def test_scaled_clock(self):
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.ScaledClock(scale=0)
+
+        scale = 20
+        clock = ATMCSSimulator.ScaledClock(scale=scale, start_tai=START_TAI)
+        self.assertAlmostEqual(clock.tai(), START_TAI, delta=0.1)
+        real_t0 = time.monotonic()
+        tai0 = clock.tai()
+        await clock.sleep(2)
+        real_dt = time.monotonic() - real_t0
+        self.assertGreaterEqual(clock.tai() - tai0, 2 - 0.01)
+        self.assertLess(real_dt, 1)
+        self.assertAlmostEqual(real_dt * scale, clock.tai() - tai0, delta=0.1)
+
+    async def test_virtual_clock_sleep(self):
+        clock = ATMCSSimulator.VirtualClock(start_tai=START_TAI)
+        self.addCleanup(clock.close)
+        self.assertEqual(clock.tai(), START_TAI)
+        self.assertEqual(clock.monotonic(), START_TAI)
+
+        real_t0 = time.monotonic()
+        await clock.sleep(3600)
+        self.assertLess(time.monotonic() - real_t0, 1)
+        self.assertEqual(clock.tai(), START_TAI + 3600)
+
+    async def test_virtual_clock_ordering(self):
+        clock = ATMCSSimulator.VirtualClock(start_tai=START_TAI)
+        self.addCleanup(clock.close)
+        wake_times = []
+
+        async def sleeper(duration):
+            await clock.sleep(duration)
+            wake_times.append((duration, clock.tai() - START_TAI))
+
+        await asyncio.gather(sleeper(5), sleeper(1), sleeper(3))
+        self.assertEqual(wake_times, [(1, 1), (3, 3), (5, 5)])
+
+    async def test_virtual_clock_call_later(self):
+        clock = ATMCSSimulator.VirtualClock(start_tai=START_TAI)
+        self.addCleanup(clock.close)
+        calls = []
+        clock.call_later(2, calls.append, "a")
+        cancelled_handle = clock.call_later(1, calls.append, "cancelled")
+        clock.call_later(4, calls.append, "b")
+        cancelled_handle.cancel()
+        await clock.sleep(10)
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(clock.tai(), START_TAI + 10)
+
+    async def test_virtual_clock_close(self):
+        clock = ATMCSSimulator.VirtualClock(start_tai=START_TAI)
+        calls = []
+        clock.call_later(1, calls.append, "a")
+        advance_task = clock._advance_task
+        self.assertFalse(advance_task.done())
+        clock.close()
+        await asyncio.sleep(0)
+        self.assertTrue(advance_task.cancelled())
+        self.assertEqual(calls, [])
+        self.assertEqual(clock.tai(), START_TAI)
+
+
+if __name__ == "__main__":
+    unittest.main()
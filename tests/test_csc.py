@@ -19,9 +19,14 @@
 # You should have received a copy of the GNU General Public License
 
 import asyncio
+import json
+import pathlib
+import tempfile
 import unittest
+import unittest.mock
 
 import asynctest
+import numpy as np
 
 from lsst.ts import salobj
 from lsst.ts import simactuators
@@ -71,8 +76,8 @@ class CscTestCase(salobj.BaseCscTestCase, asynctest.TestCase):
             self.remote.evt_m3InPosition,
         )
 
-    def basic_make_csc(self, initial_state, config_dir, simulation_mode):
-        return ATMCSSimulator.ATMCSCsc(initial_state=initial_state)
+    def basic_make_csc(self, initial_state, config_dir, simulation_mode, **kwargs):
+        return ATMCSSimulator.ATMCSCsc(initial_state=initial_state, **kwargs)
 
     async def fault_to_enabled(self):
         """Check that the CSC is in FAULT state and enable it.
@@ -313,6 +318,29 @@ class CscTestCase(salobj.BaseCscTestCase, asynctest.TestCase):
                     continue
                 await self.assert_next_sample(event, enable=False)
 
+    async def test_enable_events_without_telemetry(self):
+        """Enabling the CSC should promptly output the drive status events,
+        even if all telemetry is disabled.
+        """
+        async with self.make_csc(
+            initial_state=salobj.State.DISABLED,
+            telemetry_rates={
+                topic: (0, 1) for topic in ATMCSSimulator.TELEMETRY_TOPICS
+            },
+        ):
+            await self.assert_next_summary_state(salobj.State.DISABLED)
+            for event in self.drive_status_events:
+                await self.assert_next_sample(event, enable=False)
+
+            await self.remote.cmd_enable.start(timeout=STD_TIMEOUT)
+            for event in self.drive_status_events:
+                if event in (
+                    self.remote.evt_nasmyth2DriveStatus,
+                    self.remote.evt_m3DriveStatus,
+                ):
+                    continue
+                await self.assert_next_sample(event, enable=True, timeout=0.5)
+
     async def test_standard_state_transitions(self):
         async with self.make_csc(initial_state=salobj.State.STANDBY):
             await self.check_standard_state_transitions(
@@ -425,6 +453,120 @@ class CscTestCase(salobj.BaseCscTestCase, asynctest.TestCase):
             data = self.remote.evt_nasmyth1DriveStatus.get()
             self.assertFalse(data.enable)
 
+    async def test_metrics(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            metrics_path = pathlib.Path(tempdir) / "metrics.jsonl"
+            async with self.make_csc(
+                initial_state=salobj.State.ENABLED,
+                metrics_interval=0.5,
+                metrics_path=metrics_path,
+            ):
+                await self.remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+                await asyncio.sleep(1.2)
+                snapshot = self.csc.metrics.snapshot()
+                histograms = snapshot["histograms"]
+                for name in (
+                    "update_events",
+                    "update_telemetry",
+                    "loop_iteration",
+                    "do_startTracking",
+                ):
+                    with self.subTest(name=name):
+                        self.assertGreater(histograms[name]["count"], 0)
+                        self.assertGreater(histograms[name]["max"], 0)
+                self.assertEqual(histograms["do_trackTarget"]["count"], 0)
+                self.assertGreater(snapshot["counters"]["events_output"], 0)
+                self.assertEqual(snapshot["counters"]["update_events_failed"], 0)
+
+                # Failures are logged and counted.
+                with unittest.mock.patch.object(
+                    self.csc.model, "step", side_effect=RuntimeError("test")
+                ):
+                    with self.assertLogs(self.csc.log, level="ERROR"):
+                        with self.assertRaises(RuntimeError):
+                            self.csc.update_events()
+                counters = self.csc.metrics.snapshot()["counters"]
+                self.assertEqual(counters["update_events_failed"], 1)
+                await self.remote.cmd_stopTracking.start(timeout=STD_TIMEOUT)
+
+            with open(metrics_path, "r") as f:
+                dumps = [json.loads(line) for line in f]
+        self.assertGreaterEqual(len(dumps), 2)
+        for dump in dumps:
+            self.assertIn("tai", dump)
+            self.assertIn("update_events", dump["histograms"])
+            self.assertGreater(dump["loop_scheduler"]["ntick"], 0)
+
+    async def test_telemetry_rates(self):
+        TelemetryRate = ATMCSSimulator.TelemetryRate
+        async with self.make_csc(
+            initial_state=salobj.State.ENABLED,
+            telemetry_rates=dict(
+                trajectory=TelemetryRate(interval=0, decimation=1),
+                torqueDemand=TelemetryRate(interval=0.5, decimation=2),
+            ),
+        ):
+            await self.assert_next_summary_state(salobj.State.ENABLED)
+            with self.assertRaises(salobj.ExpectedError):
+                self.csc.configure(telemetry_rates=dict(trajectory=(0.25, 1)))
+            self.assertEqual(
+                self.csc.telemetry_schedule.rates["trajectory"].interval, 0
+            )
+
+            # torqueDemand is decimated: each sample fills two elements,
+            # and is output every 0.5 seconds.
+            data1 = await self.remote.tel_torqueDemand.next(
+                flush=False, timeout=STD_TIMEOUT
+            )
+            self.assertEqual(
+                data1.elevationMotorTorque[0], data1.elevationMotorTorque[1]
+            )
+            data2 = await self.remote.tel_torqueDemand.next(
+                flush=False, timeout=STD_TIMEOUT
+            )
+            self.assertAlmostEqual(data2.cRIO_timestamp - data1.cRIO_timestamp, 0.5)
+            # Other topics are output once a second.
+            data1 = await self.remote.tel_measuredTorque.next(
+                flush=False, timeout=STD_TIMEOUT
+            )
+            data2 = await self.remote.tel_measuredTorque.next(
+                flush=False, timeout=STD_TIMEOUT
+            )
+            self.assertAlmostEqual(data2.cRIO_timestamp - data1.cRIO_timestamp, 1)
+            # trajectory is disabled.
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.remote.tel_trajectory.next(flush=False, timeout=1.5)
+
+            # Reconfigure: only the trajectory topic is enabled.
+            self.csc.configure(
+                telemetry_rates={
+                    topic: (1 if topic == "trajectory" else 0, 1)
+                    for topic in ATMCSSimulator.TELEMETRY_TOPICS
+                }
+            )
+            self.remote.tel_torqueDemand.flush()
+            await self.remote.tel_trajectory.next(flush=False, timeout=STD_TIMEOUT)
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.remote.tel_torqueDemand.next(flush=False, timeout=1.5)
+
+    async def test_startup_times(self):
+        async with self.make_csc(initial_state=salobj.State.STANDBY):
+            await self.assert_next_summary_state(salobj.State.STANDBY)
+            startup_times = self.csc.startup_times
+            self.assertEqual(
+                list(startup_times),
+                ["salobj", "model", "telemetry", "event_groups", "construct", "start"],
+            )
+            self.assertGreater(
+                startup_times["construct"],
+                sum(startup_times[phase] for phase in ("salobj", "model")),
+            )
+            # Initial events are output when the CSC is first enabled.
+            await salobj.set_summary_state(self.remote, salobj.State.ENABLED)
+            await self.remote.evt_atMountState.next(flush=False, timeout=STD_TIMEOUT)
+            self.assertIn("initial_events", startup_times)
+            self.assertGreater(startup_times["ready"], startup_times["construct"])
+
     async def test_bin_script(self):
         await self.check_bin_script(
             name="ATMCS", index=None, exe_name="run_atmcs_simulator.py"
@@ -509,6 +651,141 @@ class CscTestCase(salobj.BaseCscTestCase, asynctest.TestCase):
 
             await self.remote.cmd_stopTracking.start(timeout=1)
 
+    async def test_load_trajectory(self):
+        async with self.make_csc(initial_state=salobj.State.ENABLED):
+            self.csc.configure(
+                max_velocity=(100,) * 5, max_acceleration=(200,) * 5,
+            )
+            position = [20, 10, 5, 0]
+            target_tai = self.csc.clock.tai() + np.arange(1, 100) * 0.1
+            ntargets = len(target_tai)
+
+            # Tracking must be enabled.
+            with self.assertRaises(salobj.ExpectedError):
+                self.csc.load_trajectory(
+                    target_tai=target_tai,
+                    position=[position] * ntargets,
+                    velocity=[[0] * 4] * ntargets,
+                )
+
+            await self.remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+
+            # An invalid block is rejected without going to fault.
+            with self.assertRaises(salobj.ExpectedError):
+                self.csc.load_trajectory(
+                    target_tai=target_tai,
+                    position=[[-1, 10, 5, 0]] * ntargets,
+                    velocity=[[0] * 4] * ntargets,
+                )
+            self.assertEqual(self.csc.summary_state, salobj.State.ENABLED)
+
+            self.csc.load_trajectory(
+                target_tai=target_tai,
+                position=[position] * ntargets,
+                velocity=[[0] * 4] * ntargets,
+                track_id=5,
+            )
+            await self.assert_next_sample(
+                self.remote.evt_allAxesInPosition, inPosition=False
+            )
+            await self.assert_next_sample(
+                self.remote.evt_allAxesInPosition, inPosition=True
+            )
+            self.assertGreater(self.csc.model.trajectory_remaining, 0)
+            data = await self.remote.tel_mount_AzEl_Encoders.next(
+                flush=True, timeout=STD_TIMEOUT
+            )
+            self.assertEqual(data.trackId, 5)
+
+            await self.remote.cmd_stopTracking.start(timeout=STD_TIMEOUT)
+            self.assertEqual(self.csc.model.trajectory_remaining, 0)
+
+    async def test_predicted_transitions(self):
+        # Use a virtual clock, so the timing is exact.
+        clock = ATMCSSimulator.VirtualClock()
+        self.addCleanup(clock.close)
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED, clock=clock
+        ) as csc:
+            # Record the time at which each m3State event is output.
+            m3_states = []
+            put = csc.evt_m3State.put
+
+            def put_and_record(*args, **kwargs):
+                m3_states.append((clock.tai(), csc.evt_m3State.data.state))
+                put(*args, **kwargs)
+
+            csc.evt_m3State.put = put_and_record
+
+            await clock.sleep(0.05)
+            data = csc.cmd_setInstrumentPort.DataType()
+            data.port = M3ExitPort.PORT3
+            csc.do_setInstrumentPort(data)
+            self.assertEqual(m3_states[-1][1], M3State.INMOTION)
+            arrival_tai = csc.actuators[ATMCSSimulator.Axis.M3].path[-1].tai
+            ntick0 = csc.loop_scheduler.get_stats()["ntick"]
+            duration = arrival_tai - clock.tai() + 10
+            await clock.sleep(duration)
+
+            # M3 arrival was reported when it happened,
+            # rather than at the next 10 Hz poll.
+            put_tai, state = m3_states[-1]
+            self.assertEqual(state, M3State.PORT3)
+            self.assertGreater(put_tai, arrival_tai)
+            self.assertLess(put_tai, arrival_tai + 0.001)
+
+            # The loop only woke up to output telemetry (once per second).
+            ntick = csc.loop_scheduler.get_stats()["ntick"] - ntick0
+            self.assertLessEqual(ntick, duration + 1)
+
+    async def test_halt_completion(self):
+        # Use a virtual clock, so the timing is exact.
+        clock = ATMCSSimulator.VirtualClock()
+        self.addCleanup(clock.close)
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED, clock=clock
+        ) as csc:
+            # Record the time at which each atMountState event is output.
+            mount_states = []
+            put = csc.evt_atMountState.put
+
+            def put_and_record(*args, **kwargs):
+                mount_states.append((clock.tai(), csc.evt_atMountState.data.state))
+                put(*args, **kwargs)
+
+            csc.evt_atMountState.put = put_and_record
+
+            for halt_name in ("stopTracking", "disable"):
+                await clock.sleep(0.05)
+                csc.do_startTracking(None)
+                data = csc.cmd_trackTarget.DataType()
+                data.elevation = 60
+                data.azimuth = 90
+                data.taiTime = clock.tai()
+                csc.do_trackTarget(data)
+                await clock.sleep(1)
+
+                if halt_name == "stopTracking":
+                    await csc.do_stopTracking(None)
+                    end_tai = csc.model.stop_tracking_end_tai
+                else:
+                    await csc.do_disable(None)
+                    end_tai = csc.model.disable_drives_end_tai
+                self.assertEqual(mount_states[-1][1], AtMountState.STOPPING)
+                self.assertGreater(end_tai, clock.tai())
+                await clock.sleep(end_tai - clock.tai() + 1)
+
+                # The halt was reported done as soon as the axes stopped.
+                put_tai, state = mount_states[-1]
+                self.assertEqual(state, AtMountState.TRACKINGDISABLED)
+                self.assertGreaterEqual(put_tai, end_tai)
+                self.assertLess(put_tai, end_tai + 0.001)
+                for actuator in csc.actuators:
+                    self.assertEqual(actuator.kind(clock.tai()), actuator.Kind.Stopped)
+
+            # disable_all_drives disabled all drives at the end of the halt.
+            np.testing.assert_array_equal(csc.model.axis_enabled, [False] * 5)
+
     async def test_late_track_target(self):
         # Use a short tracking interval so the test runs quickly.
         max_tracking_interval = 0.2
@@ -564,6 +841,72 @@ class CscTestCase(salobj.BaseCscTestCase, asynctest.TestCase):
                 self.remote.evt_atMountState, state=AtMountState.TRACKINGDISABLED
             )
 
+    async def test_track_target_watchdog(self):
+        """Frequent trackTarget commands keep tracking enabled
+        for longer than max_tracking_interval, without piling up timers.
+        """
+        max_tracking_interval = 0.5
+        async with self.make_csc(initial_state=salobj.State.ENABLED):
+            await self.assert_next_summary_state(salobj.State.ENABLED)
+            self.csc.configure(max_tracking_interval=max_tracking_interval)
+            await self.assert_next_sample(
+                self.remote.evt_m3State, state=M3State.NASMYTH1
+            )
+
+            await self.remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+            self.assertIsNotNone(self.csc._tracking_timer)
+            ncommands = 0
+            start_tai = salobj.current_tai()
+            while salobj.current_tai() - start_tai < max_tracking_interval * 3:
+                await self.remote.cmd_trackTarget.set_start(
+                    elevation=10,
+                    taiTime=salobj.current_tai(),
+                    trackId=ncommands,
+                    timeout=1,
+                )
+                ncommands += 1
+                await asyncio.sleep(0.05)
+            self.assertEqual(self.csc.summary_state, salobj.State.ENABLED)
+            # trackTarget moves the deadline forward, but the timer
+            # is only replaced when it fires (at most once per interval).
+            self.assertGreater(ncommands, 10)
+            self.assertIsNotNone(self.csc._tracking_timer)
+
+            # Stop sending trackTarget; the CSC should go to fault.
+            last_command_tai = salobj.current_tai()
+            await self.assert_next_summary_state(
+                salobj.State.FAULT, timeout=max_tracking_interval + 1
+            )
+            self.assertGreaterEqual(
+                salobj.current_tai() - last_command_tai, max_tracking_interval - 0.05
+            )
+            data = await self.remote.evt_errorCode.next(flush=False, timeout=1)
+            self.assertEqual(data.errorCode, 2)
+            self.assertIsNone(self.csc._tracking_timer)
+
+    async def test_reconfigure_tracking_interval(self):
+        """Reducing max_tracking_interval while tracking
+        moves the watchdog deadline earlier.
+        """
+        # Use a virtual clock, so the timing is exact.
+        clock = ATMCSSimulator.VirtualClock()
+        self.addCleanup(clock.close)
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED, clock=clock
+        ) as csc:
+            csc.configure(max_tracking_interval=10)
+            await clock.sleep(0.05)
+            start_tai = clock.tai()
+            csc.do_startTracking(None)
+            await clock.sleep(1)
+            csc.reconfigure(max_tracking_interval=2)
+            self.assertAlmostEqual(csc.model.tracking_deadline, start_tai + 2)
+
+            await clock.sleep(start_tai + 1.9 - clock.tai())
+            self.assertEqual(csc.summary_state, salobj.State.ENABLED)
+            await clock.sleep(0.2)
+            self.assertEqual(csc.summary_state, salobj.State.FAULT)
+
     async def test_stop_tracking_while_slewing(self):
         """Call stopTracking while tracking, before a slew is done.
         """
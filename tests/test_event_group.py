@@ -0,0 +1,158 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import unittest
+
+from lsst.ts import ATMCSSimulator
+
+
+class MockEvent:
+    """Record calls to set_put."""
+
+    def __init__(self):
+        self.calls = []
+
+    def set_put(self, force_output=False, **kwargs):
+        self.calls.append(kwargs)
+        self.forced = force_output
+
+
+class MockTopic:
+    """Record calls to put, with the data at the time."""
+
+    def __init__(self):
+        self.data = dict()
+        self.puts = []
+
+    def set(self, **kwargs):
+        did_change = any(self.data.get(key) != value for key, value in kwargs.items())
+        self.data.update(kwargs)
+        return did_change
+
+    def put(self):
+        self.puts.append(dict(self.data))
+
+
+class EventGroupTestCase(unittest.TestCase):
+    def test_constructor_errors(self):
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.EventGroup(
+                topics=[MockEvent(), MockEvent()], field_name="active", indices=[0]
+            )
+
+    def test_update(self):
+        topics = [MockEvent() for i in range(3)]
+        group = ATMCSSimulator.EventGroup(topics=topics, field_name="active")
+
+        # The first update outputs every event.
+        nput = group.update([True, False, True])
+        self.assertEqual(nput, 3)
+        self.assertEqual(
+            [topic.calls for topic in topics],
+            [[dict(active=True)], [dict(active=False)], [dict(active=True)]],
+        )
+
+        # An update with no changes outputs nothing.
+        nput = group.update([True, False, True])
+        self.assertEqual(nput, 0)
+        self.assertEqual([len(topic.calls) for topic in topics], [1, 1, 1])
+
+        # Only changed values are output.
+        nput = group.update([True, True, True])
+        self.assertEqual(nput, 1)
+        self.assertEqual(topics[1].calls[-1], dict(active=True))
+        self.assertEqual([len(topic.calls) for topic in topics], [1, 2, 1])
+
+        # After invalidate every event is output again.
+        group.invalidate()
+        nput = group.update([True, True, True])
+        self.assertEqual(nput, 3)
+        self.assertFalse(any(topic.forced for topic in topics))
+
+        # invalidate(force_output=True) forces output of the next update.
+        group.invalidate(force_output=True)
+        nput = group.update([True, True, True])
+        self.assertEqual(nput, 3)
+        self.assertTrue(all(topic.forced for topic in topics))
+        group.update([False, True, True])
+        self.assertFalse(topics[0].forced)
+
+    def test_batch(self):
+        topics = [MockTopic() for i in range(3)]
+        batch = ATMCSSimulator.EventBatch()
+
+        # Nothing is written until flush.
+        self.assertTrue(batch.add(topics[0], active=True))
+        self.assertTrue(batch.add(topics[1], active=True))
+        self.assertEqual([len(topic.puts) for topic in topics], [0, 0, 0])
+        self.assertEqual(batch.topics, topics[0:2])
+
+        # An event staged twice is written once, with its latest data.
+        self.assertTrue(batch.add(topics[0], active=False))
+        # Unchanged data is not staged unless forced.
+        topics[2].set(active=True)
+        self.assertFalse(batch.add(topics[2], active=True))
+        self.assertEqual(batch.flush(), 2)
+        self.assertEqual(topics[0].puts, [dict(active=False)])
+        self.assertEqual(topics[1].puts, [dict(active=True)])
+        self.assertEqual(topics[2].puts, [])
+        self.assertEqual(batch.topics, [])
+        self.assertEqual(batch.flush(), 0)
+
+        self.assertTrue(batch.add(topics[2], force_output=True, active=True))
+        self.assertEqual(batch.flush(), 1)
+        self.assertEqual(topics[2].puts, [dict(active=True)])
+
+    def test_update_batch(self):
+        topics = [MockTopic() for i in range(3)]
+        group = ATMCSSimulator.EventGroup(topics=topics, field_name="active")
+        batch = ATMCSSimulator.EventBatch()
+        nput = group.update([True, False, True], batch=batch)
+        self.assertEqual(nput, 3)
+        self.assertEqual([len(topic.puts) for topic in topics], [0, 0, 0])
+        self.assertEqual(batch.flush(), 3)
+        self.assertEqual(
+            [topic.puts for topic in topics],
+            [[dict(active=True)], [dict(active=False)], [dict(active=True)]],
+        )
+
+        group.update([True, True, True], batch=batch)
+        self.assertEqual(batch.topics, [topics[1]])
+
+    def test_indices(self):
+        # Two events report axis 1 and one event reports axis 0.
+        topics = [MockEvent() for i in range(3)]
+        group = ATMCSSimulator.EventGroup(
+            topics=topics, field_name="state", dtype=int, indices=[0, 1, 1]
+        )
+        group.update([5, 6])
+        self.assertEqual(
+            [topic.calls for topic in topics],
+            [[dict(state=5)], [dict(state=6)], [dict(state=6)]],
+        )
+        nput = group.update([5, 7])
+        self.assertEqual(nput, 2)
+        self.assertEqual(topics[1].calls[-1], dict(state=7))
+        self.assertEqual(topics[2].calls[-1], dict(state=7))
+        self.assertIsInstance(topics[2].calls[-1]["state"], int)
+
+
+if __name__ == "__main__":
+    unittest.main()
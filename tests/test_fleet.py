@@ -0,0 +1,114 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import asyncio
+import os
+import signal
+import unittest
+
+import asynctest
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+
+STD_TIMEOUT = 20  # standard timeout, seconds
+
+
+class FleetTestCase(asynctest.TestCase):
+    def setUp(self):
+        salobj.set_random_lsst_dds_domain()
+
+    def test_shard_indices(self):
+        self.assertEqual(ATMCSSimulator.shard_indices(range(5), 2), [[0, 2, 4], [1, 3]])
+        self.assertEqual(ATMCSSimulator.shard_indices([7, 8], 4), [[7], [8]])
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.shard_indices([1], 0)
+
+    def test_constructor_errors(self):
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.FleetSupervisor(indices=[])
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.FleetSupervisor(indices=[0, 0])
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.FleetSupervisor(indices=[0], configs={1: dict()})
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.FleetSupervisor(indices=[0], nworkers=0)
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.FleetSupervisor(indices=[0], stats_interval=0)
+
+    async def wait_for_report(self, supervisor):
+        """Wait for a report from the current process of each worker."""
+        while any(worker.heartbeat_time is None for worker in supervisor.workers):
+            await asyncio.sleep(0.1)
+
+    async def test_supervisor(self):
+        # ATMCS is not an indexed SAL component, so only one CSC
+        # can be run with the standard interface.
+        async with ATMCSSimulator.FleetSupervisor(
+            indices=[0],
+            initial_state=salobj.State.ENABLED,
+            stats_interval=0.2,
+            heartbeat_timeout=STD_TIMEOUT,
+            max_restarts=1,
+        ) as supervisor:
+            self.assertEqual(len(supervisor.workers), 1)
+            await asyncio.wait_for(
+                self.wait_for_report(supervisor), timeout=STD_TIMEOUT
+            )
+            stats = supervisor.get_stats()[0]
+            self.assertEqual(stats["indices"], [0])
+            self.assertTrue(stats["alive"])
+            self.assertEqual(stats["nrestarts"], 0)
+            self.assertEqual(stats["host"]["ninstances"], 1)
+
+            # Kill the worker; it should be restarted.
+            os.kill(stats["pid"], signal.SIGKILL)
+            await asyncio.sleep(1)
+            await asyncio.wait_for(
+                self.wait_for_report(supervisor), timeout=STD_TIMEOUT
+            )
+            stats = supervisor.get_stats()[0]
+            self.assertTrue(stats["alive"])
+            self.assertEqual(stats["nrestarts"], 1)
+
+            # Kill it again; it has used up its restarts.
+            os.kill(stats["pid"], signal.SIGKILL)
+            await asyncio.sleep(1)
+            self.assertTrue(supervisor.workers[0].failed)
+            self.assertTrue(supervisor.done)
+            self.assertFalse(supervisor.get_stats()[0]["alive"])
+
+    async def test_startup_timeout(self):
+        # Starting a worker takes much longer than heartbeat_timeout,
+        # so the worker is only restarted if it misses startup_timeout.
+        async with ATMCSSimulator.FleetSupervisor(
+            indices=[0],
+            stats_interval=0.2,
+            heartbeat_timeout=1,
+            startup_timeout=STD_TIMEOUT,
+        ) as supervisor:
+            await asyncio.wait_for(
+                self.wait_for_report(supervisor), timeout=STD_TIMEOUT
+            )
+            self.assertEqual(supervisor.get_stats()[0]["nrestarts"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
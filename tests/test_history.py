@@ -0,0 +1,176 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import pathlib
+import tempfile
+import types
+import unittest
+
+import asynctest
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+
+
+class MountHistoryTestCase(asynctest.TestCase):
+    def setUp(self):
+        salobj.set_random_lsst_dds_domain()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tempdir.name) / "history.dat"
+        self.config = types.SimpleNamespace(
+            torque_per_accel=np.array([1, 2, 3, 4, 5], dtype=float)
+        )
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, history, first, nsamples):
+        """Write samples ``first`` through ``first + nsamples - 1``
+        to a history: sample i has tai = i and, for axis j,
+        position = i + j, velocity = -(i + j), acceleration = 2 (i + j).
+        """
+        times = np.arange(first, first + nsamples, dtype=float)
+        position = times + np.arange(5)[:, np.newaxis]
+        history.write(
+            times=times,
+            position=position,
+            velocity=-position,
+            acceleration=2 * position,
+            config=self.config,
+        )
+
+    def check_samples(self, samples, first, nsamples):
+        self.assertEqual(len(samples), nsamples)
+        times = np.arange(first, first + nsamples, dtype=float)
+        position = times[:, np.newaxis] + np.arange(5)
+        np.testing.assert_array_equal(samples["tai"], times)
+        np.testing.assert_array_equal(samples["position"], position)
+        np.testing.assert_array_equal(samples["velocity"], -position)
+        np.testing.assert_array_equal(samples["acceleration"], 2 * position)
+        np.testing.assert_array_equal(
+            samples["torque"], 2 * position * self.config.torque_per_accel
+        )
+
+    def test_constructor_errors(self):
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.MountHistory(path=self.path, capacity=0)
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.MountHistory(path=self.path, capacity=10, naxes=0)
+        self.path.write_bytes(b"not a history file" * 10)
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.MountHistoryReader(self.path)
+
+    def test_ring_buffer(self):
+        capacity = 10
+        history = ATMCSSimulator.MountHistory(path=self.path, capacity=capacity)
+        reader = ATMCSSimulator.MountHistoryReader(self.path)
+        self.assertEqual(reader.naxes, 5)
+        self.assertEqual(reader.capacity, capacity)
+        self.assertEqual(reader.count, 0)
+        self.assertEqual(len(reader.get_latest()), 0)
+        with self.assertRaises(ValueError):
+            reader.samples["tai"][0] = 1
+
+        self.write(history, first=0, nsamples=4)
+        self.assertEqual(history.count, 4)
+        self.assertEqual(reader.count, 4)
+        self.check_samples(reader.get_latest(), first=0, nsamples=4)
+        self.check_samples(reader.get_latest(2), first=2, nsamples=2)
+        # The reader's samples are a view of the file.
+        self.check_samples(reader.samples[0:4], first=0, nsamples=4)
+
+        # Wrap around the end of the buffer.
+        self.write(history, first=4, nsamples=8)
+        self.assertEqual(reader.count, 12)
+        self.check_samples(reader.get_latest(), first=2, nsamples=capacity)
+        self.check_samples(reader.samples[0:2], first=10, nsamples=2)
+
+        # Write more samples than fit; only the most recent are kept.
+        self.write(history, first=12, nsamples=25)
+        self.assertEqual(reader.count, 37)
+        self.check_samples(reader.get_latest(), first=27, nsamples=capacity)
+        self.check_samples(reader.get_latest(3), first=34, nsamples=3)
+
+        history.close()
+        reader.close()
+        reader = ATMCSSimulator.MountHistoryReader(self.path)
+        self.check_samples(reader.get_latest(), first=27, nsamples=capacity)
+
+    def test_read_during_write(self):
+        capacity = 10
+        history = ATMCSSimulator.MountHistory(path=self.path, capacity=capacity)
+        reader = ATMCSSimulator.MountHistoryReader(self.path)
+        self.write(history, first=0, nsamples=capacity)
+
+        # Read while a write is in progress: after the writer has
+        # overwritten the ``tai`` field of the three oldest samples,
+        # but before it has written the other fields or updated ``count``.
+        read_samples = []
+
+        class InterleavedSamples:
+            def __init__(self, samples):
+                self.samples = samples
+                self.nfields = 0
+
+            def __getitem__(self, name):
+                self.nfields += 1
+                if self.nfields == 2:
+                    read_samples.append(reader.get_latest())
+                return self.samples[name]
+
+        history.samples = InterleavedSamples(history.samples)
+        self.write(history, first=capacity, nsamples=3)
+        self.assertEqual(len(read_samples), 1)
+        self.check_samples(read_samples[0], first=3, nsamples=capacity - 3)
+        self.check_samples(reader.get_latest(), first=3, nsamples=capacity)
+
+    async def test_csc(self):
+        clock = ATMCSSimulator.VirtualClock()
+        self.addCleanup(clock.close)
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED,
+            clock=clock,
+            history_path=self.path,
+            history_capacity=250,
+            telemetry_rates=dict(trajectory=(0.1, 1), torqueDemand=(0.5, 2)),
+        ) as csc:
+            finest_group = csc.telemetry_schedule.finest_group
+            self.assertEqual(finest_group.rate, (0.1, 1))
+            reader = ATMCSSimulator.MountHistoryReader(self.path)
+            await clock.sleep(0.35)
+            self.assertEqual(reader.count, 3 * finest_group.writer.nitems)
+            await clock.sleep(1)
+            samples = reader.get_latest()
+            self.assertEqual(len(samples), 250)
+            # The samples are evenly spaced in time.
+            np.testing.assert_allclose(
+                np.diff(samples["tai"]), 0.1 / finest_group.writer.nitems, atol=1e-6
+            )
+            # The history matches the most recent trajectory telemetry.
+            np.testing.assert_allclose(
+                samples["position"][-finest_group.writer.nitems :, 0],
+                csc.tel_trajectory.data.elevation,
+            )
+        self.assertIsNone(csc.history.samples)
+
+
+if __name__ == "__main__":
+    unittest.main()
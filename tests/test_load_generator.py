@@ -0,0 +1,161 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import unittest
+
+import asynctest
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+
+STD_TIMEOUT = 10  # standard timeout, seconds
+
+
+class LoadGeneratorTestCase(asynctest.TestCase):
+    def setUp(self):
+        salobj.set_random_lsst_dds_domain()
+
+    def test_constructor_errors(self):
+        for kwargs in (
+            dict(rate=0),
+            dict(duration=0),
+            dict(burst_size=0),
+            dict(jitter=-0.1),
+            dict(jitter=1),
+            dict(late_fraction=1.1),
+            dict(out_of_range_fraction=-0.1),
+            dict(late_delay=-1),
+        ):
+            with self.subTest(kwargs=kwargs):
+                all_kwargs = dict(rate=1, duration=1)
+                all_kwargs.update(kwargs)
+                with self.assertRaises(ValueError):
+                    ATMCSSimulator.LoadGenerator(remote=None, **all_kwargs)
+
+    def test_get_target(self):
+        LoadPattern = ATMCSSimulator.LoadPattern
+        for pattern in LoadPattern:
+            with self.subTest(pattern=pattern):
+                generator = ATMCSSimulator.LoadGenerator(
+                    remote=None, rate=1, duration=1, pattern=pattern.value
+                )
+                self.assertEqual(generator.pattern, pattern)
+                position0, velocity0 = generator.get_target(0)
+                position1, velocity1 = generator.get_target(6)
+                self.assertEqual(position0.shape, (4,))
+                self.assertEqual(velocity0.shape, (4,))
+                if pattern == LoadPattern.STEP:
+                    np.testing.assert_allclose(velocity0, 0)
+                    self.assertTrue(np.all(position1 > position0))
+                else:
+                    # The velocity is the derivative of the position.
+                    dt = 1e-3
+                    position_before = generator.get_target(6 - dt)[0]
+                    position_after = generator.get_target(6 + dt)[0]
+                    np.testing.assert_allclose(
+                        (position_after - position_before) / (2 * dt),
+                        velocity1,
+                        atol=1e-6,
+                    )
+
+    async def test_run(self):
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED
+        ) as csc, salobj.Remote(domain=csc.domain, name="ATMCS") as remote:
+            generator = ATMCSSimulator.LoadGenerator(
+                remote=remote,
+                rate=10,
+                duration=2,
+                burst_size=2,
+                late_fraction=0.5,
+                seed=1,
+            )
+            results = await generator.run()
+            self.assertEqual(results["rate"], 20)
+            self.assertEqual(results["nsent"], 40)
+            self.assertEqual(results["nacked"], 40)
+            self.assertEqual(results["nrejected"], 0)
+            self.assertEqual(results["nfaults"], 0)
+            self.assertGreater(results["achieved_rate"], 0)
+            self.assertEqual(results["ack_latency"]["nsamples"], 40)
+            self.assertGreater(results["telemetry_delay"]["nsamples"], 0)
+
+            # Out of range targets put the CSC in fault,
+            # and the generator recovers.
+            generator = ATMCSSimulator.LoadGenerator(
+                remote=remote, rate=2, duration=1, out_of_range_fraction=1
+            )
+            results = await generator.run()
+            self.assertEqual(results["nsent"], 2)
+            self.assertEqual(results["nrejected"], 2)
+            self.assertEqual(results["rejection_rate"], 1)
+            self.assertEqual(results["nfaults"], 2)
+            self.assertEqual(csc.summary_state, salobj.State.ENABLED)
+
+            # Without recovery the generator stops at the first fault,
+            # leaves the CSC in fault, and still returns the results.
+            generator = ATMCSSimulator.LoadGenerator(
+                remote=remote,
+                rate=2,
+                duration=2,
+                out_of_range_fraction=1,
+                recover=False,
+            )
+            results = await generator.run()
+            self.assertEqual(results["nsent"], 1)
+            self.assertEqual(results["nrejected"], 1)
+            self.assertEqual(results["nfaults"], 1)
+            self.assertEqual(csc.summary_state, salobj.State.FAULT)
+
+    async def test_find_saturation(self):
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED
+        ) as csc, salobj.Remote(domain=csc.domain, name="ATMCS") as remote:
+            all_results = await ATMCSSimulator.find_saturation(
+                remote=remote, rates=[5, 10], duration=1
+            )
+            self.assertGreaterEqual(len(all_results), 1)
+            for results in all_results[:-1]:
+                self.assertFalse(results["saturated"])
+            self.assertEqual(
+                [results["rate"] for results in all_results],
+                [5, 10][: len(all_results)],
+            )
+            for results in all_results:
+                self.assertFalse(results["faulted"])
+
+            # Without recovery, a fault at the first rate ends the search.
+            all_results = await ATMCSSimulator.find_saturation(
+                remote=remote,
+                rates=[2, 4],
+                duration=1,
+                out_of_range_fraction=1,
+                recover=False,
+            )
+            self.assertEqual(len(all_results), 1)
+            self.assertEqual(all_results[0]["rate"], 2)
+            self.assertEqual(all_results[0]["nfaults"], 1)
+            self.assertTrue(all_results[0]["faulted"])
+            self.assertEqual(csc.summary_state, salobj.State.FAULT)
+
+
+if __name__ == "__main__":
+    unittest.main()
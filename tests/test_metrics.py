@@ -0,0 +1,131 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import asyncio
+import json
+import logging
+import pathlib
+import tempfile
+import unittest
+
+import asynctest
+import numpy as np
+
+from lsst.ts import ATMCSSimulator
+
+
+class MetricsTestCase(asynctest.TestCase):
+    def test_counter(self):
+        counter = ATMCSSimulator.Counter()
+        self.assertEqual(counter.value, 0)
+        counter.increment()
+        counter.increment(3)
+        self.assertEqual(counter.value, 4)
+        counter.reset()
+        self.assertEqual(counter.value, 0)
+
+    def test_histogram(self):
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.Histogram(window=0)
+
+        window = 100
+        histogram = ATMCSSimulator.Histogram(window=window)
+        self.assertEqual(
+            histogram.summary(), dict(count=0, mean=0, p50=0, p99=0, max=0)
+        )
+
+        # Record more samples than fit in the window;
+        # count, mean and max are for all samples,
+        # but percentiles only for the most recent samples.
+        values = np.arange(250, dtype=float)
+        for value in values:
+            histogram.record(value)
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], len(values))
+        self.assertAlmostEqual(summary["mean"], values.mean())
+        self.assertEqual(summary["max"], values.max())
+        recent_values = values[-window:]
+        self.assertAlmostEqual(summary["p50"], np.percentile(recent_values, 50))
+        self.assertAlmostEqual(summary["p99"], np.percentile(recent_values, 99))
+
+        histogram.reset()
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(histogram.percentile(50), 0)
+
+    async def test_wrap(self):
+        registry = ATMCSSimulator.MetricsRegistry()
+
+        def func(a, b):
+            return a + b
+
+        async def coro(duration):
+            await asyncio.sleep(duration)
+            return duration
+
+        wrapped_func = registry.wrap("func", func)
+        self.assertEqual(wrapped_func(1, b=2), 3)
+        self.assertEqual(wrapped_func.__name__, "func")
+        wrapped_coro = registry.wrap("coro", coro)
+        self.assertTrue(asyncio.iscoroutinefunction(wrapped_coro))
+        self.assertEqual(await wrapped_coro(0.1), 0.1)
+        # Durations of failed calls are recorded as well.
+        with self.assertRaises(TypeError):
+            wrapped_func(1)
+
+        self.assertEqual(registry.histogram("func").count, 2)
+        coro_histogram = registry.histogram("coro")
+        self.assertEqual(coro_histogram.count, 1)
+        self.assertGreaterEqual(coro_histogram.max, 0.09)
+
+    def test_snapshot_and_dump(self):
+        registry = ATMCSSimulator.MetricsRegistry(window=10)
+        registry.histogram("b").record(0.5)
+        registry.histogram("a").record(0.25)
+        registry.counter("c").increment(5)
+        snapshot = registry.snapshot()
+        self.assertEqual(list(snapshot["histograms"]), ["a", "b"])
+        self.assertEqual(snapshot["histograms"]["b"]["max"], 0.5)
+        self.assertEqual(snapshot["counters"], dict(c=5))
+
+        with self.assertRaises(ValueError):
+            registry.dump()
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = pathlib.Path(tempdir) / "metrics.jsonl"
+            registry.dump(path=path, tai=1)
+            registry.counter("c").increment()
+            registry.dump(path=path, tai=2)
+            with open(path, "r") as f:
+                dumps = [json.loads(line) for line in f]
+        self.assertEqual([dump["tai"] for dump in dumps], [1, 2])
+        self.assertEqual([dump["counters"]["c"] for dump in dumps], [5, 6])
+        self.assertEqual(dumps[0]["histograms"], snapshot["histograms"])
+
+        log = logging.getLogger("test_metrics")
+        with self.assertLogs(log, level=logging.INFO):
+            registry.dump(log=log)
+
+        registry.reset()
+        self.assertEqual(registry.histogram("a").count, 0)
+        self.assertEqual(registry.counter("c").value, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,588 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import unittest
+
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts.idl.enums.ATMCS import AtMountState, M3ExitPort, M3State
+from lsst.ts import ATMCSSimulator
+
+Axis = ATMCSSimulator.Axis
+
+# Time step between calls to MountModel.step (sec).
+STEP_INTERVAL = 0.1
+
+
+class MountModelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tai = 1600000000
+        self.model = ATMCSSimulator.MountModel(tai=self.tai)
+        self.model.step(self.tai)
+
+    def run_steps(self, duration):
+        """Call ``self.model.step`` every STEP_INTERVAL for
+        ``duration`` seconds, advancing ``self.tai``.
+        """
+        for i in range(int(round(duration / STEP_INTERVAL))):
+            self.tai += STEP_INTERVAL
+            self.model.step(self.tai)
+
+    def track(self, position, duration):
+        """Track a fixed position for the specified duration (sec)."""
+        for i in range(int(round(duration / STEP_INTERVAL))):
+            self.tai += STEP_INTERVAL
+            self.model.track_target(
+                tai=self.tai, target_tai=self.tai, position=position, velocity=[0] * 4
+            )
+            self.model.step(self.tai)
+
+    def test_initial_state(self):
+        model = self.model
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGDISABLED)
+        self.assertEqual(model.m3_state, M3State.NASMYTH1)
+        self.assertEqual(model.exit_port, M3ExitPort.NASMYTH1)
+        np.testing.assert_array_equal(model.in_position, [True] + [False] * 5)
+        np.testing.assert_array_equal(model.axis_enabled, [False] * 5)
+        self.assertFalse(model.tracking_enabled)
+        self.assertIsNone(model.tracking_deadline)
+        self.assertEqual(model.position[Axis.Elevation], 5)
+
+    def test_configure_errors(self):
+        with self.assertRaises(salobj.ExpectedError):
+            self.model.configure(tai=self.tai, max_velocity=(1, 2, 3))
+        with self.assertRaises(salobj.ExpectedError):
+            self.model.configure(tai=self.tai, max_acceleration=(1, 1, 0, 1, 1))
+        with self.assertRaises(ValueError):
+            self.model.configure(tai=self.tai, limit_overtravel=-1)
+        # nothing changed
+        np.testing.assert_array_equal(self.model.max_velocity, [5] * 5)
+
+    def test_configure_cache(self):
+        model = self.model
+        config = model.config
+        # Equal contents give the same validated configuration,
+        # even if the values have different types.
+        model.configure(tai=self.tai, max_velocity=[5.0] * 5)
+        self.assertIs(model.config, config)
+        model.configure(tai=self.tai, max_velocity=np.full(5, 5))
+        self.assertIs(model.config, config)
+        other_model = ATMCSSimulator.MountModel(tai=self.tai)
+        self.assertIs(other_model.config, config)
+
+        model.configure(tai=self.tai, max_velocity=(4, 5, 5, 5, 5))
+        self.assertIsNot(model.config, config)
+        self.assertEqual(model.max_velocity[0], 4)
+        # The values are shared, so they must not be modified.
+        with self.assertRaises(ValueError):
+            model.max_velocity[0] = 3
+
+    def test_reconfigure(self):
+        model = self.model
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        self.track(position=[20, 10, 5, 0], duration=10)
+
+        # Reconfigure while slewing to a new position.
+        self.track(position=[40, 30, 5, 0], duration=0.5)
+        actuators = list(model.actuators)
+        paths = [actuator.path for actuator in actuators]
+        targets = [actuator.target for actuator in actuators]
+        old_max_velocity = model.max_velocity
+        model.reconfigure(
+            tai=self.tai,
+            max_velocity=(5, 6, 5, 5, 5),
+            max_commanded_position=(80, 270, 165, 165, 180),
+            nsettle=3,
+        )
+        self.assertEqual(model.actuators, actuators)
+        for actuator, path, target in zip(model.actuators, paths, targets):
+            self.assertIs(actuator.path, path)
+            self.assertIs(actuator.target, target)
+            self.assertEqual(actuator.nsettle, 3)
+        self.assertEqual(model.nsettle, 3)
+        np.testing.assert_array_equal(model.max_velocity, [5, 6, 5, 5, 5])
+        np.testing.assert_array_equal(old_max_velocity, [5] * 5)
+        self.assertEqual(model.actuators[Axis.Azimuth].max_velocity, 6)
+        self.assertEqual(model.actuators[Axis.Elevation].max_position, 80)
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGENABLED)
+
+        # The slew continues to the same target.
+        self.run_steps(10)
+        np.testing.assert_allclose(model.position[0:4], [40, 30, 5, 0])
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGENABLED)
+
+    def test_reconfigure_tracking_interval(self):
+        model = self.model
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        self.track(position=[20, 10, 5, 0], duration=1)
+        deadline = model.tracking_deadline
+        self.assertEqual(deadline, self.tai + 2.5)
+
+        model.reconfigure(tai=self.tai, max_tracking_interval=1)
+        self.assertEqual(model.tracking_deadline, deadline - 1.5)
+        for axis in ATMCSSimulator.MainAxes:
+            self.assertEqual(model.actuators[axis].dtmax_track, 1)
+
+        # Not tracking: there is no deadline to move.
+        model.stop_tracking(self.tai)
+        model.reconfigure(tai=self.tai, max_tracking_interval=3)
+        self.assertIsNone(model.tracking_deadline)
+
+    def test_reconfigure_errors(self):
+        model = self.model
+        config = model.config
+        with self.assertRaises(TypeError):
+            model.reconfigure(tai=self.tai, no_such_parameter=1)
+        with self.assertRaises(salobj.ExpectedError):
+            model.reconfigure(tai=self.tai, max_velocity=(1, 2, 3))
+        with self.assertRaises(salobj.ExpectedError):
+            model.reconfigure(tai=self.tai, min_commanded_position=(90, 0, 0, 0, 0))
+        with self.assertRaises(ValueError):
+            model.reconfigure(tai=self.tai, limit_overtravel=-1)
+        # nothing changed
+        self.assertIs(model.config, config)
+        np.testing.assert_array_equal(model.max_velocity, [5] * 5)
+
+    def test_track_and_stop(self):
+        model = self.model
+        model.enable_drives(self.tai)
+        np.testing.assert_array_equal(
+            model.axis_enabled, [True, True, True, False, False]
+        )
+        model.start_tracking(self.tai)
+        self.assertEqual(
+            model.tracking_deadline, self.tai + model.max_tracking_interval
+        )
+        model.step(self.tai)
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGENABLED)
+
+        position = [20, 10, 5, 0]
+        self.track(position=position, duration=10)
+        np.testing.assert_allclose(model.position[0:4], position)
+        np.testing.assert_array_equal(
+            model.in_position, [True, True, True, True, False, True]
+        )
+
+        # Stop while slewing to a new position.
+        self.track(position=[40, 30, 5, 0], duration=0.5)
+        model.stop_tracking(self.tai)
+        self.assertFalse(model.tracking_enabled)
+        self.assertIsNone(model.tracking_deadline)
+        self.assertIsNotNone(model.stop_tracking_end_tai)
+        with self.assertRaises(salobj.ExpectedError):
+            model.start_tracking(self.tai)
+        with self.assertRaises(salobj.ExpectedError):
+            model.stop_tracking(self.tai)
+        model.step(self.tai)
+        self.assertEqual(model.mount_state, AtMountState.STOPPING)
+
+        self.run_steps(model.stop_tracking_end_tai - self.tai + STEP_INTERVAL)
+        self.assertIsNone(model.stop_tracking_end_tai)
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGDISABLED)
+        np.testing.assert_array_equal(model.in_position, [True] + [False] * 5)
+        # stopTracking leaves the drives enabled
+        np.testing.assert_array_equal(
+            model.axis_enabled, [True, True, True, False, False]
+        )
+
+    def test_track_target_errors(self):
+        model = self.model
+        position = [20, 10, 5, 0]
+        with self.assertRaises(salobj.ExpectedError):
+            model.track_target(
+                tai=self.tai, target_tai=self.tai, position=position, velocity=[0] * 4
+            )
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        for bad_position, bad_velocity in (
+            ([-1, 10, 5, 0], [0] * 4),
+            ([20, 10, 5, 200], [0] * 4),
+            (position, [0, 6, 0, 0]),
+        ):
+            with self.subTest(position=bad_position, velocity=bad_velocity):
+                with self.assertRaises(salobj.ExpectedError):
+                    model.track_target(
+                        tai=self.tai,
+                        target_tai=self.tai,
+                        position=bad_position,
+                        velocity=bad_velocity,
+                    )
+                for actuator in model.actuators:
+                    self.assertEqual(actuator.kind(self.tai), actuator.Kind.Stopped)
+
+        # A position that is in range at target_tai
+        # but not when extrapolated to the current time.
+        with self.assertRaises(salobj.ExpectedError):
+            model.track_target(
+                tai=self.tai + 10,
+                target_tai=self.tai,
+                position=[89, 10, 5, 0],
+                velocity=[1, 0, 0, 0],
+            )
+
+    def test_load_trajectory(self):
+        # Load a block of targets on a path that moves in elevation
+        # and azimuth, and check that the model follows the same path
+        # as a model that gets the same targets one at a time.
+        model = self.model
+        manual_model = ATMCSSimulator.MountModel(tai=self.tai)
+        manual_model.step(self.tai)
+        start_tai = self.tai
+        velocity = np.array([0.1, -0.2, 0.05, 0])
+        start_position = np.array([20, 10, 5, 0])
+        ntargets = 100
+        # Offset the targets by half a step, to avoid ties
+        # between step times and the times targets are applied.
+        target_tai = start_tai + STEP_INTERVAL * (np.arange(ntargets) + 0.5)
+        position = start_position + np.outer(target_tai - start_tai, velocity)
+        for m in (model, manual_model):
+            m.enable_drives(self.tai)
+            m.start_tracking(self.tai)
+        model.load_trajectory(
+            tai=self.tai,
+            target_tai=target_tai,
+            position=position,
+            velocity=[velocity] * ntargets,
+        )
+        self.assertEqual(model.trajectory_remaining, ntargets)
+        self.assertAlmostEqual(
+            model.tracking_deadline,
+            target_tai[-1] - model.trajectory_lead + model.max_tracking_interval,
+        )
+
+        for i in range(ntargets):
+            model.step(self.tai)
+            manual_model.track_target(
+                tai=self.tai,
+                target_tai=target_tai[i],
+                position=position[i],
+                velocity=velocity,
+            )
+            manual_model.step(self.tai)
+            self.assertEqual(model.trajectory_remaining, ntargets - i - 1)
+            np.testing.assert_allclose(model.position, manual_model.position)
+            np.testing.assert_array_equal(model.in_position, manual_model.in_position)
+            self.tai += STEP_INTERVAL
+        # The model should have caught up with the path.
+        np.testing.assert_allclose(
+            model.position[0:4],
+            start_position + (self.tai - STEP_INTERVAL - start_tai) * velocity,
+            atol=0.05,
+        )
+
+        # track_target discards the rest of a block, as does stop_tracking.
+        for stop_tracking in (False, True):
+            with self.subTest(stop_tracking=stop_tracking):
+                model.load_trajectory(
+                    tai=self.tai,
+                    target_tai=target_tai + self.tai - start_tai,
+                    position=position,
+                    velocity=[velocity] * ntargets,
+                )
+                self.assertEqual(model.trajectory_remaining, ntargets)
+                if stop_tracking:
+                    model.stop_tracking(self.tai)
+                else:
+                    model.track_target(
+                        tai=self.tai,
+                        target_tai=self.tai,
+                        position=position[-1],
+                        velocity=velocity,
+                    )
+                self.assertEqual(model.trajectory_remaining, 0)
+
+    def test_load_trajectory_errors(self):
+        model = self.model
+        target_tai = self.tai + np.arange(3)
+        position = [[20, 10, 5, 0]] * 3
+        velocity = [[0] * 4] * 3
+        with self.assertRaises(salobj.ExpectedError):
+            model.load_trajectory(
+                tai=self.tai,
+                target_tai=target_tai,
+                position=position,
+                velocity=velocity,
+            )
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        for bad_target_tai, bad_position, bad_velocity in (
+            ([], [], []),
+            (target_tai, position[0:2], velocity),
+            (target_tai, position, [[0] * 3] * 3),
+            ([self.tai, self.tai + 2, self.tai + 1], position, velocity),
+            (target_tai, [[20, 10, 5, 0], [-1, 10, 5, 0], [20, 10, 5, 0]], velocity),
+            (target_tai, position, [[0] * 4, [0, 6, 0, 0], [0] * 4]),
+            # A position that is in range at its target time
+            # but not when extrapolated to the current time.
+            ([self.tai - 10], [[89, 10, 5, 0]], [[1, 0, 0, 0]]),
+        ):
+            with self.subTest(
+                target_tai=bad_target_tai, position=bad_position, velocity=bad_velocity
+            ):
+                with self.assertRaises(salobj.ExpectedError):
+                    model.load_trajectory(
+                        tai=self.tai,
+                        target_tai=bad_target_tai,
+                        position=bad_position,
+                        velocity=bad_velocity,
+                    )
+                self.assertEqual(model.trajectory_remaining, 0)
+
+    def test_next_transition_tai(self):
+        model = self.model
+        # An idle mount has no transitions.
+        self.assertIsNone(model.next_transition_tai(self.tai))
+
+        # M3 arriving at a port is predicted.
+        model.set_instrument_port(self.tai, M3ExitPort.PORT3)
+        model.step(self.tai)
+        self.assertEqual(model.m3_state, M3State.INMOTION)
+        while model.m3_state == M3State.INMOTION:
+            transition_tai = model.next_transition_tai(self.tai)
+            self.assertGreater(transition_tai, self.tai)
+            self.tai = transition_tai + 1e-6
+            model.step(self.tai)
+        self.assertEqual(model.m3_state, M3State.PORT3)
+        self.assertIsNone(model.next_transition_tai(self.tai))
+
+        # Running into a limit switch is predicted.
+        model.configure(tai=self.tai, max_limit_switch_position=(92, 20, 167, 167, 182))
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        model.track_target(
+            tai=self.tai,
+            target_tai=self.tai,
+            position=[20, 30, 0, 0],
+            velocity=[0] * 4,
+        )
+        while not model.above_max_limit[Axis.Azimuth]:
+            transition_tai = model.next_transition_tai(self.tai)
+            self.assertGreater(transition_tai, self.tai)
+            self.tai = transition_tai + 1e-6
+            model.step(self.tai)
+        self.assertAlmostEqual(model.position[Axis.Azimuth], 20, places=4)
+        # Azimuth passed both topple block switches on the way.
+        np.testing.assert_array_equal(model.topple_block, [False, True])
+
+        # The end of a halt is predicted.
+        model.stop_tracking(self.tai)
+        stop_tracking_end_tai = model.stop_tracking_end_tai
+        model.step(self.tai)
+        while model.mount_state == AtMountState.STOPPING:
+            self.tai = model.next_transition_tai(self.tai) + 1e-6
+            model.step(self.tai)
+        self.assertAlmostEqual(self.tai, stop_tracking_end_tai + 1e-6)
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGDISABLED)
+
+    def test_set_instrument_port(self):
+        model = self.model
+        model.enable_drives(self.tai)
+        self.assertTrue(model.axis_enabled[Axis.NA1])
+        self.assertFalse(model.set_instrument_port(self.tai, M3ExitPort.NASMYTH1))
+
+        self.assertTrue(model.set_instrument_port(self.tai, M3ExitPort.NASMYTH2))
+        self.assertFalse(model.axis_enabled[Axis.NA1])
+        self.assertFalse(model.axis_enabled[Axis.NA2])
+        self.run_steps(1)
+        self.assertEqual(model.m3_state, M3State.INMOTION)
+        self.assertIsNone(model.exit_port)
+        self.assertFalse(model.in_position[0])
+        with self.assertRaises(salobj.ExpectedError):
+            model.start_tracking(self.tai)
+
+        self.run_steps(60)
+        self.assertEqual(model.m3_state, M3State.NASMYTH2)
+        self.assertEqual(model.exit_port, M3ExitPort.NASMYTH2)
+        self.assertTrue(model.in_position[0])
+        self.assertFalse(model.axis_enabled[Axis.NA1])
+        self.assertTrue(model.axis_enabled[Axis.NA2])
+
+        with self.assertRaises(salobj.ExpectedError):
+            model.set_instrument_port(self.tai, 0)
+        model.start_tracking(self.tai)
+        with self.assertRaises(salobj.ExpectedError):
+            model.set_instrument_port(self.tai, M3ExitPort.PORT3)
+
+    def test_disable_all_drives(self):
+        model = self.model
+        model.enable_drives(self.tai)
+
+        # If all axes are stopped the drives are disabled immediately.
+        model.disable_all_drives(self.tai)
+        self.assertIsNone(model.disable_drives_end_tai)
+        np.testing.assert_array_equal(model.axis_enabled, [False] * 5)
+
+        # Otherwise they are disabled once all axes have stopped.
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        self.track(position=[60, 90, 0, 0], duration=1)
+        model.disable_all_drives(self.tai)
+        self.assertFalse(model.tracking_enabled)
+        self.assertIsNotNone(model.disable_drives_end_tai)
+        model.step(self.tai)
+        self.assertEqual(model.mount_state, AtMountState.STOPPING)
+        np.testing.assert_array_equal(
+            model.axis_enabled, [True, True, True, False, False]
+        )
+        # The halt is done as soon as all axes report stopped,
+        # which is the predicted end of the halt.
+        end_tai = model.disable_drives_end_tai
+        self.assertEqual(
+            end_tai, max(actuator.path[-1].tai for actuator in model.actuators)
+        )
+        model.step(end_tai - 0.001)
+        self.assertEqual(model.mount_state, AtMountState.STOPPING)
+        self.assertIsNotNone(model.disable_drives_end_tai)
+        self.tai = end_tai
+        model.step(self.tai)
+        self.assertIsNone(model.disable_drives_end_tai)
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGDISABLED)
+        np.testing.assert_array_equal(model.axis_enabled, [False] * 5)
+
+    def test_snapshot(self):
+        model = self.model
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        self.track(position=[20, 10, 5, 0], duration=1)
+        snapshot = model.snapshot()
+        position = snapshot.position.copy()
+        self.assertEqual(snapshot.tai, self.tai)
+        self.assertTrue(snapshot.tracking_enabled)
+        np.testing.assert_array_equal(snapshot.axis_enabled, model.axis_enabled)
+
+        model.disable_all_drives(self.tai)
+        self.run_steps(10)
+        self.assertEqual(model.mount_state, AtMountState.TRACKINGDISABLED)
+        np.testing.assert_array_equal(model.axis_enabled, [False] * 5)
+        np.testing.assert_array_equal(model.brake_engaged, [True] * 5)
+
+        # The snapshot has not changed.
+        self.assertEqual(snapshot.mount_state, AtMountState.TRACKINGENABLED)
+        self.assertTrue(snapshot.tracking_enabled)
+        np.testing.assert_array_equal(
+            snapshot.axis_enabled, [True, True, True, False, False]
+        )
+        np.testing.assert_array_equal(
+            snapshot.brake_engaged, [False, False, False, True, True]
+        )
+        np.testing.assert_array_equal(snapshot.position, position)
+        self.assertNotEqual(snapshot.velocity[Axis.Elevation], 0)
+
+    def test_limit_switch(self):
+        model = self.model
+        model.configure(
+            tai=self.tai,
+            max_limit_switch_position=(30, 272, 167, 167, 182),
+            limit_overtravel=0.5,
+        )
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        self.track(position=[60, 0, 0, 0], duration=10)
+        self.assertTrue(model.above_max_limit[Axis.Elevation])
+        self.assertFalse(model.axis_enabled[Axis.Elevation])
+        self.assertTrue(model.axis_enabled[Axis.Azimuth])
+        # The axis is aborted where it is, but no further than the hard stop.
+        self.assertGreater(model.position[Axis.Elevation], 30)
+        self.assertLessEqual(model.position[Axis.Elevation], 30.5)
+        self.track(position=[60, 0, 0, 0], duration=1)
+        self.assertFalse(model.axis_enabled[Axis.Elevation])
+        np.testing.assert_array_equal(model.below_min_limit, [False] * 5)
+
+    def test_limit_switch_several_axes(self):
+        model = self.model
+        model.configure(
+            tai=self.tai,
+            min_limit_switch_position=(3, -5, -167, -167, -2),
+            max_limit_switch_position=(30, 272, 167, 167, 182),
+            limit_overtravel=0.5,
+        )
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        model.track_target(
+            tai=self.tai,
+            target_tai=self.tai,
+            position=[60, -20, 0, 0],
+            velocity=[0] * 4,
+        )
+        # Step once, long after both axes have passed their limits,
+        # so both are aborted at the same step, at the hard stop.
+        self.tai += 20
+        model.step(self.tai)
+        np.testing.assert_array_equal(
+            model.above_max_limit, [True, False, False, False, False]
+        )
+        np.testing.assert_array_equal(
+            model.below_min_limit, [False, True, False, False, False]
+        )
+        np.testing.assert_array_equal(
+            model.axis_enabled, [False, False, True, False, False]
+        )
+        for axis, abort_position in ((Axis.Elevation, 30.5), (Axis.Azimuth, -5.5)):
+            actuator = model.actuators[axis]
+            self.assertEqual(actuator.kind(self.tai), actuator.Kind.Stopped)
+            self.assertAlmostEqual(actuator.path.at(self.tai).position, abort_position)
+        np.testing.assert_array_equal(model.in_position, [True] + [False] * 5)
+
+    def test_topple_block(self):
+        model = self.model
+        np.testing.assert_array_equal(model.topple_block, [True, False])
+        model.enable_drives(self.tai)
+        model.start_tracking(self.tai)
+        self.track(position=[20, 3, 0, 0], duration=5)
+        np.testing.assert_array_equal(model.topple_block, [False, False])
+        self.track(position=[20, 10, 0, 0], duration=5)
+        np.testing.assert_array_equal(model.topple_block, [False, True])
+
+    def test_command(self):
+        model = self.model
+        model.command("setInstrumentPort", tai=self.tai, port=M3ExitPort.PORT3)
+        self.run_steps(60)
+        self.assertEqual(model.m3_state, M3State.PORT3)
+
+        model.enable_drives(self.tai)
+        model.command("startTracking", tai=self.tai)
+        self.assertTrue(model.tracking_enabled)
+        model.command(
+            "trackTarget",
+            tai=self.tai,
+            taiTime=self.tai,
+            elevation=20,
+            azimuth=10,
+            nasmyth1RotatorAngle=0,
+            nasmyth2RotatorAngle=0,
+            elevationVelocity=0,
+            azimuthVelocity=0,
+            nasmyth1RotatorAngleVelocity=0,
+            nasmyth2RotatorAngleVelocity=0,
+            trackId=5,
+        )
+        self.assertEqual(model.actuators[Axis.Elevation].target.position, 20)
+        model.command("stopTracking", tai=self.tai)
+        self.assertFalse(model.tracking_enabled)
+
+        with self.assertRaises(ValueError):
+            model.command("moveToTarget", tai=self.tai)
+
+
+if __name__ == "__main__":
+    unittest.main()
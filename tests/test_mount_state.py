@@ -0,0 +1,107 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import unittest
+
+import numpy as np
+
+from lsst.ts import ATMCSSimulator
+from lsst.ts.idl.enums.ATMCS import AtMountState
+
+ARRAY_FIELDS = (
+    "position",
+    "velocity",
+    "axis_enabled",
+    "brake_engaged",
+    "limit_switch",
+    "below_min_limit",
+    "above_max_limit",
+    "topple_block",
+    "in_position",
+)
+
+
+class MountStateTestCase(unittest.TestCase):
+    def test_initial_state(self):
+        state = ATMCSSimulator.MountState()
+        self.assertIsNone(state.tai)
+        self.assertFalse(state.tracking_enabled)
+        self.assertEqual(state.mount_state, AtMountState.TRACKINGDISABLED)
+        self.assertIsNone(state.exit_port)
+        np.testing.assert_array_equal(state.position, [0] * 5)
+        np.testing.assert_array_equal(state.axis_enabled, [False] * 5)
+        np.testing.assert_array_equal(state.brake_engaged, [True] * 5)
+        self.assertEqual(state.limit_switch.shape, (5, 2))
+        self.assertEqual(state.in_position.shape, (6,))
+        with self.assertRaises(AttributeError):
+            state.no_such_field = 1
+
+    def test_limit_switch_views(self):
+        state = ATMCSSimulator.MountState()
+        state.below_min_limit[1] = True
+        state.above_max_limit[3] = True
+        np.testing.assert_array_equal(
+            state.limit_switch.ravel(),
+            [False, False, True, False, False, False, False, True, False, False],
+        )
+
+    def test_snapshot(self):
+        state = ATMCSSimulator.MountState()
+        state.tai = 5
+        state.position[:] = [1, 2, 3, 4, 5]
+        state.axis_enabled[0] = True
+        snapshot = state.snapshot()
+
+        # The snapshot shares the arrays and all are read-only.
+        for name in ARRAY_FIELDS:
+            with self.subTest(name=name):
+                self.assertIs(getattr(snapshot, name), getattr(state, name))
+                self.assertFalse(getattr(snapshot, name).flags.writeable)
+        with self.assertRaises(ValueError):
+            state.position[0] = 0
+        self.assertIsNot(state.snapshot(), snapshot)
+
+        # Modifying the state copies the arrays, leaving the snapshot as is.
+        state.make_writable()
+        state.tai = 6
+        state.position[0] = 10
+        state.below_min_limit[0] = True
+        state.axis_enabled[0] = False
+        for name in ARRAY_FIELDS:
+            with self.subTest(name=name):
+                self.assertTrue(getattr(state, name).flags.writeable)
+                self.assertFalse(
+                    np.shares_memory(getattr(state, name), getattr(snapshot, name))
+                )
+        self.assertEqual(snapshot.tai, 5)
+        np.testing.assert_array_equal(snapshot.position, [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(snapshot.below_min_limit, [False] * 5)
+        self.assertTrue(snapshot.axis_enabled[0])
+        self.assertEqual(state.position[0], 10)
+        self.assertTrue(state.limit_switch[0, 0])
+
+        # make_writable does not copy unless there is a snapshot.
+        position = state.position
+        state.make_writable()
+        self.assertIs(state.position, position)
+
+
+if __name__ == "__main__":
+    unittest.main()
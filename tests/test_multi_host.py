@@ -0,0 +1,106 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import asyncio
+import unittest
+import unittest.mock
+
+import asynctest
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+from lsst.ts.idl.enums.ATMCS import AtMountState
+
+STD_TIMEOUT = 10  # standard timeout, seconds
+
+
+class MultiCscHostTestCase(asynctest.TestCase):
+    def setUp(self):
+        salobj.set_random_lsst_dds_domain()
+
+    def test_constructor_errors(self):
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.MultiCscHost(indices=[])
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.MultiCscHost(indices=[0, 0])
+        with self.assertRaises(ValueError):
+            ATMCSSimulator.MultiCscHost(indices=[0], configs={1: dict()})
+
+    async def test_run(self):
+        # ATMCS is not an indexed SAL component, so only one CSC
+        # can be run with the standard interface.
+        max_velocity = (4, 4, 4, 4, 4)
+        async with ATMCSSimulator.MultiCscHost(
+            indices=[0],
+            initial_state=salobj.State.ENABLED,
+            configs={0: dict(max_velocity=max_velocity)},
+        ) as host:
+            csc = host.cscs[0]
+            self.assertFalse(csc.run_loop)
+            self.assertTrue(csc._events_and_telemetry_task.done())
+            np.testing.assert_array_equal(csc.model.max_velocity, max_velocity)
+
+            async with salobj.Remote(
+                domain=csc.domain, name="ATMCS", index=0
+            ) as remote:
+                # The shared loop outputs events and telemetry.
+                data = await remote.evt_atMountState.next(
+                    flush=False, timeout=STD_TIMEOUT
+                )
+                self.assertEqual(data.state, AtMountState.TRACKINGDISABLED)
+                await remote.tel_mount_AzEl_Encoders.next(
+                    flush=True, timeout=STD_TIMEOUT
+                )
+
+                await remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+                await asyncio.sleep(0.2)
+                await remote.cmd_stopTracking.start(timeout=STD_TIMEOUT)
+
+            stats = host.get_stats()
+            self.assertEqual(stats["ninstances"], 1)
+            self.assertEqual(stats["nactive"], 1)
+            self.assertGreater(stats["elapsed"], 0)
+            self.assertGreater(stats["process_cpu"], 0)
+            self.assertGreater(stats["instance_cpu"][0], 0)
+            self.assertGreater(stats["shared_cpu"], 0)
+            self.assertGreater(stats["instances_per_core"], 0)
+            self.assertGreater(stats["loop_scheduler"]["ntick"], 10)
+
+            # Telemetry output by the shared loop is accounted for
+            # in the CSC's metrics, including failures.
+            snapshot = csc.metrics.snapshot()
+            self.assertGreater(snapshot["histograms"]["update_telemetry"]["count"], 0)
+            self.assertEqual(snapshot["counters"]["update_telemetry_failed"], 0)
+            group = csc.telemetry_schedule.groups[0]
+            with unittest.mock.patch.object(
+                csc, "write_telemetry", side_effect=RuntimeError("test")
+            ):
+                with self.assertLogs(csc.log, level="ERROR"):
+                    host.update_telemetry(
+                        csc_groups=[(csc, group)], tai=csc.clock.tai()
+                    )
+            self.assertEqual(
+                csc.metrics.snapshot()["counters"]["update_telemetry_failed"], 1
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import unittest
+
+import numpy as np
+
+from lsst.ts import simactuators
+from lsst.ts import ATMCSSimulator
+
+
+class PathUtilsTestCase(unittest.TestCase):
+    def setUp(self):
+        PathSegment = simactuators.path.PathSegment
+        self.start_tai = 1600000000
+        self.paths = [
+            simactuators.path.Path(
+                PathSegment(tai=self.start_tai, position=1, velocity=2),
+                PathSegment(
+                    tai=self.start_tai + 0.5, position=3, velocity=-1, acceleration=0.5,
+                ),
+                PathSegment(tai=self.start_tai + 0.75, position=-2, acceleration=-3),
+                kind=simactuators.path.Kind.Slewing,
+            ),
+            simactuators.path.Path(
+                PathSegment(tai=self.start_tai + 0.2, position=45),
+                kind=simactuators.path.Kind.Stopped,
+            ),
+        ]
+
+    def test_evaluate_paths(self):
+        # Include times before the start of the paths
+        # and times exactly at segment boundaries.
+        times = np.linspace(self.start_tai - 0.25, self.start_tai + 1.25, num=31)
+        position, velocity, acceleration = ATMCSSimulator.evaluate_paths(
+            self.paths, times
+        )
+        self.assertEqual(position.shape, (len(self.paths), len(times)))
+        self.assertEqual(velocity.shape, position.shape)
+        self.assertEqual(acceleration.shape, position.shape)
+        for i, path in enumerate(self.paths):
+            for j, tai in enumerate(times):
+                segment = path.at(tai)
+                self.assertAlmostEqual(position[i, j], segment.position)
+                self.assertAlmostEqual(velocity[i, j], segment.velocity)
+                self.assertAlmostEqual(acceleration[i, j], segment.acceleration)
+
+    def test_unsorted_times(self):
+        times = np.linspace(self.start_tai - 0.25, self.start_tai + 1.25, num=31)
+        sorted_results = ATMCSSimulator.evaluate_paths(self.paths, times)
+        rng = np.random.default_rng(seed=12)
+        permutation = rng.permutation(len(times))
+        unsorted_results = ATMCSSimulator.evaluate_paths(self.paths, times[permutation])
+        for sorted_values, unsorted_values in zip(sorted_results, unsorted_results):
+            np.testing.assert_allclose(sorted_values[:, permutation], unsorted_values)
+
+    def test_many_segments(self):
+        # Many short segments, including two that start at the same time
+        # and boundaries that coincide with sample times.
+        PathSegment = simactuators.path.PathSegment
+        segment_tais = self.start_tai + np.array(
+            [0, 0.1, 0.1, 0.35, 0.4, 0.45, 0.5, 0.9]
+        )
+        path = simactuators.path.Path(
+            *[
+                PathSegment(tai=tai, position=i, velocity=-i, acceleration=i * 0.1)
+                for i, tai in enumerate(segment_tais)
+            ],
+            kind=simactuators.path.Kind.Slewing,
+        )
+        paths = [path] + self.paths
+        times = np.linspace(self.start_tai - 0.05, self.start_tai + 1, num=22)
+        position, velocity, acceleration = ATMCSSimulator.evaluate_paths(paths, times)
+        for i, path in enumerate(paths):
+            for j, tai in enumerate(times):
+                segment = path.at(tai)
+                self.assertAlmostEqual(position[i, j], segment.position)
+                self.assertAlmostEqual(velocity[i, j], segment.velocity)
+                self.assertAlmostEqual(acceleration[i, j], segment.acceleration)
+
+    def test_evaluate_no_times(self):
+        position, velocity, acceleration = ATMCSSimulator.evaluate_paths(self.paths, [])
+        self.assertEqual(position.shape, (len(self.paths), 0))
+
+    def test_next_segment_tai(self):
+        path = self.paths[0]
+        for tai, desired_tai in (
+            (self.start_tai - 1, self.start_tai),
+            (self.start_tai, self.start_tai + 0.5),
+            (self.start_tai + 0.6, self.start_tai + 0.75),
+            (self.start_tai + 0.75, None),
+        ):
+            with self.subTest(tai=tai):
+                self.assertEqual(
+                    ATMCSSimulator.next_segment_tai(path, tai), desired_tai
+                )
+
+    def test_next_crossing_tai(self):
+        path = self.paths[0]
+        for tai, positions, desired_tai in (
+            # Constant velocity segment.
+            (self.start_tai, [1.5], self.start_tai + 0.25),
+            # Extrapolate the first segment before the start.
+            (self.start_tai - 0.25, [0.75, 1.5], self.start_tai - 0.125),
+            # The position at the current time does not count.
+            (self.start_tai + 0.25, [1.5], None),
+            # Jumps between segments do not count.
+            (self.start_tai, [2.5], None),
+            # Decelerating segment; the root of the quadratic
+            # after the end of the segment does not count.
+            (self.start_tai + 0.5, [2.9], self.start_tai + 0.5 + 2 - np.sqrt(3.6)),
+            # The last segment is extrapolated forever,
+            # but not backwards.
+            (self.start_tai, [-2.5], self.start_tai + 0.75 + np.sqrt(1 / 3)),
+        ):
+            with self.subTest(tai=tai, positions=positions):
+                crossing_tai = ATMCSSimulator.next_crossing_tai(
+                    path=path, tai=tai, positions=positions
+                )
+                if desired_tai is None:
+                    self.assertIsNone(crossing_tai)
+                else:
+                    self.assertAlmostEqual(crossing_tai, desired_tai, places=6)
+                    self.assertAlmostEqual(
+                        min(abs(path.at(crossing_tai).position - np.array(positions))),
+                        0,
+                        places=5,
+                    )
+
+        # A stopped path never crosses anything.
+        self.assertIsNone(
+            ATMCSSimulator.next_crossing_tai(
+                path=self.paths[1], tai=self.start_tai, positions=[44, 45, 46]
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
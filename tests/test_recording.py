@@ -0,0 +1,138 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import pathlib
+import tempfile
+import unittest
+
+import asynctest
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+
+
+class RecordingTestCase(asynctest.TestCase):
+    def setUp(self):
+        salobj.set_random_lsst_dds_domain()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tempdir.name) / "recording"
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def record(self, ntargets):
+        """Record a simulator that is configured, then tracks
+        ``ntargets`` targets, then is reconfigured, then stops tracking.
+        """
+        clock = ATMCSSimulator.VirtualClock()
+        self.addCleanup(clock.close)
+        async with ATMCSSimulator.ATMCSCsc(
+            initial_state=salobj.State.ENABLED, clock=clock, record_path=self.path
+        ) as csc:
+            with self.assertRaises(FileExistsError):
+                ATMCSSimulator.Recorder(csc=csc, path=self.path)
+            csc.configure(max_velocity=(4, 4, 4, 4, 4))
+            # Issue commands between the ticks of the loop.
+            await clock.sleep(0.05)
+            csc.cmd_startTracking.callback(csc.cmd_startTracking.DataType())
+            for i in range(ntargets):
+                data = csc.cmd_trackTarget.DataType()
+                data.elevation = 20 + i
+                data.elevationVelocity = 1
+                data.azimuth = 5 + i
+                data.azimuthVelocity = 1
+                data.taiTime = clock.tai()
+                data.trackId = i + 1
+                csc.cmd_trackTarget.callback(data)
+                await clock.sleep(0.5)
+            csc.reconfigure(max_acceleration=(2, 2, 2, 2, 2))
+            await clock.sleep(0.05)
+            await csc.cmd_stopTracking.callback(csc.cmd_stopTracking.DataType())
+            await clock.sleep(1)
+        return ATMCSSimulator.Recording(self.path)
+
+    async def test_record(self):
+        ntargets = 4
+        recording = await self.record(ntargets=ntargets)
+        self.assertEqual(recording.initial_state, salobj.State.ENABLED)
+        self.assertEqual(recording.kinds["cmd_trackTarget"], "command")
+        self.assertEqual(recording.kinds["evt_target"], "event")
+        self.assertEqual(recording.kinds["tel_trajectory"], "telemetry")
+        self.assertNotIn("evt_heartbeat", recording.streams)
+
+        track_target = recording.streams["cmd_trackTarget"]
+        self.assertEqual(len(track_target), ntargets)
+        np.testing.assert_array_equal(
+            track_target["trackId"], np.arange(1, ntargets + 1)
+        )
+        np.testing.assert_allclose(track_target["elevation"], 20 + np.arange(ntargets))
+        np.testing.assert_allclose(np.diff(track_target["tai"]), 0.5)
+        self.assertTrue(np.all(np.diff(track_target["seq"]) > 0))
+        self.assertEqual(len(recording.streams["evt_target"]), ntargets)
+        self.assertGreater(len(recording.streams["tel_trajectory"]), 0)
+        self.assertEqual(len(recording.configure_calls), 2)
+
+        inputs = recording.get_inputs()
+        self.assertEqual(
+            [name for tai, name, kwargs in inputs],
+            ["configure", "cmd_startTracking"]
+            + ["cmd_trackTarget"] * ntargets
+            + ["reconfigure", "cmd_stopTracking"],
+        )
+        self.assertEqual(inputs[0][2], dict(max_velocity=[4, 4, 4, 4, 4]))
+        self.assertEqual(inputs[-2][2], dict(max_acceleration=[2, 2, 2, 2, 2]))
+        self.assertEqual(inputs[2][2]["trackId"], 1)
+        self.assertIsInstance(inputs[2][2]["trackId"], int)
+
+    async def test_replay(self):
+        recording = await self.record(ntargets=3)
+        replay = await ATMCSSimulator.replay_recording(
+            recording, path=pathlib.Path(self.tempdir.name) / "replay"
+        )
+        self.assertEqual(replay.start_tai, recording.start_tai)
+        diffs = ATMCSSimulator.compare_recordings(recording, replay)
+        self.assertIn("evt_target", [diff.name for diff in diffs])
+        self.assertIn("tel_trajectory", [diff.name for diff in diffs])
+        for diff in diffs:
+            with self.subTest(name=diff.name):
+                self.assertEqual(diff.nexpected, diff.nactual)
+                self.assertLess(diff.max_abs_diff, 1e-7)
+
+        # Replaying an altered recording reports differences.
+        recording.streams["cmd_trackTarget"] = np.array(
+            recording.streams["cmd_trackTarget"]
+        )
+        recording.streams["cmd_trackTarget"]["elevation"][-1] += 1
+        recording.configure_calls[0]["kwargs"]["max_acceleration"] = [1] * 5
+        replay = await ATMCSSimulator.replay_recording(
+            recording, path=pathlib.Path(self.tempdir.name) / "replay2"
+        )
+        diffs = {
+            diff.name: diff
+            for diff in ATMCSSimulator.compare_recordings(recording, replay)
+        }
+        self.assertAlmostEqual(diffs["evt_target"].max_abs_diff, 1)
+        self.assertEqual(diffs["evt_target"].field, "elevation")
+        self.assertGreater(diffs["tel_trajectory"].max_abs_diff, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import time
+import unittest
+
+import asynctest
+
+from lsst.ts import ATMCSSimulator
+
+PERIOD = 0.05  # scheduler period (sec)
+
+
+class DeadlineSchedulerTestCase(asynctest.TestCase):
+    def test_constructor_errors(self):
+        for bad_period in (0, -PERIOD):
+            with self.subTest(bad_period=bad_period):
+                with self.assertRaises(ValueError):
+                    ATMCSSimulator.DeadlineScheduler(period=bad_period)
+
+    async def test_no_drift(self):
+        scheduler = ATMCSSimulator.DeadlineScheduler(period=PERIOD)
+        for i in range(5):
+            tick = await scheduler.wait_next()
+            self.assertEqual(tick.index, i)
+            self.assertAlmostEqual(tick.deadline, scheduler.start_time + i * PERIOD)
+            self.assertGreaterEqual(time.monotonic(), tick.deadline - 0.001)
+            # Work that takes a significant fraction of the period
+            # must not delay later ticks.
+            time.sleep(PERIOD * 0.5)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["ntick"], 5)
+        self.assertEqual(stats["noverrun"], 0)
+        self.assertEqual(stats["nskipped"], 0)
+
+    async def test_catch_up(self):
+        scheduler = ATMCSSimulator.DeadlineScheduler(
+            period=PERIOD, policy=ATMCSSimulator.OverrunPolicy.CATCH_UP
+        )
+        tick = await scheduler.wait_next()
+        self.assertEqual(tick.index, 0)
+        time.sleep(PERIOD * 3.5)
+        # Ticks 1, 2 and 3 are overdue and are returned at once.
+        for index in (1, 2, 3):
+            tick = await scheduler.wait_next()
+            self.assertEqual(tick.index, index)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["noverrun"], 3)
+        self.assertEqual(stats["nskipped"], 0)
+        self.assertGreater(stats["lateness_max"], PERIOD)
+        tick = await scheduler.wait_next()
+        self.assertEqual(tick.index, 4)
+
+    async def test_skip(self):
+        scheduler = ATMCSSimulator.DeadlineScheduler(
+            period=PERIOD, policy=ATMCSSimulator.OverrunPolicy.SKIP
+        )
+        tick = await scheduler.wait_next()
+        self.assertEqual(tick.index, 0)
+        time.sleep(PERIOD * 3.5)
+        # Ticks 1 and 2 are skipped and tick 3 is returned at once.
+        tick = await scheduler.wait_next()
+        self.assertEqual(tick.index, 3)
+        tick = await scheduler.wait_next()
+        self.assertEqual(tick.index, 4)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["ntick"], 3)
+        self.assertEqual(stats["noverrun"], 1)
+        self.assertEqual(stats["nskipped"], 2)
+
+        scheduler.reset()
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["ntick"], 0)
+        self.assertEqual(stats["noverrun"], 0)
+        self.assertEqual(stats["nskipped"], 0)
+
+    async def test_min_index(self):
+        scheduler = ATMCSSimulator.DeadlineScheduler(period=PERIOD)
+        tick = await scheduler.wait_next()
+        self.assertEqual(tick.index, 0)
+        # Sleep through ticks 1 and 2.
+        tick = await scheduler.wait_next(min_index=3)
+        self.assertEqual(tick.index, 3)
+        self.assertGreaterEqual(time.monotonic(), tick.deadline - 0.001)
+        # A min_index that has already passed is ignored.
+        tick = await scheduler.wait_next(min_index=2)
+        self.assertEqual(tick.index, 4)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["ntick"], 3)
+        self.assertEqual(stats["noverrun"], 0)
+        self.assertEqual(stats["nskipped"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+import asynctest
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+from lsst.ts.idl.enums.ATMCS import AtMountState, M3State
+
+STD_TIMEOUT = 10  # standard timeout, seconds
+
+
+class SharedCscTestCase(ATMCSSimulator.SharedCscTestCase, asynctest.TestCase):
+    use_default_loop = True
+
+    # The CSC used by the first test that ran, to check it is shared.
+    first_csc = None
+
+    async def check_shared(self, initial_state):
+        """Make the shared CSC and check that it is the same
+        for every test and that its initial events are output.
+        """
+        await self.make_shared_csc(initial_state=initial_state)
+        if SharedCscTestCase.first_csc is None:
+            SharedCscTestCase.first_csc = self.csc
+        self.assertIs(self.csc, SharedCscTestCase.first_csc)
+        self.assertEqual(self.csc.summary_state, initial_state)
+
+        data = self.remote.evt_summaryState.get()
+        self.assertEqual(data.summaryState, initial_state)
+        await self.remote.evt_positionLimits.next(flush=False, timeout=STD_TIMEOUT)
+        if initial_state == salobj.State.STANDBY:
+            return
+
+        data = await self.remote.evt_atMountState.next(flush=False, timeout=STD_TIMEOUT)
+        self.assertEqual(data.state, AtMountState.TRACKINGDISABLED)
+        data = await self.remote.evt_m3State.next(flush=False, timeout=STD_TIMEOUT)
+        self.assertEqual(data.state, M3State.NASMYTH1)
+        data = await self.remote.evt_allAxesInPosition.next(
+            flush=False, timeout=STD_TIMEOUT
+        )
+        self.assertFalse(data.inPosition)
+
+    async def test_disabled(self):
+        await self.check_shared(initial_state=salobj.State.DISABLED)
+
+    async def test_enabled(self):
+        await self.check_shared(initial_state=salobj.State.ENABLED)
+
+    async def test_standby(self):
+        await self.check_shared(initial_state=salobj.State.STANDBY)
+
+    async def test_reset(self):
+        await self.check_shared(initial_state=salobj.State.ENABLED)
+        with self.assertRaises(salobj.ExpectedError):
+            self.csc.reset()
+
+        # Change the configuration and move the mount.
+        self.csc.configure(max_velocity=(100,) * 5, max_acceleration=(200,) * 5)
+        self.csc.configure(
+            telemetry_rates=dict(
+                trajectory=ATMCSSimulator.TelemetryRate(interval=0, decimation=1)
+            )
+        )
+        await self.remote.cmd_startTracking.start(timeout=STD_TIMEOUT)
+        tai = salobj.current_tai() + 0.1
+        await self.remote.cmd_trackTarget.set_start(
+            elevation=20, azimuth=10, taiTime=tai, trackId=1, timeout=STD_TIMEOUT
+        )
+        data = await self.remote.evt_target.next(flush=False, timeout=STD_TIMEOUT)
+        self.assertEqual(data.trackId, 1)
+
+        # Reset and check that the mount is back to its initial state.
+        await self.check_shared(initial_state=salobj.State.ENABLED)
+        tai = self.csc.clock.tai()
+        default_model = ATMCSSimulator.MountModel(tai=tai)
+        self.assertEqual(
+            list(self.csc.model.max_velocity), list(default_model.max_velocity)
+        )
+        for actuator, default_actuator in zip(
+            self.csc.actuators, default_model.actuators
+        ):
+            self.assertAlmostEqual(
+                actuator.path.at(tai).position, default_actuator.path.at(tai).position
+            )
+        self.assertGreater(self.csc.telemetry_schedule.rates["trajectory"].interval, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+# This file is part of ts_ATMCSSimulator.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (https://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+
+import types
+import unittest
+
+import numpy as np
+
+from lsst.ts import salobj
+from lsst.ts import ATMCSSimulator
+
+Quantity = ATMCSSimulator.Quantity
+NSAMPLES = 7
+
+
+def make_csc_stand_in():
+    """Make a minimal stand-in for a CSC: `TelemetryWriter` only needs
+    ``tel_<topic>.data.<field>`` lists.
+    """
+    csc = types.SimpleNamespace()
+    for field in ATMCSSimulator.TELEMETRY_FIELDS:
+        attr_name = f"tel_{field.topic}"
+        if not hasattr(csc, attr_name):
+            setattr(
+                csc, attr_name, types.SimpleNamespace(data=types.SimpleNamespace()),
+            )
+        setattr(getattr(csc, attr_name).data, field.field, [0] * NSAMPLES)
+    return csc
+
+
+class TelemetryWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.csc = make_csc_stand_in()
+        naxes = len(ATMCSSimulator.Axis)
+        self.config = types.SimpleNamespace(
+            axis_encoder_counts_per_deg=np.linspace(1000, 2000, naxes),
+            motor_encoder_counts_per_deg=np.linspace(100, 200, naxes),
+            motor_axis_ratio=np.linspace(10, 20, naxes),
+            torque_per_accel=np.linspace(1, 2, naxes),
+        )
+
+    def test_write(self):
+        writer = ATMCSSimulator.TelemetryWriter(self.csc)
+        topic_names = []
+        for field in ATMCSSimulator.TELEMETRY_FIELDS:
+            if field.topic not in topic_names:
+                topic_names.append(field.topic)
+        self.assertEqual(
+            writer.topics, [getattr(self.csc, f"tel_{name}") for name in topic_names],
+        )
+
+        rng = np.random.default_rng(seed=47)
+        shape = (len(ATMCSSimulator.Axis), NSAMPLES)
+        position = rng.uniform(-270, 270, shape)
+        velocity = rng.uniform(-5, 5, shape)
+        acceleration = rng.uniform(-3, 3, shape)
+        writer.write(
+            position=position,
+            velocity=velocity,
+            acceleration=acceleration,
+            config=self.config,
+        )
+
+        config = self.config
+        for field in ATMCSSimulator.TELEMETRY_FIELDS:
+            axis = field.axis
+            motor_pos = (position[axis] * config.motor_axis_ratio[axis] + 360) % 360
+            motor_pos -= 360
+            expected = {
+                Quantity.POSITION: position[axis],
+                Quantity.VELOCITY: velocity[axis],
+                Quantity.ACCELERATION: acceleration[axis],
+                Quantity.AXIS_COUNTS: (
+                    position[axis] * config.axis_encoder_counts_per_deg[axis]
+                ).astype(int),
+                Quantity.MOTOR_POSITION: motor_pos,
+                Quantity.MOTOR_COUNTS: (
+                    motor_pos * config.motor_encoder_counts_per_deg[axis]
+                ).astype(int),
+                Quantity.TORQUE: acceleration[axis] * config.torque_per_accel[axis],
+            }[field.quantity]
+            with self.subTest(field=field):
+                data = getattr(self.csc, f"tel_{field.topic}").data
+                np.testing.assert_allclose(getattr(data, field.field), expected)
+
+    def test_write_decimated(self):
+        fields = [
+            field
+            for field in ATMCSSimulator.TELEMETRY_FIELDS
+            if field.topic == "trajectory"
+        ]
+        writer = ATMCSSimulator.TelemetryWriter(self.csc, fields=fields)
+        self.assertEqual(writer.nitems, NSAMPLES)
+        decimation = 3
+        shape = (len(ATMCSSimulator.Axis), 3)
+        position = np.arange(15, dtype=float).reshape(shape)
+        writer.write(
+            position=position,
+            velocity=position + 100,
+            acceleration=position + 200,
+            config=self.config,
+            decimation=decimation,
+        )
+        data = self.csc.tel_trajectory.data
+        self.assertEqual(data.elevation, [0, 0, 0, 1, 1, 1, 2])
+        self.assertEqual(data.azimuthVelocity, [103, 103, 103, 104, 104, 104, 105])
+
+
+class TelemetryScheduleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.csc = make_csc_stand_in()
+
+    def test_default(self):
+        schedule = ATMCSSimulator.TelemetrySchedule(self.csc, tick_interval=0.1)
+        self.assertEqual(
+            list(schedule.rates), list(ATMCSSimulator.TELEMETRY_TOPICS),
+        )
+        self.assertEqual(len(schedule.groups), 1)
+        group = schedule.groups[0]
+        self.assertEqual(group.rate, ATMCSSimulator.TelemetryRate(1, 1))
+        self.assertEqual(group.nticks, 10)
+        self.assertEqual(len(group.writer.topics), 8)
+        self.assertIs(schedule.finest_group, group)
+        self.assertEqual(schedule.due(0), [])
+        self.assertEqual(schedule.due(5), [])
+        self.assertEqual(schedule.due(10), [group])
+        times = schedule.sample_times(group, tai=100)
+        np.testing.assert_allclose(
+            times, np.linspace(99, 100, NSAMPLES, endpoint=False)
+        )
+
+    def test_rates(self):
+        schedule = ATMCSSimulator.TelemetrySchedule(
+            self.csc,
+            tick_interval=0.1,
+            rates=dict(
+                trajectory=(0, 1),
+                torqueDemand=ATMCSSimulator.TelemetryRate(2, 3),
+                measuredTorque=dict(interval=2, decimation=3),
+                mount_AzEl_Encoders=(0.5, 1),
+            ),
+        )
+        self.assertEqual(schedule.rates["trajectory"].interval, 0)
+        topics_for_rate = {
+            group.rate: [topic for topic in group.writer.topics]
+            for group in schedule.groups
+        }
+        self.assertEqual(len(topics_for_rate), 3)
+        self.assertEqual(
+            topics_for_rate[(2, 3)],
+            [self.csc.tel_torqueDemand, self.csc.tel_measuredTorque],
+        )
+        self.assertEqual(topics_for_rate[(0.5, 1)], [self.csc.tel_mount_AzEl_Encoders])
+        for group in schedule.groups:
+            self.assertNotIn(self.csc.tel_trajectory, group.writer.topics)
+        self.assertEqual(schedule.finest_group.rate, (0.5, 1))
+
+        self.assertEqual(
+            [group.rate for group in schedule.due(5)], [(0.5, 1)],
+        )
+        self.assertEqual(
+            sorted(group.rate for group in schedule.due(20)), [(0.5, 1), (1, 1), (2, 3)]
+        )
+        self.assertEqual(schedule.next_due(0), 5)
+        self.assertEqual(schedule.next_due(5), 5)
+        self.assertEqual(schedule.next_due(6), 10)
+        group = [group for group in schedule.groups if group.rate == (2, 3)][0]
+        times = schedule.sample_times(group, tai=100)
+        np.testing.assert_allclose(
+            times, np.linspace(98, 100, NSAMPLES, endpoint=False)[::3]
+        )
+
+        # Disable all topics.
+        schedule = ATMCSSimulator.TelemetrySchedule(
+            self.csc, tick_interval=0.1, default_rate=(0, 1)
+        )
+        self.assertEqual(schedule.groups, [])
+        self.assertIsNone(schedule.finest_group)
+        self.assertIsNone(schedule.next_due(1))
+
+    def test_rate_errors(self):
+        for rates in (
+            dict(no_such_topic=(1, 1)),
+            dict(trajectory=(-1, 1)),
+            dict(trajectory=(0.25, 1)),
+            dict(trajectory=(1e-9, 1)),
+            dict(trajectory=(float("nan"), 1)),
+            dict(trajectory=(float("inf"), 1)),
+            dict(trajectory=(1, 0)),
+            dict(trajectory=(1, 1.5)),
+            dict(trajectory=(1, NSAMPLES + 1)),
+            dict(trajectory=(1,)),
+            dict(trajectory="fast"),
+        ):
+            with self.subTest(rates=rates):
+                with self.assertRaises(salobj.ExpectedError):
+                    ATMCSSimulator.TelemetrySchedule(
+                        self.csc, tick_interval=0.1, rates=rates
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()